@@ -1,13 +1,21 @@
 import gradio as gr
 import os
-from shared import GAME 
+import pandas as pd
+from shared import ROOMS, DEFAULT_ROOM
 from backend import (
+    resolve_room,
+    empty_dashboard,
+    format_room_capacity,
     get_dashboard_info, 
+    stream_dashboard,
     get_admin_dashboard_info,
     admin_start, 
     admin_skip_time, 
     admin_skip_to_end, 
-    admin_restart_game
+    admin_toggle_clock,
+    admin_restart_game,
+    admin_create_room,
+    admin_close_room,
 )
 
 # === 自定义 CSS ===
@@ -64,40 +72,50 @@ button { border-radius: 8px !important; }
 
 def auto_login_logic(request: gr.Request):
     """
-    页面加载时：检查URL中是否有 token 参数
+    页面加载时：检查URL中是否有 room / token 参数
     """
-    if not request: return gr.update(visible=True), gr.update(visible=False), "", "", "", ""
+    if not request: return gr.update(visible=True), gr.update(visible=False), "", "", "", "", DEFAULT_ROOM, DEFAULT_ROOM
     
     params = request.query_params
     token = params.get("token")
+    room = params.get("room") or DEFAULT_ROOM
     
     print(f"[DEBUG-PY] 收到请求 IP: {request.client.host}, 参数: {params}")
     
+    game, route_msg = resolve_room(ROOMS, room, token)
+    if game is None:
+        # 房间不在本进程：留在登录页，提示跳转到归属进程
+        return gr.update(visible=True), gr.update(visible=False), route_msg, "", "", "", DEFAULT_ROOM, room
+    
     if token:
-        player = GAME.get_user_by_token(token)
+        player = game.get_user_by_token(token)
         if player:
-            print(f"[DEBUG-PY] Token {token} 验证成功，登录用户: {player.email}")
+            print(f"[DEBUG-PY] Token {token} 验证成功，登录用户: {player.email} (房间 {room})")
             return (
                 gr.update(visible=False), 
                 gr.update(visible=True),  
                 f"欢迎回来, {player.display_name} (免密登录)", 
                 player.email, 
                 player.email, 
-                player.display_name
+                player.display_name,
+                room,
+                room
             )
     
-    return gr.update(visible=True), gr.update(visible=False), "", "", "", ""
+    return gr.update(visible=True), gr.update(visible=False), "", "", "", "", room, room
 
-def login_ui(email, name, request: gr.Request):
+def login_ui(email, name, room, request: gr.Request):
     """
     手动登录：生成 Token 并显示魔法链接
     """
-    if not email or not name: return gr.update(visible=True), gr.update(visible=False), "请输入信息", ""
+    if not email or not name: return gr.update(visible=True), gr.update(visible=False), "请输入信息", "", DEFAULT_ROOM
+    game, route_msg = resolve_room(ROOMS, room)
+    if game is None: return gr.update(visible=True), gr.update(visible=False), route_msg, "", DEFAULT_ROOM
     
-    success, message, token = GAME.register(email, name)
+    success, message, token = game.register(email, name)
     
     host = request.headers.get("host", "localhost:8001")
-    magic_link = f"http://{host}/?token={token}"
+    magic_link = f"http://{host}/?room={game.room_id}&token={token}"
     
     magic_html = f"""
     <div class='magic-link'>
@@ -107,32 +125,60 @@ def login_ui(email, name, request: gr.Request):
     </div>
     """
     
-    return gr.update(visible=False), gr.update(visible=True), f"欢迎, {name}", magic_html
+    return gr.update(visible=False), gr.update(visible=True), f"欢迎, {name} (房间 {game.room_id})", magic_html, game.room_id
 
-def update_dashboard(email):
-    status, price, trend, logs, messages, leaderboard_df, plot, hint_text = get_dashboard_info(GAME, email)
+def update_dashboard(email, room):
+    game, _ = resolve_room(ROOMS, room)
+    if game is None: return empty_dashboard()
+    status, price, trend, logs, messages, leaderboard_df, plot, hint_text = get_dashboard_info(game, email)
     return status, price, trend, logs, messages, leaderboard_df, plot, hint_text
 
-def common_action(func, email, *args):
-    if GAME.phase != "交易阶段":
-        res = get_dashboard_info(GAME, email) 
+async def stream_updates(email, room):
+    """
+    服务端推送：订阅行情事件，只把变化的输出发给浏览器，其余输出保持不动。
+    取代原来每 15 秒全量轮询一次的 gr.Timer。异步生成器：连接再多也不占 Gradio 的工作线程。
+    """
+    game, _ = resolve_room(ROOMS, room)
+    if not email or game is None: return
+    async for changed, outputs in stream_dashboard(game, email):
+        if outputs is None:
+            # 心跳：不更新任何内容，只为让 Gradio 发现已断开的连接
+            yield tuple(gr.update() for _ in range(8))
+            continue
+        yield tuple(outputs[i] if i in changed else gr.update() for i in range(8))
+
+def common_action(command, room, email, *args):
+    game, route_msg = resolve_room(ROOMS, room)
+    if game is None:
+        res = empty_dashboard()
+        return *res[:7], res[7], route_msg
+    if game.phase != "交易阶段":
+        res = get_dashboard_info(game, email) 
         return *res[:7], res[7], "❌ 交易未开启"
-    result_text = func(email, *args)
-    res = get_dashboard_info(GAME, email)
+    result_text = getattr(game, command)(email, *args)
+    res = get_dashboard_info(game, email)
     return *res[:7], res[7], result_text
 
-def buy_action(email, qty): return common_action(GAME.buy_stock, email, qty)
-def sell_action(email, qty): return common_action(GAME.sell_stock, email, qty)
-def intel_action(email, direction): return common_action(GAME.purchase_intel, email, direction)
-def loan_action(email, amount): return common_action(GAME.take_loan, email, amount)
-def post_message_action(email, msg): 
+def buy_action(email, room, qty): return common_action("buy_stock", room, email, qty)
+def sell_action(email, room, qty): return common_action("sell_stock", room, email, qty)
+def intel_action(email, room, direction): return common_action("purchase_intel", room, email, direction)
+def loan_action(email, room, amount): return common_action("take_loan", room, email, amount)
+def post_message_action(email, room, msg): 
     if not msg.strip(): 
-        res = get_dashboard_info(GAME, email)
+        res = update_dashboard(email, room)
         return *res[:7], res[7], "内容为空"
-    return common_action(GAME.post_message, email, msg)
+    return common_action("post_message", room, email, msg)
+
+def admin_action(fn, room):
+    """管理端按钮：只操作输入框里指定的房间"""
+    game, route_msg = resolve_room(ROOMS, room)
+    if game is None: return route_msg
+    return fn(game)
 
-def update_admin_dashboard():
-    return get_admin_dashboard_info(GAME)
+def update_admin_dashboard(room):
+    game, route_msg = resolve_room(ROOMS, room)
+    if game is None: return None, pd.DataFrame(), "", "", route_msg + "\n\n" + format_room_capacity(ROOMS)
+    return get_admin_dashboard_info(game, ROOMS)
 
 # ==========================================
 # 3. 界面构建
@@ -140,6 +186,7 @@ def update_admin_dashboard():
 
 with gr.Blocks(title="暗仓: 看不见的手") as public_app:
     user_email_state = gr.State("") 
+    user_room_state = gr.State(DEFAULT_ROOM)
     gr.Markdown("# 📉 暗仓 (Dark Pool) - 模拟交易终端")
     
     # === 登录页 ===
@@ -162,6 +209,7 @@ with gr.Blocks(title="暗仓: 看不见的手") as public_app:
         with gr.Row():
             email_input = gr.Textbox(label="电子邮箱", placeholder="user@test.com")
             name_input = gr.Textbox(label="操盘代号", placeholder="Trader X")
+            room_input = gr.Textbox(label="房间号", value=DEFAULT_ROOM)
         login_btn = gr.Button("接入交易网络", variant="primary")
         login_msg = gr.Markdown("")
 
@@ -212,7 +260,6 @@ with gr.Blocks(title="暗仓: 看不见的手") as public_app:
                 visible=True,
                 interactive=False
             )
-            timer = gr.Timer(15)
 
     refresh_outs = [status_display, price_display, trend_display, log_display, message_display, leaderboard_table, kline_chart, hint_display]
     common_outs = [*refresh_outs, action_result]
@@ -220,26 +267,28 @@ with gr.Blocks(title="暗仓: 看不见的手") as public_app:
     public_app.load(
         fn=auto_login_logic,
         inputs=None, 
-        outputs=[login_group, game_group, login_msg, user_email_state, email_input, name_input]
+        outputs=[login_group, game_group, login_msg, user_email_state, email_input, name_input, user_room_state, room_input]
     ).then(
-        update_dashboard, user_email_state, refresh_outs 
+        update_dashboard, [user_email_state, user_room_state], refresh_outs 
+    ).then(
+        stream_updates, [user_email_state, user_room_state], refresh_outs, show_progress="hidden", concurrency_limit=None
     )
 
     login_btn.click(
         fn=login_ui, 
-        inputs=[email_input, name_input], 
-        outputs=[login_group, game_group, login_msg, magic_link_display] 
+        inputs=[email_input, name_input, room_input], 
+        outputs=[login_group, game_group, login_msg, magic_link_display, user_room_state] 
     ).then(
         fn=lambda e: e, inputs=email_input, outputs=user_email_state
-    ).then(update_dashboard, user_email_state, refresh_outs)
-    
-    timer.tick(update_dashboard, user_email_state, refresh_outs)
+    ).then(update_dashboard, [user_email_state, user_room_state], refresh_outs).then(
+        stream_updates, [user_email_state, user_room_state], refresh_outs, show_progress="hidden", concurrency_limit=None
+    )
     
-    buy_btn.click(buy_action, [user_email_state, buy_qty_box], common_outs)
-    sell_btn.click(sell_action, [user_email_state, sell_qty_box], common_outs)
-    intel_btn.click(intel_action, [user_email_state, intel_direction], common_outs)
-    loan_btn.click(loan_action, [user_email_state, loan_amount], common_outs)
-    send_msg_btn.click(post_message_action, [user_email_state, message_input], common_outs).then(lambda: "", None, message_input)
+    buy_btn.click(buy_action, [user_email_state, user_room_state, buy_qty_box], common_outs)
+    sell_btn.click(sell_action, [user_email_state, user_room_state, sell_qty_box], common_outs)
+    intel_btn.click(intel_action, [user_email_state, user_room_state, intel_direction], common_outs)
+    loan_btn.click(loan_action, [user_email_state, user_room_state, loan_amount], common_outs)
+    send_msg_btn.click(post_message_action, [user_email_state, user_room_state, message_input], common_outs).then(lambda: "", None, message_input)
 
 
 # 界面 2: 管理员端
@@ -248,11 +297,16 @@ with gr.Blocks(title="暗仓: 上帝控制台", css=custom_css) as admin_app:
     with gr.Row():
         with gr.Column(scale=3): admin_kline = gr.Plot(label="全局行情监控")
         with gr.Column(scale=1):
+            admin_room = gr.Textbox(label="房间号", value=DEFAULT_ROOM)
             admin_status = gr.Markdown("状态: ---")
             admin_start_btn = gr.Button("🚀 强制开始游戏", variant="primary")
             admin_skip_btn = gr.Button("⏭️ 跳过 1 小时")
             admin_skip_all_btn = gr.Button("⏩ 快进至结局")
+            admin_pause_btn = gr.Button("⏯️ 暂停/继续时钟")
             admin_restart_btn = gr.Button("🔄 重置/新游戏")
+            with gr.Row():
+                admin_create_room_btn = gr.Button("➕ 创建房间")
+                admin_close_room_btn = gr.Button("🗑️ 关闭房间", variant="stop")
             admin_out_text = gr.Markdown("") 
     with gr.Row():
         with gr.Column(scale=1):
@@ -266,16 +320,23 @@ with gr.Blocks(title="暗仓: 上帝控制台", css=custom_css) as admin_app:
             admin_messages = gr.TextArea(show_label=False, interactive=False, elem_classes="scroll-box")
     admin_timer = gr.Timer(15)
     admin_outputs = [admin_kline, admin_player_table, admin_logs, admin_messages, admin_status]
-    admin_start_btn.click(lambda: admin_start(), outputs=admin_out_text).then(update_admin_dashboard, outputs=admin_outputs)
-    admin_skip_btn.click(lambda: admin_skip_time(), outputs=admin_out_text).then(update_admin_dashboard, outputs=admin_outputs)
-    admin_skip_all_btn.click(lambda: admin_skip_to_end(), outputs=admin_out_text).then(update_admin_dashboard, outputs=admin_outputs)
-    admin_restart_btn.click(lambda: admin_restart_game(), outputs=admin_out_text).then(update_admin_dashboard, outputs=admin_outputs)
-    admin_timer.tick(update_admin_dashboard, outputs=admin_outputs)
+    admin_start_btn.click(lambda r: admin_action(admin_start, r), admin_room, admin_out_text).then(update_admin_dashboard, admin_room, admin_outputs)
+    admin_skip_btn.click(lambda r: admin_action(admin_skip_time, r), admin_room, admin_out_text).then(update_admin_dashboard, admin_room, admin_outputs)
+    admin_skip_all_btn.click(lambda r: admin_action(admin_skip_to_end, r), admin_room, admin_out_text).then(update_admin_dashboard, admin_room, admin_outputs)
+    admin_pause_btn.click(lambda r: admin_action(admin_toggle_clock, r), admin_room, admin_out_text).then(update_admin_dashboard, admin_room, admin_outputs)
+    admin_restart_btn.click(lambda r: admin_action(admin_restart_game, r), admin_room, admin_out_text).then(update_admin_dashboard, admin_room, admin_outputs)
+    admin_create_room_btn.click(lambda r: admin_create_room(ROOMS, r), admin_room, admin_out_text).then(update_admin_dashboard, admin_room, admin_outputs)
+    admin_close_room_btn.click(lambda r: admin_close_room(ROOMS, r), admin_room, admin_out_text).then(update_admin_dashboard, admin_room, admin_outputs)
+    admin_room.submit(update_admin_dashboard, admin_room, admin_outputs)
+    admin_timer.tick(update_admin_dashboard, admin_room, admin_outputs)
 
 if __name__ == "__main__":
     print("正在启动双端服务...")
-    print("1. 玩家端 (Public): http://localhost:8001")
-    print("2. 管理端 (Admin):  http://localhost:8002 (请保密)")
+    # 多进程部署时端口由 scripts/rooms.py 分配
+    public_port = int(os.getenv("DARKPOOL_PUBLIC_PORT", "8001"))
+    admin_port = int(os.getenv("DARKPOOL_ADMIN_PORT", "8002"))
+    print(f"1. 玩家端 (Public): http://localhost:{public_port}")
+    print(f"2. 管理端 (Admin):  http://localhost:{admin_port} (请保密)")
     
-    admin_app.launch(server_name="0.0.0.0", server_port=8002, prevent_thread_lock=True, theme=gr.themes.Soft())
-    public_app.launch(server_name="0.0.0.0", server_port=8001, css=custom_css)
\ No newline at end of file
+    admin_app.launch(server_name="0.0.0.0", server_port=admin_port, prevent_thread_lock=True, theme=gr.themes.Soft())
+    public_app.launch(server_name="0.0.0.0", server_port=public_port, css=custom_css)
\ No newline at end of file
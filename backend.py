@@ -1,35 +1,156 @@
+import asyncio
 import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from shared import GAME  
+from scripts.trade_ledger import KIND_NAMES, describe
+from scripts.bars import lttb, bar_columns
+from scripts.game_state import MARKET_MODES
 
 # 1. 图表绘制逻辑
-def draw_kline_chart(game_instance):
-    data = game_instance.kline_data
+class ChartCache:
+    """
+    K线图缓存：同一个 (时钟, 价格, K线根数) 只画一次，所有会话、玩家端和管理端共用同一个 Figure。
+    锁只保护字典：第一个未命中的请求在锁外构建，同一个键的其他请求等它的 Future，
+    整点收盘时几百个轮询同时到达也只会画一次，不同房间的构建互不阻塞。
+    取到的 Figure 是共享对象，调用方只读，不要修改。
+    """
+    def __init__(self, max_entries=4):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        with self.lock:
+            fut = self.entries.get(key)
+            owner = fut is None
+            if owner:
+                self.misses += 1
+                fut = self.entries[key] = Future()
+                while len(self.entries) > self.max_entries: self.entries.popitem(last=False)
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        if owner:
+            try: fut.set_result(build())
+            except BaseException as e:
+                # 构建失败不留在缓存里，下一次请求重新画
+                with self.lock:
+                    if self.entries.get(key) is fut: del self.entries[key]
+                fut.set_exception(e)
+        return fut.result()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0, "entries": len(self.entries)}
+
+# 多房间共用一个缓存，每个房间大约占两项 (当前 + 上一版)
+CHART_CACHE = ChartCache(max_entries=64)
+
+# 图表周期：auto 为自动挑选；分钟 K 线只在盘中跳动模式下有数据
+CHART_RESOLUTIONS = {"auto": "自动", "1m": "1分钟", "5m": "5分钟", "1h": "1小时"}
+
+def chart_resolutions(game_instance):
+    """可选的图表周期：没开盘中跳动时没有分钟 K 线，只给自动和 1 小时"""
+    if game_instance.ticks_per_hour: return list(CHART_RESOLUTIONS)
+    return ["auto", "1h"]
+# 一张图最多画的点数：超过时对收盘价做 LTTB 降采样画折线，图表数据量不随跳动次数增长
+MAX_CHART_POINTS = 240
+
+def chart_key(snap, room_id="main", resolution="auto"):
+    return (room_id, snap.game_clock, snap.current_price, len(snap.kline), snap.bars[0], resolution)
+
+def draw_kline_chart(game_instance, snap=None, resolution="auto"):
+    if snap is None: snap = game_instance.snapshot
+    return CHART_CACHE.get(chart_key(snap, game_instance.room_id, resolution), lambda: build_kline_chart(snap, resolution))
+
+def chart_series(snap, resolution="auto"):
+    """按周期取 K 线各列 (横轴统一为游戏小时)；auto 时从细到粗取第一个不超过 MAX_CHART_POINTS 根的周期"""
+    hourly = snap.kline.columns()
+    if resolution == "1h": return "1h", hourly
+    bars = snap.bars[1]
+    if resolution not in bars:
+        # 根数 = 已走完的 + 进行中的那一根
+        counts = {name: len(done) + (bar is not None) for name, (done, bar) in bars.items()}
+        resolution = next((name for name, n in counts.items() if 0 < n <= MAX_CHART_POINTS), "1h")
+        if resolution == "1h": return "1h", hourly
+    cols = bar_columns(bars[resolution])
+    return resolution, dict(cols, time=cols['time'] / 60)
+
+def build_kline_chart(snap, resolution="auto"):
     COLOR_UP = '#ff3333'; COLOR_DOWN = '#00ff00'; BG_COLOR = '#161a25'
+    resolution, cols = chart_series(snap, resolution)
 
-    if not data:
+    if not len(cols['time']):
         fig = go.Figure()
         fig.update_layout(title="等待开盘数据...", template="plotly_dark", paper_bgcolor=BG_COLOR, plot_bgcolor=BG_COLOR, font=dict(color='#d1d4dc'))
         return fig
 
-    df = pd.DataFrame(data)
+    # 直接使用列式存储的零拷贝视图，不再逐行组装 DataFrame
     fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.03, row_heights=[0.7, 0.3])
-    fig.add_trace(go.Candlestick(x=df['time'], open=df['open'], high=df['high'], low=df['low'], close=df['close'], name="Price", increasing_line_color=COLOR_UP, decreasing_line_color=COLOR_DOWN), row=1, col=1)
-    vol_colors = [COLOR_UP if row['close'] >= row['open'] else COLOR_DOWN for index, row in df.iterrows()]
-    fig.add_trace(go.Bar(x=df['time'], y=df['volume'], marker_color=vol_colors, name="Volume"), row=2, col=1)
-    fig.update_layout(title=dict(text=f"HK.8888 实时走势 (当前: ${game_instance.current_price:.2f})", font=dict(color='white', size=16)), xaxis_rangeslider_visible=False, template="plotly_dark", paper_bgcolor=BG_COLOR, plot_bgcolor=BG_COLOR, margin=dict(l=40, r=20, t=60, b=20), height=450, showlegend=False, xaxis=dict(showgrid=False), yaxis=dict(showgrid=True, gridcolor='#2a2e39'), yaxis2=dict(showgrid=False))
+    if len(cols['time']) > MAX_CHART_POINTS:
+        idx = lttb(cols['time'], cols['close'], MAX_CHART_POINTS)
+        cols = {k: v[idx] for k, v in cols.items()}
+        fig.add_trace(go.Scatter(x=cols['time'], y=cols['close'], mode="lines", line=dict(color=COLOR_UP, width=1.5), name="Price"), row=1, col=1)
+    else:
+        fig.add_trace(go.Candlestick(x=cols['time'], open=cols['open'], high=cols['high'], low=cols['low'], close=cols['close'], name="Price", increasing_line_color=COLOR_UP, decreasing_line_color=COLOR_DOWN), row=1, col=1)
+    vol_colors = np.where(cols['close'] >= cols['open'], COLOR_UP, COLOR_DOWN)
+    fig.add_trace(go.Bar(x=cols['time'], y=cols['volume'], marker_color=vol_colors, name="Volume"), row=2, col=1)
+    fig.update_layout(title=dict(text=f"HK.8888 实时走势 {CHART_RESOLUTIONS[resolution]} (当前: ${snap.current_price:.2f})", font=dict(color='white', size=16)), xaxis_rangeslider_visible=False, template="plotly_dark", paper_bgcolor=BG_COLOR, plot_bgcolor=BG_COLOR, margin=dict(l=40, r=20, t=60, b=20), height=450, showlegend=False, xaxis=dict(showgrid=False), yaxis=dict(showgrid=True, gridcolor='#2a2e39'), yaxis2=dict(showgrid=False))
     return fig
 
 # 2. 玩家端数据接口
+def resolve_room(rooms, room_id, token=None):
+    """
+    按房间号取本进程的 GameState，返回 (game, 提示)；只查不建，房间由管理端创建。
+    房间不存在或归别的进程管时 game 为 None，后者的提示里带跳转链接
+    """
+    try:
+        url = rooms.route(room_id)
+        if url is None:
+            game = rooms.get(room_id)
+            if game is None: return None, f"❌ 房间 {room_id} 不存在，请向管理员确认房间号"
+            return game, ""
+    except (ValueError, RuntimeError) as e: return None, f"❌ {e}"
+    if not url: return None, f"❌ 房间 {room_id} 不在本服务器"
+    link = f"{url}/?room={room_id}" + (f"&token={token}" if token else "")
+    return None, f"➡️ 房间 {room_id} 在另一个服务进程: [{link}]({link})"
+
+def empty_dashboard():
+    empty_df = pd.DataFrame(columns=LEADERBOARD_COLUMNS)
+    return (f"## 🚫 未登录", "请登录", "无数据", "", "", empty_df, None, "")
+
+def format_quote(bids, asks):
+    bid = f"${bids[0][0]:.2f} ({bids[0][1]})" if bids else "-"
+    ask = f"${asks[0][0]:.2f} ({asks[0][1]})" if asks else "-"
+    return f"买一 {bid} 卖一 {ask}"
+
 def get_dashboard_info(game_instance, email):
-    if email not in game_instance.players:
-        empty_df = pd.DataFrame(columns=["排名", "玩家", "身份", "资产", "状态"])
-        return (f"## 🚫 未登录", "请登录", "无数据", "", "", empty_df, None, "")
+    # 只读引擎发布的视图：snapshot、views 和 standings (排行榜) 每次发布都换成新对象、发布后不再改动，先取引用再读即可拿到一致的数据
+    market = game_instance.snapshot
+    status = get_player_status(game_instance, email, market)
+    if status is None: return empty_dashboard()
+    status_md, price_md, trend_md, hint_text = status
+    kline_plot = draw_kline_chart(game_instance, market)
+    leaderboard_df = get_leaderboard_frame(game_instance, market)
+    return status_md, price_md, trend_md, market.logs_text, market.messages_text, leaderboard_df, kline_plot, hint_text
+
+LEADERBOARD_COLUMNS = ["排名", "玩家", "身份", "资产", "状态"]
+
+def get_player_status(game_instance, email, market=None):
+    """玩家端的状态栏、价格、趋势和提示 (不含图表和排行榜)；未登录时返回 None"""
+    if market is None: market = game_instance.snapshot
+    p = game_instance.views.get(email)
+    if p is None: return None
     
-    p = game_instance.players[email]
-    current_price = game_instance.current_price
+    current_price = market.current_price
     
     # 动态提示
     _, _, avail_cash, _ = p.get_margin_info(current_price)
@@ -37,78 +158,232 @@ def get_dashboard_info(game_instance, email):
     if p.stock > 0: hint_text = f"💡 提示: 最大可买 {max_buy} | 持仓 {p.stock}"
     elif p.stock < 0: hint_text = f"💡 提示: 最大可买 {max_buy} | 做空 {abs(p.stock)}"
     else: hint_text = f"💡 提示: 最大可买 {max_buy} | 可空 ~{int(p.cash*2/current_price)}"
+    bids, asks = market.book_depth
+    if bids or asks: hint_text += " | " + format_quote(bids, asks)
 
     # 状态栏 (传入 game_clock 以计算冷却)
     net_worth = p.get_net_worth(current_price)
     short_val, frozen, avail, risk_ratio = p.get_margin_info(current_price)
-    status_label = p.get_account_status(current_price, game_instance.game_clock)
+    status_label = p.get_account_status(current_price, market.game_clock)
     
     if "正常" in status_label or "待机" in status_label: status_icon = "🟢"
     elif "冻结" in status_label or "冷却" in status_label: status_icon = "🟠"
     else: status_icon = "🔴"
     
-    role_display = p.role if game_instance.phase != "报名阶段" else "等待分配"
+    role_display = p.role if market.phase != "报名阶段" else "等待分配"
+    rank = game_instance.standings.rank(email)
+    rank_text = f" | 排名: #{rank}/{len(game_instance.standings)}" if rank else ""
     
+    _, realized, fees = game_instance.get_trade_summary(email)
     status_md = f"""
     ### {status_icon} 账户: {status_label}
-    * **{p.display_name}** ({role_display}) | **净值: ${net_worth:,.0f}**
+    * **{p.display_name}** ({role_display}) | **净值: ${net_worth:,.0f}**{rank_text}
     * 购买力: ${avail:,.0f} | 冻结: ${frozen:,.0f} | 现金: ${p.cash:,.0f}
+    * 已实现盈亏: ${realized:+,.0f} | 累计费用: ${fees:,.0f}
     """
     
     # 趋势
     trend_md = ""
-    if game_instance.phase == "交易阶段":
-        if p.role == "散户": trend_md = f"📊 **市场情绪**: 空头拥挤度 {game_instance.short_pressure*100:.0f}%"
-        elif p.role == "操盘手": trend_md = f"👁️ **上帝视角**: 趋势 {game_instance.hourly_trend*100:+.2f}%/h | 动能 {game_instance.current_momentum*100:+.2f}%"
-            
-    price_md = f"# ${game_instance.current_price:.2f}"
-    kline_plot = draw_kline_chart(game_instance)
-    
-    logs_str = "\n".join(game_instance.system_logs[-20:]) 
-    messages_str = "\n".join(getattr(game_instance, 'messages', [])[-20:] or ["暂无留言..."])
-
-    if game_instance.phase == "结算阶段":
-        data = []
-        sorted_players = sorted(game_instance.players.values(), key=lambda x: x.cash, reverse=True)
-        for idx, pl in enumerate(sorted_players):
-            status = "破产" if pl.cash <= 0 else "盈利"
-            data.append([idx+1, pl.display_name, pl.role, f"${pl.cash:,.0f}", status])
-        leaderboard_df = pd.DataFrame(data, columns=["排名", "玩家", "身份", "资产", "状态"])
-    else:
-        leaderboard_df = pd.DataFrame(columns=["排名", "玩家", "身份", "资产", "状态"])
+    if market.phase == "交易阶段":
+        if p.role == "散户": trend_md = f"📊 **市场情绪**: 空头拥挤度 {market.short_pressure*100:.0f}%"
+        elif p.role == "操盘手": trend_md = f"👁️ **上帝视角**: 趋势 {market.hourly_trend*100:+.2f}%/h | 动能 {market.current_momentum*100:+.2f}%"
             
-    return status_md, price_md, trend_md, logs_str, messages_str, leaderboard_df, kline_plot, hint_text
+    price_md = f"# ${market.current_price:.2f}"
+    return status_md, price_md, trend_md, hint_text
+
+def get_leaderboard_frame(game_instance, market=None):
+    """最终排行榜 (结算阶段才有数据)"""
+    if market is None: market = game_instance.snapshot
+    if market.phase != "结算阶段": return pd.DataFrame(columns=LEADERBOARD_COLUMNS)
+    data = []
+    views = game_instance.views
+    sorted_players = [views[e] for e in game_instance.standings.top() if e in views]
+    for idx, pl in enumerate(sorted_players):
+        status = "破产" if pl.cash <= 0 else "盈利"
+        data.append([idx+1, pl.display_name, pl.role, f"${pl.cash:,.0f}", status])
+    return pd.DataFrame(data, columns=LEADERBOARD_COLUMNS)
+
+TRADE_COLUMNS = ["时间", "类型", "数量", "价格", "费用", "现金变动", "说明"]
+
+def get_trade_history(game_instance, email, cursor=None, limit=10):
+    """玩家逐笔记录的一页 (从新到旧)：返回 (DataFrame, 下一页游标)，代价只和页大小有关"""
+    records, next_cursor = game_instance.get_trade_history(email, cursor, limit)
+    rows = [[f"{r.turn}h", KIND_NAMES[r.kind], r.qty, f"${r.price:.2f}", f"${r.fee:,.2f}", f"${r.cash:+,.2f}", describe(r)] for r in records]
+    return pd.DataFrame(rows, columns=TRADE_COLUMNS), next_cursor
+
+# 玩家端 8 个输出的下标：状态、价格、趋势、日志、留言、排行榜、K线、提示
+ALL_OUTPUTS = frozenset(range(8))
+
+def diff_dashboard(prev_snap, snap, prev_view, view, prev_rank, rank):
+    """对比两次快照，算出玩家端哪些输出需要刷新"""
+    if prev_snap is None or prev_snap.phase != snap.phase or prev_snap.game_clock != snap.game_clock:
+        return ALL_OUTPUTS
+    changed = set()
+    if prev_snap.current_price != snap.current_price or len(prev_snap.kline) != len(snap.kline):
+        changed.update((0, 1, 6, 7))
+    if view is not prev_view or rank != prev_rank: changed.update((0, 7))
+    if prev_snap.book_depth != snap.book_depth: changed.add(7)
+    if (prev_snap.short_pressure, prev_snap.hourly_trend, prev_snap.current_momentum) != (snap.short_pressure, snap.hourly_trend, snap.current_momentum):
+        changed.add(2)
+    if prev_snap.logs_seq != snap.logs_seq: changed.add(3)
+    if prev_snap.messages_seq != snap.messages_seq: changed.add(4)
+    return changed
+
+async def stream_dashboard(game_instance, email, heartbeat=20):
+    """
+    推送版的玩家面板 (异步生成器)：订阅事件总线，只有状态真的变了才产出 (changed, outputs)。
+    changed 是需要刷新的输出下标集合；心跳时产出 (空集合, None)，前端借此发现连接已断开。
+    等待事件时只挂起协程，不占线程；组装面板 (可能要画图) 借用线程池片刻。
+    """
+    sub = game_instance.events.subscribe_async()
+    try:
+        snap, view = game_instance.snapshot, game_instance.views.get(email)
+        rank = game_instance.standings.rank(email)
+        yield ALL_OUTPUTS, await asyncio.to_thread(get_dashboard_info, game_instance, email)
+        while True:
+            events = await sub.wait(timeout=heartbeat)
+            new_snap, new_view = game_instance.snapshot, game_instance.views.get(email)
+            new_rank = game_instance.standings.rank(email)
+            if sub.lagged:
+                sub.lagged = False
+                changed = ALL_OUTPUTS
+            else:
+                changed = diff_dashboard(snap, new_snap, view, new_view, rank, new_rank)
+            snap, view, rank = new_snap, new_view, new_rank
+            if not changed:
+                if not events: yield set(), None
+                continue
+            yield changed, await asyncio.to_thread(get_dashboard_info, game_instance, email)
+    finally:
+        sub.close()
+
+def get_stream_since(game_instance, stream, seq, limit=None):
+    """
+    增量拉取日志/留言：返回 (最新序号, [(seq, 文本), ...])。
+    客户端把最新序号存下来，下次只取之后的新内容。
+    """
+    ring = game_instance.system_logs if stream == "logs" else game_instance.messages
+    entries = ring.since(seq, limit)
+    return (entries[-1][0] if entries else max(seq, 0)), entries
 
 # 3. 管理员端数据接口
-def get_admin_dashboard_info(game_instance):
-    kline_plot = draw_kline_chart(game_instance)
+def format_engine_status(game_instance):
+    st = game_instance.get_engine_stats()
+    return f"引擎: 已处理 {st['processed']} 条命令 | 排队 {st['queue_depth']} | 实际 {st['rate']:.1f}/s | 上限 ~{st['ceiling']:,.0f}/s | 最长排队 {st['max_wait_ms']:.1f}ms"
+
+def format_clock_status(game_instance):
+    from scripts.scheduler import SCHEDULER
+    clock = game_instance.get_clock_stats()
+    sched = SCHEDULER.stats()
+    text = f"时钟: 1小时={game_instance.seconds_per_hour:g}秒"
+    if clock is None: text += " | 未运行"
+    else:
+        if clock["paused"]: state = "⏸️ 暂停"
+        elif clock["seconds_left"] is None: state = "已停止"
+        else: state = f"下次收盘 {clock['seconds_left']:.0f}s 后"
+        late = list(game_instance.tick_lateness)
+        avg_late = sum(late) / len(late) * 1000 if late else 0.0
+        text += f" | {state} | 已触发 {clock['fired']} | 平均延迟 {avg_late:.1f}ms | 最大延迟 {max(late, default=0) * 1000:.1f}ms"
+    return text + f"\n* 调度线程: 定时任务 {sched['timers']} | 累计触发 {sched['fired']} | 失败 {sched['failed']}"
+
+def format_archive_status(save_dir=None, recent=5):
+    from scripts.archive import open_archive
+    archive = open_archive(save_dir)
+    st = archive.summary()
+    if not st["rounds"]: return "历史归档: 暂无对局"
+    text = f"历史归档: 共 {st['rounds']} 局 | 收割成功率 {(st['mm_success_rate'] or 0)*100:.0f}% | 终盘价 均值 ${st['avg_final_price']:.2f} (${st['min_final_price']:.2f} ~ ${st['max_final_price']:.2f}) | 平均强平 {st['avg_liquidations'] or 0:.1f} 次"
+    for rid, room, played_at, price, success, players, liqs in archive.recent_rounds(recent):
+        text += f"\n* #{rid} {played_at} [{room}] {players} 人 | 终盘 ${price:.2f} | {'收割成功' if success else '收割失败'} | 强平 {liqs or 0}"
+    return text
+
+def format_llm_status():
+    from scripts.news_system import llm_client
+    stats = llm_client.get_stats()
+    breaker = stats["breaker"]
+    icon = {"closed": "🟢", "half_open": "🟡", "open": "🔴"}.get(breaker["state"], "⚪")
+    text = f"LLM 熔断器: {icon} {breaker['state']} (连续失败 {breaker['failures']})"
+    if breaker["state"] == "open": text += f" | 冷却剩余 {breaker['cooldown_left']:.0f}s"
+    for model, st in stats["models"].items():
+        text += f"\n* {model}: 成功 {st['ok']} / 失败 {st['fail']} / 熔断 {st['short_circuited']} | 平均 {st['avg_ms']:.0f}ms | 最慢 {st['max_ms']:.0f}ms"
+    return text
+
+def format_room_capacity(rooms):
+    text = f"房间容量 (进程 {rooms.worker_index + 1}/{rooms.workers}, {len(rooms.rooms)}/{rooms.max_rooms} 间):"
+    for r in rooms.capacity():
+        text += f"\n* {r['room']}: {r['phase']} {r['game_clock']}/12h | 玩家 {r['players']} | 订阅 {r['subscribers']} | 排队 {r['queue_depth']} | 实际 {r['rate']:.1f}/s | 上限 ~{r['ceiling']:,.0f}/s | 最长排队 {r['max_wait_ms']:.1f}ms"
+    return text
+
+def get_admin_dashboard_info(game_instance, rooms=None):
+    market = game_instance.snapshot
+    kline_plot = draw_kline_chart(game_instance, market)
     player_data = []
-    sorted_players = sorted(game_instance.players.values(), key=lambda x: x.get_net_worth(game_instance.current_price), reverse=True)
+    # 排行榜索引已经按净值排好序，这里只按顺序取出
+    views = game_instance.views
+    sorted_players = [views[e] for e in game_instance.standings.top() if e in views]
     for p in sorted_players:
-        net_worth = p.get_net_worth(game_instance.current_price)
+        net_worth = p.get_net_worth(market.current_price)
         # 传入 game_clock
-        status = p.get_account_status(game_instance.current_price, game_instance.game_clock)
+        status = p.get_account_status(market.current_price, market.game_clock)
         player_data.append([p.display_name, p.email, p.role, f"${p.cash:,.0f}", p.stock, f"${net_worth:,.0f}", status])
     
     df = pd.DataFrame(player_data, columns=["代号", "邮箱", "身份", "现金", "持仓", "净值", "状态"])
-    logs_str = "\n".join(game_instance.system_logs[-30:])
-    messages_str = "\n".join(getattr(game_instance, 'messages', [])[-30:] or ["暂无留言..."])
-    status_info = f"阶段: {game_instance.phase} | 时间: {game_instance.game_clock}/12h | 在线: {len(game_instance.players)}"
+    logs_str = market.admin_logs_text
+    messages_str = market.admin_messages_text
+    status_info = f"房间: {game_instance.room_id} | 阶段: {market.phase} | 时间: {market.game_clock}/12h | 在线: {len(game_instance.views)} | 成交模式: {MARKET_MODES[game_instance.market_mode]}"
+    t = market.totals
+    status_info += f"\n\n市场: 多头 {t.total_long:,} 股 | 空头 {t.total_short:,} 股 | 未平仓 {t.open_interest:,} 股 | 现金 ${t.total_cash:,.0f} | 负债 ${t.total_debt:,.0f}"
+    book = game_instance.book
+    if book is not None:
+        bids, asks = market.book_depth
+        status_info += f"\n\n订单簿: 挂单 {len(book):,} | 成交 {book.trades:,} 笔 / {book.volume:,} 股 | {format_quote(bids, asks)}"
+    risk = game_instance.get_risk_summary()
+    if risk["shorts"]: status_info += f"\n\n空头风险: {risk['shorts']} 个账户 | 濒临强平 {risk['critical']} | 保证金告急 {risk['warning']} | 最低风险率 {risk['min_risk']:.2f}"
+    bus = game_instance.events.stats()
+    status_info += f"\n\n推送: 订阅 {bus['subscribers']} | 事件 {bus['published']} | 投递 {bus['delivered']} | 丢弃 {bus['dropped']}"
+    cache = CHART_CACHE.stats()
+    status_info += "\n\n" + format_engine_status(game_instance)
+    status_info += "\n\n" + format_clock_status(game_instance)
+    js = game_instance.get_journal_stats()
+    if js: status_info += f"\n\n预写日志: {js['seq']:,} 条 | 追加 {js['avg_append_us']:.1f}us/条 | fsync {js['fsyncs']} 次 | 快照 {js['snapshots']} 次 (最近 {js['last_snapshot_ms']:.1f}ms)"
+    status_info += f"\n\n图表缓存: 命中 {cache['hits']} / 未命中 {cache['misses']} ({cache['hit_rate']*100:.0f}%)"
+    status_info += "\n\n" + format_llm_status()
+    if rooms is not None: status_info += "\n\n" + format_room_capacity(rooms)
+    status_info += "\n\n" + format_archive_status(game_instance.save_dir)
     return kline_plot, df, logs_str, messages_str, status_info
 
-# 4. 管理员函数
-def admin_start():
-    if len(GAME.players) < 1: GAME.register("bot1@ai.com", "Bot A") 
-    return GAME.start_game()
-def admin_skip_time():
-    if not GAME.is_running: return "❌ 游戏未开始"
-    GAME.next_hour()
-    return f"✅ 已跳至第 {GAME.game_clock} 小时"
-def admin_skip_to_end():
-    if not GAME.is_running: return "❌ 游戏未开始"
+# 4. 管理员函数 (按房间操作)
+def admin_start(game_instance):
+    if len(game_instance.players) < 1: game_instance.register("bot1@ai.com", "Bot A") 
+    return game_instance.start_game()
+def admin_skip_time(game_instance):
+    if not game_instance.is_running: return "❌ 游戏未开始"
+    game_instance.next_hour()
+    return f"✅ 已跳至第 {game_instance.game_clock} 小时"
+def admin_skip_to_end(game_instance):
+    if not game_instance.is_running: return "❌ 游戏未开始"
     c=0
-    while GAME.game_clock<12 and c<20: GAME.next_hour(); c+=1
+    while game_instance.game_clock<12 and c<20: game_instance.next_hour(); c+=1
     return "⏩ 结束"
-def admin_restart_game():
-    GAME.prepare_next_round()
-    return "🔄 重置"
\ No newline at end of file
+def admin_toggle_clock(game_instance):
+    clock = game_instance.get_clock_stats()
+    if clock is None: return "❌ 时钟未运行"
+    return game_instance.resume_clock() if clock["paused"] else game_instance.pause_clock()
+def admin_toggle_market_mode(game_instance):
+    return game_instance.set_market_mode("house" if game_instance.market_mode == "book" else "book")
+def admin_restart_game(game_instance):
+    game_instance.prepare_next_round()
+    return "🔄 重置"
+
+# 房间的创建和关闭 (按注册表操作)
+def admin_create_room(rooms, room_id):
+    try:
+        if rooms.route(room_id) is not None: return f"❌ 房间 {room_id} 不归本进程管理"
+        if rooms.get(room_id) is not None: return f"房间 {room_id} 已存在"
+        rooms.get(room_id, create=True)
+    except (ValueError, RuntimeError) as e: return f"❌ {e}"
+    return f"✅ 已创建房间 {room_id}"
+def admin_close_room(rooms, room_id):
+    try:
+        if rooms.close(room_id): return f"🗑️ 已关闭房间 {room_id}"
+    except ValueError as e: return f"❌ {e}"
+    return f"❌ 房间 {room_id} 不存在或不能关闭 (默认房间不能关闭)"
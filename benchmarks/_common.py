@@ -0,0 +1,34 @@
+"""
+基准脚本的公共部分：导入即切到离线文案 (不访问 LLM)，战报和归档写到临时目录；
+populate 直接往对局里塞大批玩家，不走注册命令。
+
+各基准要在导入 scripts 之前先导入本模块，环境变量才会生效。
+"""
+import os
+import random
+import tempfile
+
+os.environ["DARKPOOL_LLM_OFFLINE"] = "1"
+# 战报和归档写到临时目录，不混进正式的 savedata/ 统计
+os.environ.setdefault("DARKPOOL_SAVE_DIR", tempfile.mkdtemp(prefix="darkpool-bench-"))
+
+from scripts.game_state import Player
+
+def populate(game, n, seed, short_ratio=0.1, long_ratio=0.4, mm_ratio=0.0, debt_ratio=0.0):
+    """按比例生成空头、多头 (其余空仓)，以及操盘手和负债户；生成后重建汇总并标记全部玩家待发布"""
+    rng = random.Random(seed)
+    for i in range(n):
+        p = Player(game.ledger, f"p{i}@bench", f"P{i}")
+        if mm_ratio: p.role = "操盘手" if rng.random() < mm_ratio else "散户"
+        r = rng.random()
+        if r < short_ratio:
+            # 空头：开仓时现金在 2.15~3.5 倍空头市值之间，价格上涨时少数会跌破维持线
+            p.stock = -rng.randint(100, 5000)
+            p.cash = abs(p.stock) * 100.0 * rng.uniform(2.15, 3.5)
+        elif r < short_ratio + long_ratio:
+            p.stock = rng.randint(1, 5000)
+            p.cash = rng.uniform(0, 1e6)
+        if debt_ratio and rng.random() < debt_ratio: p.debt = rng.uniform(1e4, 5e5)
+        game.players[p.email] = p
+    game.aggregates.rebuild(game.players.values())
+    game._touch_all()
@@ -0,0 +1,65 @@
+"""
+批量下单基准：同一串订单分别逐个调用 buy_stock / sell_stock 和按批调用 submit_orders，
+比较吞吐，并核对两种方式每单的结果和最终账户完全一致。
+
+运行方式 (在项目根目录):
+    python -m benchmarks.bench_batch_orders --players 20000 --batch 200
+"""
+import argparse
+import random
+import time
+
+import benchmarks._common
+
+from scripts.game_state import GameState, OrderRequest
+
+def make_orders(players, seed):
+    # 冷却规则下每人每 3 小时只能成交一次，所以每个玩家下一单，外加一成重复下单 (会被冷却拒绝)
+    rng = random.Random(seed)
+    emails = [f"p{i}@bench" for i in range(players)]
+    orders = [OrderRequest(e, rng.choice(("buy", "sell")), rng.choice((10, 100, 1000, 20000))) for e in emails]
+    orders += [OrderRequest(rng.choice(emails), "buy", 10) for _ in range(players // 10)]
+    rng.shuffle(orders)
+    return emails, orders
+
+def new_game(emails):
+    game = GameState()
+    game.seconds_per_hour = 3600
+    for i, email in enumerate(emails): game.register(email, f"P{i}")
+    game.start_game()
+    return game
+
+def fingerprint(game):
+    return [(p.cash, p.stock, p.last_trade_turn) for p in game.players.values()], game.current_volume, game.aggregates.snapshot()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    emails, orders = make_orders(args.players, args.seed)
+
+    game = new_game(emails)
+    started = time.perf_counter()
+    single = [game.buy_stock(o.email, o.quantity) if o.side == "buy" else game.sell_stock(o.email, o.quantity) for o in orders]
+    t_single = time.perf_counter() - started
+    expected = game.engine.call(fingerprint, game)
+    game.shutdown()
+
+    game = new_game(emails)
+    started = time.perf_counter()
+    batched = []
+    for i in range(0, len(orders), args.batch): batched += game.submit_orders(orders[i:i + args.batch])
+    t_batch = time.perf_counter() - started
+    actual = game.engine.call(fingerprint, game)
+    game.shutdown()
+
+    n = len(orders)
+    print(f"{n:,} 单 | 逐个调用 {t_single*1000:.0f}ms ({n / t_single:,.0f} 单/秒) | 每批 {args.batch} 单 {t_batch*1000:.0f}ms ({n / t_batch:,.0f} 单/秒)")
+    same = single == batched and expected == actual
+    print(f"结果一致: {same}")
+    if not same: raise SystemExit("批量下单与逐个下单结果不一致")
+
+if __name__ == "__main__":
+    main()
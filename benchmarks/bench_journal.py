@@ -0,0 +1,84 @@
+"""
+预写日志基准：同一串命令分别在不记日志和记日志的房间里执行，比较交易路径的耗时；
+然后模拟崩溃，用同一个日志目录新建房间，测量恢复耗时并核对恢复后的状态和原来完全一致。
+
+运行方式 (在项目根目录):
+    python -m benchmarks.bench_journal --players 500 --trades 20000
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+import benchmarks._common
+
+from scripts.game_state import GameState
+from scripts.journal import Journal
+
+def play(game, players, trades, seed):
+    """注册、开盘，然后交替执行交易和整点收盘，打满 12 小时；返回交易命令的总耗时"""
+    rng = random.Random(seed)
+    emails = [f"p{i}@bench" for i in range(players)]
+    for i, email in enumerate(emails): game.register(email, f"P{i}")
+    game.start_game()
+    per_hour = trades // 12
+    elapsed = 0.0
+    for hour in range(12):
+        for _ in range(per_hour):
+            email = rng.choice(emails)
+            op = rng.random()
+            started = time.perf_counter()
+            if op < 0.4: game.buy_stock(email, rng.choice((10, 100, 500)))
+            elif op < 0.8: game.sell_stock(email, rng.choice((10, 100, 500, 1000)))
+            elif op < 0.9: game.purchase_intel(email, rng.choice(("看涨", "看跌")))
+            else: game.post_message(email, f"bench {rng.random():.4f}")
+            elapsed += time.perf_counter() - started
+        game.next_hour()
+    return elapsed
+
+def fingerprint(game):
+    players = [(e, p.cash, p.stock, p.debt, p.role, p.token, p.last_trade_turn, game.trades.summary(p.row)) for e, p in game.players.items()]
+    kline = [tuple(k.values()) for k in game.kline_data]
+    trades = {name: col.tolist() for name, col in game.trades.columns().items()}
+    return players, trades, game.current_price, game.game_clock, game.phase, kline, list(game.system_logs), list(game.messages)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--trades", type=int, default=20000)
+    parser.add_argument("--snapshot-every", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="darkpool-journal-")
+    try:
+        plain = GameState()
+        plain.seconds_per_hour = 3600
+        base = play(plain, args.players, args.trades, args.seed)
+
+        journal = Journal(directory, snapshot_every=args.snapshot_every)
+        game = GameState(journal=journal)
+        game.seconds_per_hour = 3600
+        logged = play(game, args.players, args.trades, args.seed)
+        # 等后台点评/总评 (离线模板) 回写完，它们也是要记进日志的命令
+        time.sleep(1.0)
+        journal.flush()
+        st = journal.stats()
+        n = args.trades // 12 * 12
+        print(f"交易路径: 无日志 {base / n * 1e6:.1f}us/次 | 有日志 {logged / n * 1e6:.1f}us/次 (+{(logged - base) / n * 1e6:.1f}us)")
+        print(f"日志: {st['appended']:,} 条 | 平均 {st['bytes'] / max(1, st['appended']):.0f} 字节/条 | 追加 {st['avg_append_us']:.1f}us/条 | fsync {st['fsyncs']} 次 | 快照 {st['snapshots']} 次 (最近 {st['last_snapshot_ms']:.1f}ms)")
+
+        # 模拟崩溃：不关闭旧房间，直接用同一个目录恢复
+        expected = game.engine.call(fingerprint, game)
+        started = time.perf_counter()
+        recovered = GameState(journal=Journal(directory, snapshot_every=args.snapshot_every))
+        recovery_ms = (time.perf_counter() - started) * 1000
+        actual = recovered.engine.call(fingerprint, recovered)
+        print(f"恢复耗时: {recovery_ms:.1f}ms | 状态一致: {'是' if actual == expected else '否'}")
+        print(f"Token 仍然有效: {'是' if all(recovered.get_user_by_token(p.token) for p in game.players.values()) else '否'}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
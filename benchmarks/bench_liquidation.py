@@ -0,0 +1,56 @@
+"""
+强平索引基准：10 万玩家下，对比旧的全表扫描与强平价格索引的收盘保证金检查。
+
+运行方式 (在项目根目录):
+    python -m benchmarks.bench_liquidation --players 100000
+"""
+import argparse
+import time
+
+from benchmarks._common import populate
+
+from scripts.game_state import GameState
+from scripts.trade_ledger import WARNING
+
+def legacy_sweep(game):
+    # 原 next_hour 中的全表扫描实现
+    maintenance_margin = 1.10
+    for p in game.players.values():
+        p.last_event = None 
+        if p.stock < 0:
+            short_val, frozen, avail, risk = p.get_margin_info(game.current_price)
+            if risk < maintenance_margin: game._liquidate_player(p)
+            elif risk < 1.3: game.trades.record(p.row, game.game_clock, WARNING, price=game.current_price)
+
+def fingerprint(game):
+    state = [(p.email, p.cash, p.stock, p.last_event, [r[1:] for r in game.trades.page(p.row)[0]]) for p in game.players.values()]
+    return state, game.current_momentum, game.current_volume
+
+def run_once(n, short_ratio, seed, price, sweep):
+    game = GameState()
+    # 其余一半玩家持多头，剩下的空仓
+    game.engine.call(populate, game, n, seed, short_ratio, 0.5 - short_ratio)
+    game.engine.call(game._publish)
+    game.current_price = price
+    started = time.perf_counter()
+    game.engine.call(sweep, game)
+    elapsed = time.perf_counter() - started
+    return elapsed, game
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--players", type=int, default=100000)
+    parser.add_argument("--short-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for price in (100.0, 105.0, 115.0, 130.0):
+        t_scan, legacy = run_once(args.players, args.short_ratio, args.seed, price, legacy_sweep)
+        t_index, indexed = run_once(args.players, args.short_ratio, args.seed, price, GameState._margin_sweep)
+        same = fingerprint(legacy) == fingerprint(indexed)
+        liquidated = sum(1 for p in indexed.players.values() if p.last_event == "LIQUIDATED")
+        print(f"price={price:>6.1f} | 强平 {liquidated:>5} | 全表扫描 {t_scan*1000:8.2f}ms | 索引 {t_index*1000:8.2f}ms | 结果一致: {same}")
+        if not same: raise SystemExit("索引结果与全表扫描不一致")
+
+if __name__ == "__main__":
+    main()
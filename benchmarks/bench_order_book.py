@@ -0,0 +1,92 @@
+"""
+订单簿基准：
+1. 裸订单簿：随机限价单 / 市价单 / 撤单混合流，测撮合吞吐 (单/秒)；
+2. 撮合模式的 GameState：每个玩家下一张单 (冷却规则下每人每 3 小时只能下一次)，测经过引擎和记账之后的吞吐。
+
+运行方式 (在项目根目录):
+    python -m benchmarks.bench_order_book --orders 200000 --players 20000
+"""
+import argparse
+import os
+import random
+import time
+
+import benchmarks._common
+os.environ["DARKPOOL_MARKET_MODE"] = "book"
+
+from scripts.order_book import OrderBook, BUY, SELL, GTC, IOC
+from scripts.game_state import GameState
+
+def bench_book(n, seed):
+    rng = random.Random(seed)
+    book = OrderBook()
+    live = []
+    started = time.perf_counter()
+    for i in range(n):
+        r = rng.random()
+        if r < 0.2 and live:
+            # 撤单：随机挑一张 (可能已经成交，撤不到也算一次操作)
+            j = rng.randrange(len(live))
+            live[j], live[-1] = live[-1], live[j]
+            book.cancel(live.pop())
+            continue
+        side = BUY if rng.random() < 0.5 else SELL
+        qty = rng.choice((10, 50, 100, 500))
+        if r < 0.35:
+            book.match(book.new_order(i, side, qty, None, IOC))
+        else:
+            # 限价：围绕 100 的正态分布，保证两边经常交叉
+            price = round(rng.gauss(100, 1.5), 2)
+            order = book.new_order(i, side, qty, price, GTC)
+            book.match(order)
+            if order.id in book.orders: live.append(order.id)
+    elapsed = time.perf_counter() - started
+    return elapsed, book
+
+def check_book(book):
+    """价位汇总与实际挂单一致，且买一低于卖一"""
+    levels = ({}, {})
+    for o in book.orders.values():
+        side = levels[0] if o.side == BUY else levels[1]
+        side[o.price] = side.get(o.price, 0) + o.remaining
+    bids, asks = book.depth(1)
+    crossed = bids and asks and bids[0][0] >= asks[0][0]
+    return (levels == (book.bid_levels, book.ask_levels) and book.bid_prices == sorted(levels[0])
+            and book.ask_prices == sorted(levels[1]) and not crossed)
+
+def bench_game(players, seed):
+    rng = random.Random(seed)
+    game = GameState()
+    game.seconds_per_hour = 3600
+    emails = [f"p{i}@bench" for i in range(players)]
+    for i, email in enumerate(emails): game.register(email, f"P{i}")
+    game.start_game()
+    started = time.perf_counter()
+    for email in emails:
+        side = "buy" if rng.random() < 0.5 else "sell"
+        if rng.random() < 0.3: game.place_order(email, side, rng.choice((10, 100)), None, IOC)
+        else: game.place_order(email, side, rng.choice((10, 100, 500)), round(rng.gauss(100, 1.0), 2))
+    elapsed = time.perf_counter() - started
+    mismatches = game.check_aggregates()
+    book = game.book
+    game.shutdown()
+    return elapsed, book, mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--players", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    elapsed, book = bench_book(args.orders, args.seed)
+    bids, asks = book.depth(1)
+    if not check_book(book): raise SystemExit("订单簿价位汇总与挂单不一致")
+    print(f"裸订单簿: {args.orders:,} 单 {elapsed*1000:.0f}ms | {args.orders / elapsed:,.0f} 单/秒 | 成交 {book.trades:,} 笔 {book.volume:,} 股 | 挂单 {len(book):,} | 买一 {bids[:1]} 卖一 {asks[:1]}")
+
+    elapsed, book, mismatches = bench_game(args.players, args.seed)
+    print(f"GameState 撮合模式: {args.players:,} 单 {elapsed*1000:.0f}ms | {args.players / elapsed:,.0f} 单/秒 | 成交 {book.trades:,} 笔 | 挂单 {len(book):,}")
+    print(f"汇总一致性检查: {'通过' if not mismatches else mismatches}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+列式账本基准：大量玩家下对比逐个玩家结算 (原 _end_game 的循环) 与整列结算的耗时，
+并核对两种方式得到的最终资产、逐笔记录汇总、散户亏损和破产人数完全一致。
+
+运行方式 (在项目根目录):
+    python -m benchmarks.bench_settlement --players 50000
+"""
+import argparse
+import math
+import time
+
+from benchmarks._common import populate
+
+from scripts.game_state import GameState
+from scripts.trade_ledger import SETTLE
+
+def populate_endgame(game, n, seed):
+    # 一成空头、五成多头、一成操盘手，少数人背着贷款；时钟停在最后一小时
+    populate(game, n, seed, 0.1, 0.5, 0.1, 0.05)
+    game.current_price = 87.5
+    game.is_running = True
+    game.game_clock = 11
+
+def legacy_settle(game):
+    # 原 _end_game 中逐个玩家的结算与统计
+    retail_players = []
+    for p in game.players.values():
+        val = p.get_net_worth(game.current_price)
+        fee = val * 0.10
+        final_val = val - fee
+        position, cash = p.stock, p.cash
+        game._set_account(p, final_val, 0, 0)
+        game.trades.record(p.row, game.game_clock, SETTLE, -position, game.current_price, fee, final_val - cash, position)
+        if p.role != "操盘手": retail_players.append(p)
+    total_retail_loss = sum(max(0, 1000000.0 - rp.cash) for rp in retail_players)
+    game.leaderboard.rebuild(game.players.values(), game.current_price)
+    losers_count = sum(1 for p in game.players.values() if p.cash < 1000000.0)
+    game.final_stats = {"total_retail_loss": total_retail_loss, "losers_count": losers_count}
+
+def columnar_settle(game):
+    game.replaying = True  # 只测结算本身，不提交总评和战报
+    try: game._end_game()
+    finally: game.replaying = False
+
+def run_once(n, seed, settle):
+    game = GameState()
+    game.engine.call(populate_endgame, game, n, seed)
+    game.engine.call(game._publish)
+    started = time.perf_counter()
+    game.engine.call(settle, game)
+    compute = time.perf_counter() - started
+    started = time.perf_counter()
+    game.engine.call(game._publish)
+    publish = time.perf_counter() - started
+    result = ([p.cash for p in game.players.values()], game.leaderboard.top(),
+              [game.trades.summary(p.row) for p in game.players.values()],
+              game.final_stats["losers_count"], game.final_stats["total_retail_loss"])
+    game.shutdown()
+    return compute, publish, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    t_loop, p_loop, expected = run_once(args.players, args.seed, legacy_settle)
+    t_cols, p_cols, actual = run_once(args.players, args.seed, columnar_settle)
+    print(f"{args.players:,} 名玩家 | 逐个结算 {t_loop*1000:8.2f}ms (发布 {p_loop*1000:.2f}ms) | 整列结算 {t_cols*1000:8.2f}ms (发布 {p_cols*1000:.2f}ms)")
+    # 散户亏损是浮点累加，求和顺序不同允许极小的相对误差
+    same = expected[:4] == actual[:4] and math.isclose(expected[4], actual[4], rel_tol=1e-9)
+    print(f"结果一致: {same}")
+    if not same: raise SystemExit("整列结算与逐个结算结果不一致")
+
+if __name__ == "__main__":
+    main()
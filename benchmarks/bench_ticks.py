@@ -0,0 +1,90 @@
+"""
+盘中跳动基准：开启每小时 N 次跳动跑完一整局，测每次跳动的耗时，
+核对 1 分钟 / 5 分钟 / 小时 K 线互相一致 (高低点、成交量)，
+并比较不同周期下 K 线图的构建耗时和序列化后的大小 (自动选周期、强制 1 分钟 + LTTB、不降采样)。
+
+运行方式 (在项目根目录):
+    python -m benchmarks.bench_ticks --ticks 60 --players 200
+"""
+import argparse
+import random
+import time
+
+import benchmarks._common
+
+import numpy as np
+import backend
+from scripts.bars import bar_columns
+from scripts.game_state import GameState
+
+def play(ticks, players, seed):
+    rng = random.Random(seed)
+    game = GameState()
+    game.seconds_per_hour = 3600
+    game.ticks_per_hour = ticks
+    emails = [f"p{i}@bench" for i in range(players)]
+    for i, email in enumerate(emails): game.register(email, f"P{i}")
+    game.start_game()
+    durations = []
+    for _ in range(12):
+        for _ in range(ticks):
+            # 跳动之间随机有人下单，制造分钟级成交量
+            for email in rng.sample(emails, 3):
+                if rng.random() < 0.5: game.buy_stock(email, rng.choice((10, 100)))
+                else: game.sell_stock(email, rng.choice((10, 100)))
+            started = time.perf_counter()
+            game.submit("price_tick", game.round_id).result()
+            durations.append(time.perf_counter() - started)
+        game.next_hour()
+    snap = game.snapshot
+    game.shutdown()
+    return snap, durations
+
+def check_bars(snap):
+    """分钟 K 线落在对应小时的高低点之内，5 分钟 K 线由 1 分钟 K 线汇总而来，成交量总数一致"""
+    hourly, m1, m5 = snap.kline.columns(), bar_columns(snap.bars[1]["1m"]), bar_columns(snap.bars[1]["5m"])
+    hour_of = m1["time"] // 60
+    inside = np.all(m1["high"] <= hourly["high"][hour_of] + 1e-9) and np.all(m1["low"] >= hourly["low"][hour_of] - 1e-9)
+    bucket = m1["time"] // 5
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    rolled = (
+        np.array_equal(m1["open"][starts], m5["open"]) and np.array_equal(m1["close"][np.r_[starts[1:] - 1, len(bucket) - 1]], m5["close"])
+        and np.array_equal(np.maximum.reduceat(m1["high"], starts), m5["high"]) and np.array_equal(np.minimum.reduceat(m1["low"], starts), m5["low"])
+        and np.array_equal(np.add.reduceat(m1["volume"], starts), m5["volume"])
+    )
+    volume = m1["volume"].sum() == m5["volume"].sum() == hourly["volume"].sum()
+    return bool(inside and rolled and volume)
+
+def chart_cost(snap, resolution):
+    started = time.perf_counter()
+    fig = backend.build_kline_chart(snap, resolution)
+    payload = fig.to_json()
+    return time.perf_counter() - started, len(payload)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=60)
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    snap, durations = play(args.ticks, args.players, args.seed)
+    d = np.array(durations) * 1e6
+    print(f"{len(d):,} 次跳动 | 每次 p50 {np.percentile(d, 50):.0f}µs p99 {np.percentile(d, 99):.0f}µs (含引擎往返和发布快照)")
+    m1, m5 = (bar_columns(snap.bars[1][name]) for name in ("1m", "5m"))
+    print(f"K 线根数: 1分钟 {len(m1['time'])} | 5分钟 {len(m5['time'])} | 1小时 {len(snap.kline)}")
+    ok = check_bars(snap)
+    print(f"多周期一致性检查: {'通过' if ok else '不一致'}")
+
+    limit = backend.MAX_CHART_POINTS
+    # 先画一次预热 Plotly，免得第一项把导入和初始化也算进去
+    chart_cost(snap, "1h")
+    for label, resolution in (("自动", "auto"), ("1分钟 + LTTB", "1m"), ("1分钟不降采样", "1m-raw")):
+        if resolution == "1m-raw": backend.MAX_CHART_POINTS = 10 ** 9
+        elapsed, size = chart_cost(snap, resolution.replace("-raw", ""))
+        backend.MAX_CHART_POINTS = limit
+        print(f"K 线图 [{label}]: 构建+序列化 {elapsed*1000:.1f}ms | {size / 1024:.1f} KB")
+    if not ok: raise SystemExit("多周期 K 线不一致")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+无界面压测：注册 N 个模拟玩家，按设定的 seconds_per_hour 开一局，
+玩家并发地买入/卖出/做空/购买舆情/贷款/发言，同时混入一部分面板轮询 (get_dashboard_info)。
+LLM 强制离线，全部使用模板文案，结果可在无网环境下复现。
+
+运行方式 (在项目根目录):
+    python -m benchmarks.loadtest --players 2000 --seconds-per-hour 1 --workers 32
+"""
+import argparse
+import random
+import resource
+import threading
+import time
+import tracemalloc
+
+import benchmarks._common
+
+from scripts.news_system import llm_client
+from scripts.game_state import GameState
+from scripts.journal import Journal
+from backend import get_dashboard_info
+
+llm_client.offline = True
+
+# 操作权重：(名称, 权重)
+OPERATIONS = (
+    ("buy_stock", 30),
+    ("sell_stock", 30),
+    ("purchase_intel", 5),
+    ("take_loan", 3),
+    ("post_message", 7),
+    ("get_dashboard_info", 25),
+)
+
+def percentile(sorted_values, pct):
+    if not sorted_values: return 0.0
+    i = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+def run_operation(game, op, email, rng):
+    if op == "buy_stock": return game.buy_stock(email, rng.choice((10, 100, 500, 1000)))
+    if op == "sell_stock": return game.sell_stock(email, rng.choice((10, 100, 500, 1000, 3000)))
+    if op == "purchase_intel": return game.purchase_intel(email, rng.choice(("看涨", "看跌")))
+    if op == "take_loan": return game.take_loan(email, rng.choice((10000, 50000)))
+    if op == "post_message": return game.post_message(email, f"压测消息 {rng.random():.4f}")
+    return get_dashboard_info(game, email)
+
+def worker(game, emails, seed, stop, latencies):
+    rng = random.Random(seed)
+    names = [op for op, _ in OPERATIONS]
+    weights = [w for _, w in OPERATIONS]
+    local = {op: [] for op in names}
+    while not stop.is_set() and game.phase != "结算阶段":
+        op = rng.choices(names, weights)[0]
+        email = rng.choice(emails)
+        started = time.perf_counter()
+        run_operation(game, op, email, rng)
+        local[op].append(time.perf_counter() - started)
+    latencies.append(local)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--seconds-per-hour", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, default=32, help="并发请求线程数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=600, help="最长运行秒数")
+    parser.add_argument("--journal", metavar="DIR", help="开启预写日志，写到该目录 (应为空目录)")
+    parser.add_argument("--tracemalloc", action="store_true", help="用 tracemalloc 统计 Python 堆峰值 (会明显变慢)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    if args.tracemalloc: tracemalloc.start()
+
+    game = GameState(journal=Journal(args.journal) if args.journal else None)
+    game.seconds_per_hour = args.seconds_per_hour
+    emails = [f"bot{i}@load.test" for i in range(args.players)]
+    started = time.perf_counter()
+    for i, email in enumerate(emails): game.register(email, f"Bot{i}")
+    register_seconds = time.perf_counter() - started
+    print(f"注册 {args.players} 人耗时 {register_seconds:.2f}s ({args.players / register_seconds:,.0f}/s)")
+
+    print(game.start_game())
+    stop = threading.Event()
+    latencies = []
+    threads = [threading.Thread(target=worker, args=(game, emails, args.seed + i, stop, latencies), daemon=True) for i in range(args.workers)]
+    started = time.perf_counter()
+    for t in threads: t.start()
+    deadline = started + args.timeout
+    while game.phase != "结算阶段" and time.perf_counter() < deadline: time.sleep(0.1)
+    stop.set()
+    for t in threads: t.join()
+    elapsed = time.perf_counter() - started
+
+    merged = {op: [] for op, _ in OPERATIONS}
+    for local in latencies:
+        for op, values in local.items(): merged[op].extend(values)
+    total = sum(len(v) for v in merged.values())
+
+    print(f"\n运行 {elapsed:.1f}s，共 {total:,} 次操作，吞吐 {total / elapsed:,.0f} ops/s")
+    print(f"{'操作':<20}{'次数':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    for op, values in merged.items():
+        values.sort()
+        print(f"{op:<20}{len(values):>10,}{percentile(values, 50)*1000:>10.2f}{percentile(values, 99)*1000:>10.2f}{(values[-1] if values else 0)*1000:>10.2f}")
+
+    ticks = sorted(game.tick_durations)
+    print(f"\nnext_hour: {len(ticks)} 次 | p50 {percentile(ticks, 50)*1000:.2f}ms | max {(ticks[-1] if ticks else 0)*1000:.2f}ms")
+    st = game.get_engine_stats()
+    print(f"引擎: 处理 {st['processed']:,} 条命令 | 上限 ~{st['ceiling']:,.0f}/s | 平均 {st['avg_service_us']:.1f}us | 最长排队 {st['max_wait_ms']:.1f}ms")
+    # Linux 上 ru_maxrss 单位是 KB
+    print(f"进程峰值内存 (RSS): {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+    if args.tracemalloc:
+        _, peak = tracemalloc.get_traced_memory()
+        print(f"Python 堆峰值 (tracemalloc): {peak / 1024 / 1024:.1f} MB")
+    js = game.get_journal_stats()
+    if js: print(f"预写日志: {js['appended']:,} 条 | {js['bytes'] / 1024:.0f} KB | 追加 {js['avg_append_us']:.1f}us/条 | fsync {js['fsyncs']} 次 | 快照 {js['snapshots']} 次 (最近 {js['last_snapshot_ms']:.1f}ms)")
+    mismatches = game.check_aggregates()
+    print(f"汇总一致性检查: {'通过' if not mismatches else mismatches}")
+
+if __name__ == "__main__":
+    main()
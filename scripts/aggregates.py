@@ -0,0 +1,62 @@
+"""
+全市场汇总：多头/空头总股数、未平仓量、系统内现金和未还债务。
+每次资金或持仓变动时先减去旧贡献、再加上新贡献，读取都是 O(1)。
+"""
+from collections import namedtuple
+
+Totals = namedtuple("Totals", ["total_long", "total_short", "open_interest", "total_cash", "total_debt", "players"])
+
+class MarketAggregates:
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.total_long = 0
+        self.total_short = 0
+        self.total_cash = 0.0
+        self.total_debt = 0.0
+        self.players = 0
+
+    @property
+    def open_interest(self):
+        return self.total_long + self.total_short
+
+    def add(self, player):
+        if player.stock > 0: self.total_long += player.stock
+        elif player.stock < 0: self.total_short -= player.stock
+        self.total_cash += player.cash
+        self.total_debt += player.debt
+        self.players += 1
+
+    def remove(self, player):
+        if player.stock > 0: self.total_long -= player.stock
+        elif player.stock < 0: self.total_short += player.stock
+        self.total_cash -= player.cash
+        self.total_debt -= player.debt
+        self.players -= 1
+
+    def rebuild(self, players):
+        self.clear()
+        for p in players: self.add(p)
+
+    def rebuild_columns(self, cash, stock, debt):
+        """从列式账本整列重算 (结算、新一局这类所有账户一起变的场合)"""
+        self.total_long = int(stock[stock > 0].sum())
+        self.total_short = int(-stock[stock < 0].sum())
+        self.total_cash = float(cash.sum())
+        self.total_debt = float(debt.sum())
+        self.players = len(cash)
+
+    def snapshot(self):
+        return Totals(self.total_long, self.total_short, self.open_interest, self.total_cash, self.total_debt, self.players)
+
+    def verify(self, players, rel_tol=1e-9):
+        """从头重算一遍并与增量结果比较，返回不一致的字段列表 (空列表表示一致)"""
+        fresh = MarketAggregates()
+        fresh.rebuild(players)
+        mismatches = []
+        for field, expected, actual in zip(Totals._fields, fresh.snapshot(), self.snapshot()):
+            # 金额是浮点累加，允许相对误差；股数和人数必须完全相等
+            tolerance = rel_tol * max(1.0, abs(expected)) if isinstance(expected, float) else 0
+            if abs(expected - actual) > tolerance: mismatches.append((field, expected, actual))
+        return mismatches
@@ -0,0 +1,172 @@
+"""
+历史对局归档：每局结算后由战报写线程把整局数据写进一个 SQLite 库，
+跨局统计 (收割成功率、终盘价分布、老玩家的历史名次) 直接查库，不用再解析 savedata/ 里的 Markdown。
+
+表结构：
+- rounds          每局一行：房间、时间、起止价格、收割是否成功、散户总亏损、强平次数、总评
+- round_players   每局每个玩家一行：名次、身份、最终资产 (按 email 建索引)
+- candles         每局每根 K 线一行
+
+同时负责旧战报的轮转：只保留最近若干局的原始文件，更早的 Markdown 压成 .md.gz，
+结构化数据目录打成 .tar.gz，磁盘占用不会无限增长。
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import tarfile
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rounds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_id TEXT NOT NULL,
+    played_at TEXT NOT NULL,
+    play_date TEXT NOT NULL,
+    start_price REAL,
+    final_price REAL,
+    mm_success INTEGER,
+    retail_loss REAL,
+    harvest_target REAL,
+    players INTEGER,
+    losers INTEGER,
+    liquidations INTEGER,
+    final_summary TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_rounds_date ON rounds (play_date);
+CREATE INDEX IF NOT EXISTS idx_rounds_room ON rounds (room_id, played_at);
+CREATE TABLE IF NOT EXISTS round_players (
+    round_id INTEGER NOT NULL REFERENCES rounds (id),
+    email TEXT NOT NULL,
+    display_name TEXT,
+    role TEXT,
+    rank INTEGER,
+    final_worth REAL
+);
+CREATE INDEX IF NOT EXISTS idx_round_players_email ON round_players (email);
+CREATE INDEX IF NOT EXISTS idx_round_players_round ON round_players (round_id);
+CREATE TABLE IF NOT EXISTS candles (
+    round_id INTEGER NOT NULL REFERENCES rounds (id),
+    time INTEGER,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_candles_round ON candles (round_id, time);
+"""
+
+ARCHIVE_NAME = "archive.sqlite3"
+# 默认的战报目录 (相对工作目录)；基准和压测脚本把它指到临时目录
+SAVE_DIR = os.getenv("DARKPOOL_SAVE_DIR", "savedata")
+# 保留的原始战报局数
+KEEP_REPORTS = int(os.getenv("DARKPOOL_KEEP_REPORTS", "20"))
+_ARCHIVES = {}
+_ARCHIVES_LOCK = threading.Lock()
+
+def open_archive(save_dir=None):
+    """每个战报目录对应一个归档库，进程内共用同一个对象"""
+    if save_dir is None: save_dir = SAVE_DIR
+    with _ARCHIVES_LOCK:
+        archive = _ARCHIVES.get(save_dir)
+        if archive is None:
+            archive = _ARCHIVES[save_dir] = GameArchive(os.path.join(save_dir, ARCHIVE_NAME))
+        return archive
+
+class GameArchive:
+    def __init__(self, path):
+        self.path = path
+        # 写入只发生在战报写线程，这把锁只是防止多个写者同时建表
+        self.lock = threading.Lock()
+        self.ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self.ready:
+            with self.lock:
+                if not self.ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(SCHEMA)
+                    self.ready = True
+        return conn
+
+    def record(self, report):
+        """写入一局 (GameReport)，返回新的 round id"""
+        stats = report.stats or {}
+        ts = report.timestamp
+        played_at = f"{ts[0:4]}-{ts[4:6]}-{ts[6:8]} {ts[9:11]}:{ts[11:13]}:{ts[13:15]}"
+        conn = self._connect()
+        try:
+            with conn:
+                cur = conn.execute(
+                    "INSERT INTO rounds (room_id, played_at, play_date, start_price, final_price, mm_success, retail_loss,"
+                    " harvest_target, players, losers, liquidations, final_summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (report.room_id, played_at, played_at[:10], stats.get("start_price"), report.final_price,
+                     None if "mm_success" not in stats else int(stats["mm_success"]), stats.get("total_retail_loss"),
+                     stats.get("harvest_target"), len(report.standings), stats.get("losers_count"),
+                     stats.get("liquidations"), report.final_summary),
+                )
+                round_id = cur.lastrowid
+                conn.executemany(
+                    "INSERT INTO round_players (round_id, email, display_name, role, rank, final_worth) VALUES (?, ?, ?, ?, ?, ?)",
+                    ((round_id, email, name, role, rank, cash) for rank, email, name, role, cash in report.standings),
+                )
+                cols = report.kline.columns()
+                rows = zip(*(cols[n].tolist() for n in report.kline.COLUMNS))
+                conn.executemany(
+                    "INSERT INTO candles (round_id, time, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ((round_id,) + row for row in rows),
+                )
+            return round_id
+        finally:
+            conn.close()
+
+    def _query(self, sql, args=()):
+        if not os.path.exists(self.path): return []
+        conn = self._connect()
+        try: return conn.execute(sql, args).fetchall()
+        finally: conn.close()
+
+    # ===== 查询接口 (管理端用) =====
+    def summary(self, since=None):
+        """总局数、收割成功率、平均终盘价、平均强平次数；since 为 'YYYY-MM-DD' 时只统计该日期之后"""
+        where, args = ("WHERE play_date >= ?", (since,)) if since else ("", ())
+        rows = self._query(
+            f"SELECT COUNT(*), AVG(mm_success), AVG(final_price), MIN(final_price), MAX(final_price), AVG(liquidations) FROM rounds {where}", args)
+        count, success, avg_price, min_price, max_price, liquidations = rows[0] if rows else (0, None, None, None, None, None)
+        return {"rounds": count, "mm_success_rate": success, "avg_final_price": avg_price,
+                "min_final_price": min_price, "max_final_price": max_price, "avg_liquidations": liquidations}
+
+    def recent_rounds(self, limit=10, room_id=None):
+        where, args = ("WHERE room_id = ?", (room_id,)) if room_id else ("", ())
+        return self._query(
+            f"SELECT id, room_id, played_at, final_price, mm_success, players, liquidations FROM rounds {where} ORDER BY played_at DESC, id DESC LIMIT ?",
+            args + (limit,))
+
+    def player_history(self, email, limit=20):
+        """某个玩家的历史对局：(round id, 时间, 房间, 身份, 名次, 人数, 最终资产)"""
+        return self._query(
+            "SELECT r.id, r.played_at, r.room_id, p.role, p.rank, r.players, p.final_worth FROM round_players p"
+            " JOIN rounds r ON r.id = p.round_id WHERE p.email = ? ORDER BY r.played_at DESC LIMIT ?",
+            (email, limit))
+
+    def candles(self, round_id):
+        return self._query("SELECT time, open, high, low, close, volume FROM candles WHERE round_id = ? ORDER BY time", (round_id,))
+
+def rotate_reports(save_dir, keep=20):
+    """只保留最近 keep 局的原始战报，更早的压缩存放；返回本次压缩的局数"""
+    # 多个房间的战报文件名前缀不同，按修改时间排序
+    reports = [name for name in os.listdir(save_dir) if name.startswith("game_report_") and name.endswith(".md")]
+    reports.sort(key=lambda name: os.path.getmtime(os.path.join(save_dir, name)))
+    rotated = 0
+    for name in reports[:-keep] if keep > 0 else reports:
+        path = os.path.join(save_dir, name)
+        with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst: shutil.copyfileobj(src, dst)
+        os.remove(path)
+        data_dir = os.path.join(save_dir, "game_" + name[len("game_report_"):-len(".md")])
+        if os.path.isdir(data_dir):
+            with tarfile.open(data_dir + ".tar.gz", "w:gz") as tar: tar.add(data_dir, arcname=os.path.basename(data_dir))
+            shutil.rmtree(data_dir)
+        rotated += 1
+    return rotated
@@ -0,0 +1,83 @@
+"""
+多周期 K 线聚合 (盘中跳动模式用)：每来一个价格跳动，同时更新 1 分钟、5 分钟 K 线，每个周期 O(1)。
+已走完的 K 线追加进各自的 OHLCVStore (只追加，快照可以共享内存)，进行中的那一根单独放着，
+换周期时才落进存储。时间单位是游戏内的分钟：第 h 小时第 m 分钟为 h * 60 + m。
+
+另外提供 LTTB (Largest-Triangle-Three-Buckets) 降采样：跳动很多时图表只取固定数量的点，
+仍然保留走势的形状和极值。
+"""
+import numpy as np
+from scripts.ohlcv import OHLCVStore
+
+class BarAggregator:
+    # 各周期的名字和长度 (分钟)；小时 K 线仍由 GameState.kline_data 在整点收盘时写入
+    RESOLUTIONS = (("1m", 1), ("5m", 5))
+
+    def __init__(self):
+        self.stores = {name: OHLCVStore() for name, _ in self.RESOLUTIONS}
+        # 进行中的 K 线 [时间, 开, 高, 低, 收, 量]
+        self.current = {name: None for name, _ in self.RESOLUTIONS}
+        self.version = 0
+        self._frozen = None
+
+    def __len__(self):
+        return self.version
+
+    def update(self, t, price, volume=0):
+        for name, minutes in self.RESOLUTIONS:
+            bucket = int(t // minutes) * minutes
+            bar = self.current[name]
+            if bar is not None and bar[0] == bucket:
+                if price > bar[2]: bar[2] = price
+                if price < bar[3]: bar[3] = price
+                bar[4] = price
+                bar[5] += volume
+                continue
+            if bar is not None: self.stores[name].append(*bar)
+            self.current[name] = [bucket, price, price, price, price, volume]
+        self.version += 1
+
+    def frozen(self):
+        """
+        只读快照 (版本号, {周期: (已走完的 K 线 OHLCVStore 快照, 进行中的那一根或 None)})。
+        已走完的部分共享内存，进行中的那一根拷成元组，每次跳动的代价与 K 线根数无关；
+        需要完整各列时用 bar_columns 拼起来。没有新跳动时返回同一个对象。
+        """
+        if self._frozen is None or self._frozen[0] != self.version:
+            views = {}
+            for name, _ in self.RESOLUTIONS:
+                bar = self.current[name]
+                views[name] = (self.stores[name].frozen(), tuple(bar) if bar is not None else None)
+            self._frozen = (self.version, views)
+        return self._frozen
+
+def bar_columns(view):
+    """把 frozen() 里某个周期的 (已走完, 进行中) 拼成完整各列 (画图时才拼，代价随根数增长)"""
+    done, bar = view
+    cols = done.columns()
+    if bar is None: return cols
+    return {c: np.append(cols[c], v) for c, v in zip(OHLCVStore.COLUMNS, bar)}
+
+def lttb(x, y, threshold):
+    """
+    LTTB 降采样：返回保留点的下标 (升序，含首尾)。
+    每个桶里选与"上一个保留点"和"下一个桶的平均点"围成三角形面积最大的点。
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3: return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if end >= next_end: avg_x, avg_y = x[n - 1], y[n - 1]
+        else: avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    indices[-1] = n - 1
+    return indices
@@ -0,0 +1,87 @@
+"""
+单写者命令引擎：所有修改游戏状态的命令都排进同一个队列，由一个专用线程按顺序执行。
+前端请求线程、自动时钟线程、后台点评线程只负责提交命令并等待 Future。
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class CommandEngine:
+    def __init__(self, name="game-engine"):
+        self.queue = queue.Queue()
+        self.stats_lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.max_wait = 0.0
+        self.started_at = time.time()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def in_engine_thread(self):
+        return threading.current_thread() is self.thread
+
+    def submit(self, fn, *args):
+        """提交命令，返回 Future；引擎线程内部的嵌套调用直接执行，避免自己等自己"""
+        fut = Future()
+        if self.in_engine_thread():
+            self._execute(fn, args, fut)
+            return fut
+        self.queue.put((fn, args, fut, time.perf_counter()))
+        return fut
+
+    def post(self, fn, *args):
+        """提交命令，返回 Future；即使在引擎线程内部也排到队尾，不嵌套执行"""
+        fut = Future()
+        self.queue.put((fn, args, fut, time.perf_counter()))
+        return fut
+
+    def call(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    def _execute(self, fn, args, fut):
+        if not fut.set_running_or_notify_cancel(): return
+        try: result = fn(*args)
+        except BaseException as e:
+            fut.set_exception(e)
+            return False
+        fut.set_result(result)
+        return True
+
+    def stop(self):
+        """排在已提交命令之后退出引擎线程 (房间关闭时用)，之后不要再提交命令"""
+        if self.in_engine_thread(): raise RuntimeError("不能在引擎线程内部停止引擎")
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None: return
+            fn, args, fut, enqueued_at = item
+            started = time.perf_counter()
+            ok = self._execute(fn, args, fut)
+            finished = time.perf_counter()
+            with self.stats_lock:
+                self.processed += 1
+                if ok is False: self.failed += 1
+                self.busy_seconds += finished - started
+                self.max_wait = max(self.max_wait, started - enqueued_at)
+
+    def get_stats(self):
+        """
+        processed / busy_seconds 就是引擎的理论吞吐上限 (命令/秒)，
+        和实际到达速率 (rate) 对比即可看出离饱和还有多远。
+        """
+        with self.stats_lock:
+            elapsed = max(1e-9, time.time() - self.started_at)
+            return {
+                "processed": self.processed,
+                "failed": self.failed,
+                "queue_depth": self.queue.qsize(),
+                "rate": self.processed / elapsed,
+                "ceiling": self.processed / self.busy_seconds if self.busy_seconds > 0 else 0.0,
+                "avg_service_us": self.busy_seconds / self.processed * 1e6 if self.processed else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+            }
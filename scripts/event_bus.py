@@ -0,0 +1,134 @@
+"""
+事件总线：引擎线程每执行完一条命令就发布这次产生的事件 (tick / fill / liquidation / news / message ...)，
+所有订阅者各自持有一个有界队列。扇出统一由一个分发线程完成，不占用引擎线程，
+负载随事件数量增长，而不是随 "客户端数 × 轮询频率" 增长。
+
+异步前端 (Gradio 的推送流) 用 subscribe_async：事件经 call_soon_threadsafe 投进事件循环里的 asyncio.Queue，
+空闲的订阅者只是一个挂起的协程，不占任何线程。
+"""
+import asyncio
+import queue
+import threading
+
+class Subscription:
+    def __init__(self, bus, maxsize):
+        self.bus = bus
+        self.queue = queue.Queue(maxsize)
+        # 消费太慢导致丢过事件时置位，客户端应做一次全量刷新
+        self.lagged = False
+        self.closed = False
+
+    def _offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            try: self.queue.get_nowait()
+            except queue.Empty: pass
+            self.lagged = True
+            self.bus.dropped += 1
+            try: self.queue.put_nowait(event)
+            except queue.Full: pass
+
+    def wait(self, timeout=None):
+        """阻塞等待至少一个事件，然后把已到达的事件一次取完；超时返回空列表"""
+        try: events = [self.queue.get(timeout=timeout)]
+        except queue.Empty: return []
+        while True:
+            try: events.append(self.queue.get_nowait())
+            except queue.Empty: return events
+
+    def close(self):
+        if self.closed: return
+        self.closed = True
+        self.bus.unsubscribe(self)
+
+class AsyncSubscription:
+    """事件循环版的订阅：分发线程只负责把事件交给事件循环，入队和丢弃都在循环线程里做"""
+    def __init__(self, bus, maxsize, loop):
+        self.bus = bus
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.lagged = False
+        self.closed = False
+
+    def _offer(self, event):
+        try: self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError: self.close()  # 事件循环已关闭
+
+    def _put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.lagged = True
+            self.bus.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def wait(self, timeout=None):
+        """等待至少一个事件，然后把已到达的事件一次取完；超时返回空列表"""
+        try: events = [await asyncio.wait_for(self.queue.get(), timeout)]
+        except asyncio.TimeoutError: return []
+        while not self.queue.empty(): events.append(self.queue.get_nowait())
+        return events
+
+    def close(self):
+        if self.closed: return
+        self.closed = True
+        self.bus.unsubscribe(self)
+
+class _Dispatcher:
+    """所有事件总线共用的扇出线程"""
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def put(self, bus, event):
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name="event-fanout", daemon=True)
+                    self.thread.start()
+        self.queue.put((bus, event))
+
+    def _run(self):
+        while True:
+            bus, event = self.queue.get()
+            try: bus._deliver(event)
+            except Exception as e: print(f"Event fan-out failed: {e}")
+
+_DISPATCHER = _Dispatcher()
+
+class EventBus:
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self):
+        sub = Subscription(self, self.maxsize)
+        with self.lock: self.subscribers.add(sub)
+        return sub
+
+    def subscribe_async(self):
+        """在事件循环里调用，返回 AsyncSubscription"""
+        sub = AsyncSubscription(self, self.maxsize, asyncio.get_running_loop())
+        with self.lock: self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock: self.subscribers.discard(sub)
+
+    def publish(self, event):
+        self.published += 1
+        _DISPATCHER.put(self, event)
+
+    def _deliver(self, event):
+        with self.lock: subs = list(self.subscribers)
+        for sub in subs: sub._offer(event)
+        self.delivered += len(subs)
+
+    def stats(self):
+        with self.lock: n = len(self.subscribers)
+        return {"subscribers": n, "published": self.published, "delivered": self.delivered, "dropped": self.dropped}
@@ -1,24 +1,61 @@
+import os
 import random
 import math
-import os
 import time
-import threading
 import secrets # <--- 新增：用于生成安全Token
+import numpy as np
+from collections import namedtuple, deque
 from datetime import datetime
+from scripts.engine import CommandEngine
+from scripts.liquidation_index import LiquidationIndex
+from scripts.aggregates import MarketAggregates
+from scripts.ohlcv import OHLCVStore
+from scripts.bars import BarAggregator
+from scripts.leaderboard import Leaderboard
+from scripts.ring_buffer import SeqRing
+from scripts.event_bus import EventBus
+from scripts.scheduler import SCHEDULER
+from scripts.ledger import PlayerLedger, ROLE_NAMES, ROLE_CODES, ROLE_MM, INITIAL_CASH, column_property
+from scripts.trade_ledger import TradeLedger, BUY, SELL, SHORT, LIQUIDATION, INTEL_UP, INTEL_DOWN, LOAN, WARNING
+from scripts.order_book import OrderBook, GTC, IOC, BUY as BID, SELL as ASK
+from scripts.archive import SAVE_DIR
 
-class Player:
-    def __init__(self, email, display_name):
-        self.email = email
-        self.display_name = display_name
-        self.role = "散户"
-        self.cash = 1000000.0
-        self.stock = 0
-        self.debt = 0.0
-        self.logs = []
-        self.last_event = None 
-        self.last_trade_turn = -99
-        # 新增：保存用户的个人Token，防止重复生成
-        self.token = None 
+# 市场快照：状态有变化时由引擎整体替换一次并递增 version，
+# 读者只需读一次 game.snapshot 引用，拿到的永远是同一时刻的一组值
+MarketSnapshot = namedtuple("MarketSnapshot", [
+    "version", "phase", "is_running", "game_clock", "current_price",
+    "hourly_trend", "current_momentum", "short_pressure", "totals",
+    "kline", "recent_logs", "recent_messages", "logs_seq", "messages_seq",
+    "logs_text", "messages_text", "admin_logs_text", "admin_messages_text",
+    "final_summary", "bars", "book_depth",
+])
+# 快照里保留的日志/留言条数：玩家端显示 20 条，管理端 30 条
+SNAPSHOT_TAIL = 30
+PLAYER_TAIL = 20
+# 日志/留言环形缓冲的容量
+LOG_CAPACITY = 200
+MESSAGE_CAPACITY = 1000
+
+# 成交模式：house 为原来的按当前价和系统直接成交；book 为限价订单簿撮合 (scripts/order_book.py)
+MARKET_MODES = {"house": "系统直接成交", "book": "订单簿撮合"}
+# 撮合模式下系统在当前价两侧挂的阶梯报价：档数、每档股数、每档间距，每小时收盘后重挂
+HOUSE_LEVELS = 5
+HOUSE_SIZE = 1000
+HOUSE_STEP = 0.005
+# 发布的盘口档数
+BOOK_DEPTH = 5
+
+# 盘中跳动：每小时最多的跳动次数 (1 次/游戏分钟)；每次跳动的随机噪声按 1/sqrt(次数) 缩小，整小时的波动幅度与原来相当
+MAX_TICKS_PER_HOUR = 60
+
+# 批量下单里的一单：price 为 None 时是市价单 (直接成交模式下等同 buy_stock / sell_stock)
+OrderRequest = namedtuple("OrderRequest", ["email", "side", "quantity", "price", "tif"], defaults=(None, GTC))
+# 一批最多的订单数：整批在引擎里一次执行完，太大会让同房间其他玩家排队太久
+MAX_BATCH_ORDERS = 1000
+
+class PlayerAccount:
+    """账户计算：实时视图 Player 和只读副本 FrozenPlayer 共用"""
+    __slots__ = ()
 
     def get_net_worth(self, current_price):
         stock_value = self.stock * current_price
@@ -56,21 +93,131 @@ class Player:
             
         return " | ".join(status)
 
+class Player(PlayerAccount):
+    """
+    玩家：资金、持仓、负债、上次交易时间和身份存在列式账本 (scripts/ledger.py) 的同一行里，
+    这里只保存行号和不参与计算的字段。注册顺序就是行号。
+    逐笔交易记录不挂在玩家身上，统一记在 GameState.trades (scripts/trade_ledger.py)。
+    """
+    __slots__ = ("ledger", "row", "email", "display_name", "last_event", "token")
+
+    def __init__(self, ledger, email, display_name):
+        self.ledger = ledger
+        self.row = ledger.add(email)
+        self.email = email
+        self.display_name = display_name
+        self.last_event = None 
+        # 新增：保存用户的个人Token，防止重复生成
+        self.token = None 
+
+    cash = column_property("cash")
+    stock = column_property("stock")
+    debt = column_property("debt")
+    last_trade_turn = column_property("last_trade_turn")
+
+    @property
+    def role(self):
+        return ROLE_NAMES[self.ledger.cols["role"].item(self.row)]
+
+    @role.setter
+    def role(self, name):
+        self.ledger.cols["role"][self.row] = ROLE_CODES[name]
+
+    @property
+    def seq(self):
+        # 注册顺序，索引里用它保证和按字典顺序遍历的结果一致
+        return self.row
+
+    def freeze(self):
+        """只读副本：给前端展示用，引擎线程之后的修改不会影响它"""
+        return FrozenPlayer(self.email, self.display_name, self.role, self.cash, self.stock, self.debt,
+                            self.last_event, self.last_trade_turn, self.token, self.row)
+
+class FrozenPlayer(PlayerAccount):
+    __slots__ = ("email", "display_name", "role", "cash", "stock", "debt", "last_event", "last_trade_turn", "token", "seq")
+
+    def __init__(self, email, display_name, role, cash, stock, debt, last_event, last_trade_turn, token, seq):
+        self.email, self.display_name, self.role = email, display_name, role
+        self.cash, self.stock, self.debt = cash, stock, debt
+        self.last_event, self.last_trade_turn, self.token, self.seq = last_event, last_trade_turn, token, seq
+
 class GameState:
-    def __init__(self):
+    # 所有会修改状态的命令：统一由引擎线程顺序执行 (实现见同名的 _xxx 方法)
+    COMMANDS = (
+        "register", "start_game", "next_hour", "prepare_next_round",
+        "purchase_intel", "buy_stock", "sell_stock", "take_loan", "post_message",
+        "post_commentary", "post_final_summary",
+        "clock_tick", "pause_clock", "resume_clock", "set_seconds_per_hour",
+        "place_order", "cancel_order", "set_market_mode", "submit_orders", "price_tick",
+    )
+
+    # 不进快照的运行时对象：线程、队列、订阅者和可以从玩家数据重建的索引
+    TRANSIENT = (
+        "engine", "events", "clock", "ticker", "journal", "snapshot", "views", "leaderboard", "standings", "liquidation_index",
+        "tick_durations", "tick_lateness", "_pending_events", "_touched", "_touched_all", "replaying",
+        "_now", "_seed", "_rng", "_draws", "book_depth", "_book_version", "save_dir",
+    )
+
+    def __init__(self, engine=None, room_id="main", journal=None, save_dir=None):
+        # 房间号：多房间部署时区分不同的桌子 (见 scripts/rooms.py)
+        self.room_id = room_id
+        # 战报和归档库的目录 (运行配置，不进快照)
+        self.save_dir = save_dir or SAVE_DIR
+        # 玩家的资金/持仓等数值列放在账本里，players 里的 Player 只是按行号指过去的视图
+        self.ledger = PlayerLedger()
         self.players = {}
         # 【新增】Token 映射表 {token_string: email_string}
         self.token_map = {} 
         self.seconds_per_hour = 3600 
+        self.round_id = 0
+        self.market_mode = os.getenv("DARKPOOL_MARKET_MODE", "house")
+        if self.market_mode not in MARKET_MODES: self.market_mode = "house"
+        self._book_version = None
+        # 盘中跳动：每小时跳几次 (0 为关闭，价格只在整点变化)，开启后额外记录 1 分钟 / 5 分钟 K 线
+        self.ticks_per_hour = max(0, min(MAX_TICKS_PER_HOUR, int(os.getenv("DARKPOOL_TICKS_PER_HOUR", "0"))))
+        # 【新增】单写者引擎：前端只读 views / snapshot，不直接碰 players
+        self.engine = engine if engine else CommandEngine(name=f"game-engine-{room_id}")
+        self.version = 0
+        self.views = {}
+        self.snapshot = None
+        self._touched = set()
+        self._touched_all = False
+        # 【新增】空头强平价格索引 + 全市场汇总 + 排行榜
+        self.liquidation_index = LiquidationIndex()
+        self.aggregates = MarketAggregates()
+        self.leaderboard = Leaderboard()
+        # 排行榜的只读快照，和 views 一起在每次发布时更新，请求线程只读它
+        self.standings = self.leaderboard.frozen()
+        # 【新增】推送通道：命令执行中产生的事件，在快照发布后带上版本号统一广播
+        self.events = EventBus()
+        self._pending_events = []
+        # 最近若干次整点收盘 (含结算) 的耗时，单位秒
+        self.tick_durations = deque(maxlen=256)
+        # 自动时钟：共用调度线程上的一个定时任务，每局开盘创建、结束或重置时取消
+        self.clock = None
+        self.ticker = None
+        # 自动收盘实际执行时间相对计划时间的延迟 (含引擎排队)，单位秒
+        self.tick_lateness = deque(maxlen=256)
+        # 【新增】预写日志：每条命令连同它用到的时间戳、随机种子和外部取值一起记下来，重放时结果完全一致
+        self.journal = journal
+        self.replaying = False
+        self._now = time.time()
+        self._seed = None
+        self._rng = None
+        self._draws = None
         self.reset()
+        self._publish()
+        if journal is not None: self.engine.call(self._recover)
 
     def reset(self):
+        # 轮次编号：后台点评晚到时用来丢弃上一局的结果
+        self.round_id += 1
         self.is_running = False
         self.phase = "报名阶段"
         self.game_clock = 0
-        self.system_logs = []
+        self.system_logs = SeqRing(LOG_CAPACITY)
         # 注意：Token和玩家数据不重置，保证掉线重连
-        self.messages = []
+        self.messages = SeqRing(MESSAGE_CAPACITY)
         
         self.base_price = 100.0
         self.current_price = 100.0
@@ -79,23 +226,256 @@ class GameState:
         self.volatility_limit = 0.30 
         self.history = [100.0]
         self.short_pressure = 0.0
-        self.kline_data = [] 
+        self.kline_data = OHLCVStore()
         self.current_open = 100.0 
         self.current_volume = 0
         self.final_summary = ""
+        # 盘中跳动：分钟级 K 线、本小时已跳次数、本小时走过的最高/最低价、上次跳动时的累计成交量
+        self.bars = BarAggregator()
+        self.hour_ticks = 0
+        self.hour_tick_high = self.hour_tick_low = None
+        self._tick_volume = 0
+        # 本局所有玩家的逐笔记录 (成交、费用、贷款、舆情、强平、结算)
+        self.trades = TradeLedger()
+        # 撮合模式下本局的订单簿和发布给前端的盘口；本小时实际成交的最高/最低价 (计入 K 线)
+        self.book = OrderBook() if self.market_mode == "book" else None
+        self.book_depth = ((), ())
+        self.hour_trade_high = self.hour_trade_low = None
+        # 结算统计 (收割是否成功等)，写进战报和归档库
+        self.final_stats = None
+        self.liquidation_count = 0
+        # 本小时被打上 last_event 的玩家，下一次收盘时清掉
+        self._flagged = []
+
+    # ===== 命令调度 =====
+    def submit(self, command, *args):
+        """把命令排进引擎队列，返回 Future"""
+        if command not in self.COMMANDS: raise ValueError(f"未知命令: {command}")
+        # 命令执行中 (引擎线程上) 提交的命令，比如点评队列满时同步回调的模板文案，排到队尾再执行：
+        # 嵌套执行会覆盖外层命令的随机种子和外部取值，日志里记下的就不是外层实际用到的了
+        if self.engine.in_engine_thread(): return self.engine.post(self._apply, command, *args)
+        return self.engine.submit(self._apply, command, *args)
+
+    def _apply(self, command, *args):
+        self._now = time.time()
+        self._seed = self._rng = None
+        self._draws = []
+        try: return getattr(self, f"_{command}")(*args)
+        finally:
+            if self.journal is not None:
+                self.journal.append((command, args, self._now, self._seed, self._draws or None))
+                if self.journal.should_snapshot(): self.journal.write_snapshot(self.__getstate__())
+            self._publish()
+
+    # ===== 确定性输入 =====
+    # 命令里所有不确定的东西都经过这里：正常执行时取值并记进日志，重放时直接用日志里的值
+    @property
+    def rng(self):
+        if self._rng is None:
+            if self._seed is None: self._seed = random.getrandbits(64)
+            self._rng = random.Random(self._seed)
+        return self._rng
+
+    def _draw(self, producer):
+        if self.replaying: return self._draws.pop(0)
+        value = producer()
+        self._draws.append(value)
+        return value
+
+    # ===== 快照与恢复 =====
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in self.TRANSIENT: state.pop(key, None)
+        return state
+
+    def _recover(self):
+        """引擎线程执行：载入最新快照，再重放之后的日志"""
+        started = time.perf_counter()
+        state, entries = self.journal.load()
+        if state is not None:
+            # 运行时对象保留当前实例的，其余全部用快照覆盖
+            self.__dict__.update(state)
+            self.leaderboard = Leaderboard()
+            self.liquidation_index = LiquidationIndex()
+        self.replaying = True
+        try:
+            for command, args, now, seed, draws in entries:
+                self._now, self._seed, self._rng = now, seed, None
+                self._draws = list(draws or ())
+                try: getattr(self, f"_{command}")(*args)
+                except Exception as e: print(f"[Journal] 重放 {command} 失败: {e}")
+        finally:
+            self.replaying = False
+        self._touch_all()
+        self._book_version = None
+        self._publish()
+        if self.is_running and self.game_clock < 12: self._start_clock()
+        if state is not None or entries:
+            print(f"[Journal] 房间 {self.room_id} 已恢复: 快照 {'有' if state is not None else '无'} + 重放 {len(entries)} 条，耗时 {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    def _touch(self, player):
+        self._touched.add(player)
+
+    def _touch_all(self):
+        self._touched_all = True
+
+    def _publish(self):
+        # 只在引擎线程调用：先让派生索引跟上被改动的玩家，再刷新只读副本，最后发布市场快照
+        # 价格一动所有人的净值都变了，排行榜整体重排一次；否则只挪动被改动的玩家
+        rerank = self._touched_all or self.leaderboard.price != self.current_price
+        if rerank: self.leaderboard.rebuild_columns(self.ledger.net_worth(self.current_price), self.ledger.emails, self.current_price)
+        if self._touched_all:
+            roster = list(self.players.values())
+            shorts = np.flatnonzero(self.ledger.column("stock") < 0).tolist()
+            self.liquidation_index.rebuild(roster[i] for i in shorts)
+            self.views = self._freeze_all(roster)
+        elif self._touched:
+            # views 每次发布换一个新字典 (写时复制)，请求线程手里的旧引用永远不会被改动
+            views = dict(self.views)
+            for p in self._touched:
+                self.liquidation_index.update(p)
+                if not rerank: self.leaderboard.update(p, self.current_price)
+                views[p.email] = p.freeze()
+            self.views = views
+        self.standings = self.leaderboard.frozen()
+        self._touched.clear()
+        self._touched_all = False
+        if self.book is not None and self.book.version != self._book_version:
+            bids, asks = self.book.depth(BOOK_DEPTH)
+            self.book_depth = (tuple(bids), tuple(asks))
+            self._book_version = self.book.version
+        self._publish_snapshot()
+        if self._pending_events:
+            events, self._pending_events = self._pending_events, []
+            for event in events:
+                event["version"] = self.version
+                self.events.publish(event)
+
+    def _freeze_all(self, roster):
+        # 一次取出整列再批量建副本，不逐个玩家读账本
+        led = self.ledger
+        cash, stock, debt, turns = (led.column(n).tolist() for n in ("cash", "stock", "debt", "last_trade_turn"))
+        roles = [ROLE_NAMES[r] for r in led.column("role").tolist()]
+        return {
+            p.email: FrozenPlayer(p.email, p.display_name, role, c, s, d, p.last_event, t, p.token, p.row)
+            for p, role, c, s, d, t in zip(roster, roles, cash, stock, debt, turns)
+        }
+
+    def _emit(self, kind, **data):
+        data["kind"] = kind
+        self._pending_events.append(data)
+
+    def _publish_snapshot(self):
+        prev = self.snapshot
+        kline = self.kline_data.frozen()
+        bars = self.bars.frozen()
+        logs = tuple(self.system_logs.tail(SNAPSHOT_TAIL))
+        messages = tuple(self.messages.tail(SNAPSHOT_TAIL))
+        fields = (
+            self.phase, self.is_running, self.game_clock, self.current_price,
+            self.hourly_trend, self.current_momentum, self.short_pressure, self.aggregates.snapshot(),
+            kline, logs, messages, self.system_logs.last_seq, self.messages.last_seq,
+        )
+        # 被拒绝的交易等没有改变任何东西的命令，不产生新版本；盘口变了 (挂单、撤单) 也要发新版本
+        if (prev is not None and prev[1:14] == fields and prev.final_summary == self.final_summary
+                and prev.bars is bars and prev.book_depth == self.book_depth): return
+        # 拼接好的文本也随快照共享，所有会话轮询时不再各自 join
+        if prev is not None and prev.recent_logs == logs:
+            logs_texts = (prev.logs_text, prev.admin_logs_text)
+        else:
+            logs_texts = ("\n".join(logs[-PLAYER_TAIL:]), "\n".join(logs))
+        if prev is not None and prev.recent_messages == messages:
+            messages_texts = (prev.messages_text, prev.admin_messages_text)
+        else:
+            messages_texts = ("\n".join(messages[-PLAYER_TAIL:] or ["暂无留言..."]), "\n".join(messages or ["暂无留言..."]))
+        self.version += 1
+        self.snapshot = MarketSnapshot(
+            self.version, *fields,
+            logs_texts[0], messages_texts[0], logs_texts[1], messages_texts[1],
+            self.final_summary, bars, self.book_depth,
+        )
+
+    # ===== 账户变动 =====
+    # 所有资金/持仓/债务的变动都走这两个方法，顺带维护全市场汇总
+    def _set_account(self, p, cash, stock, debt):
+        self.aggregates.remove(p)
+        p.cash, p.stock, p.debt = cash, stock, debt
+        self.aggregates.add(p)
+        self._touch(p)
+
+    def _adjust(self, p, cash=0.0, stock=0, debt=0.0):
+        self._set_account(p, p.cash + cash, p.stock + stock, p.debt + debt)
+
+    def check_aggregates(self):
+        """一致性检查：在引擎线程里从头重算汇总，返回不一致的字段"""
+        return self.engine.call(lambda: self.aggregates.verify(self.players.values()))
+
+    def register(self, email, name): return self.submit("register", email, name).result()
+    def start_game(self): return self.submit("start_game").result()
+    def next_hour(self): return self.submit("next_hour").result()
+    def prepare_next_round(self): return self.submit("prepare_next_round").result()
+    def purchase_intel(self, email, direction): return self.submit("purchase_intel", email, direction).result()
+    def buy_stock(self, email, quantity): return self.submit("buy_stock", email, quantity).result()
+    def sell_stock(self, email, quantity): return self.submit("sell_stock", email, quantity).result()
+    def take_loan(self, email, amount): return self.submit("take_loan", email, amount).result()
+    def post_message(self, email, content): return self.submit("post_message", email, content).result()
+    def pause_clock(self): return self.submit("pause_clock").result()
+    def resume_clock(self): return self.submit("resume_clock").result()
+    def set_seconds_per_hour(self, seconds): return self.submit("set_seconds_per_hour", seconds).result()
+    def place_order(self, email, side, quantity, price=None, tif=GTC): return self.submit("place_order", email, side, quantity, price, tif).result()
+    def cancel_order(self, email, order_id): return self.submit("cancel_order", email, order_id).result()
+    def set_market_mode(self, mode): return self.submit("set_market_mode", mode).result()
+    def submit_orders(self, batch): return self.submit("submit_orders", list(batch)).result()
+
+    def get_open_orders(self, email):
+        """某个玩家在簿上的挂单 [(订单号, 方向, 价格, 剩余, 原始数量)]"""
+        return self.engine.call(lambda: self.book.open_orders(email) if self.book is not None else [])
+
+    # ===== 逐笔记录查询 (不经过引擎，代价只和页大小有关) =====
+    def get_trade_history(self, email, cursor=None, limit=20):
+        """某个玩家从新到旧的一页记录 [TradeRecord, ...] 和下一页游标 (没有更多时为 None)"""
+        p = self.views.get(email)
+        if p is None: return [], None
+        return self.trades.page(p.seq, cursor, limit)
+
+    def get_trade_summary(self, email):
+        """(记录条数, 已实现盈亏, 累计费用)"""
+        p = self.views.get(email)
+        if p is None: return 0, 0.0, 0.0
+        return self.trades.summary(p.seq)
+
+    def get_risk_summary(self):
+        """空头风险分布：整列计算风险率，阈值与 get_account_status 一致"""
+        def compute():
+            _, _, _, risk = self.ledger.margin(self.current_price)
+            short = self.ledger.column("stock") < 0
+            risk = risk[short]
+            return {
+                "shorts": int(short.sum()),
+                "critical": int((risk < 1.15).sum()),
+                "warning": int(((risk >= 1.15) & (risk < 1.35)).sum()),
+                "min_risk": float(risk.min()) if len(risk) else None,
+            }
+        return self.engine.call(compute)
+
+    def get_engine_stats(self):
+        return self.engine.get_stats()
+
+    def get_journal_stats(self):
+        return self.journal.stats() if self.journal is not None else None
 
     def log(self, message):
-        timestamp = datetime.now().strftime("%H:%M:%S")
+        timestamp = datetime.fromtimestamp(self._now).strftime("%H:%M:%S")
         self.system_logs.append(f"[{timestamp}] {message}")
-        if len(self.system_logs) > 200: self.system_logs.pop(0)
 
     # 【核心修改】注册/登录时生成 Token
-    def register(self, email, name):
+    def _register(self, email, name):
         is_new = False
         if email not in self.players:
-            new_player = Player(email, name)
-            if self.is_running: new_player.role = "散户"
+            new_player = Player(self.ledger, email, name)
             self.players[email] = new_player
+            self.aggregates.add(new_player)
+            self._emit("join", email=email, name=name)
             is_new = True
         
         player = self.players[email]
@@ -103,186 +483,352 @@ class GameState:
         # 如果玩家没有 Token，生成一个
         if not player.token:
             # 生成一个 16字节 的随机 URL 安全字符串
-            token = secrets.token_urlsafe(16)
+            token = self._draw(lambda: secrets.token_urlsafe(16))
             player.token = token
             self.token_map[token] = email
             print(f"[System] 为 {email} 生成 Token: {token}")
+        self._touch(player)
         
         return True, "注册成功" if is_new else "欢迎回来", player.token
 
     # 【新增】通过 Token 查找用户
     def get_user_by_token(self, token):
         email = self.token_map.get(token)
-        if email and email in self.players:
-            return self.players[email]
+        if email: return self.views.get(email)
         return None
 
-    def start_game(self):
+    def _start_game(self):
         if len(self.players) < 1: return "人数不足"
         if self.is_running: return "游戏已在运行中"
         self.is_running = True
         self.phase = "交易阶段"
         self.game_clock = 0
-        self.hourly_trend = random.uniform(-0.02, 0.02)
+        self.hourly_trend = self.rng.uniform(-0.02, 0.02)
         self.current_open = 100.0
         self.current_volume = 0
-        self.kline_data = []
+        self.kline_data = OHLCVStore()
+        self.bars = BarAggregator()
+        self.hour_ticks = 0
+        self.hour_tick_high = self.hour_tick_low = None
+        self._tick_volume = 0
         self.final_summary = ""
         
         emails = list(self.players.keys())
         num_mm = max(1, int(len(emails) * 0.1))
-        mm = random.sample(emails, num_mm)
+        mm = set(self.rng.sample(emails, num_mm))
         for e in self.players:
             self.players[e].role = "操盘手" if e in mm else "散户"
+        self._touch_all()
         
         self.log(f"开盘！共{len(self.players)}人。时钟设定: 1小时={self.seconds_per_hour}秒")
-        threading.Thread(target=self._auto_run_loop, daemon=True).start()
+        self._emit("phase", phase=self.phase)
+        if self.book is not None: self._quote_house()
+        # 重放时不启动任何外部动作，时钟在恢复完成后统一重建
+        if self.replaying: return "游戏开始"
+        self._stop_clock()
+        self._start_clock()
+        print(f"[System] 自动时钟已启动，每 {self.seconds_per_hour} 秒推进一小时。")
         return "游戏开始"
 
-    def _auto_run_loop(self):
-        print(f"[System] 自动时钟已启动，每 {self.seconds_per_hour} 秒推进一小时。")
-        while self.is_running and self.game_clock < 12:
-            time.sleep(self.seconds_per_hour)
-            if not self.is_running: break
-            print(f"[System] 自动推进时间 -> 第 {self.game_clock + 1} 小时")
-            self.next_hour()
+    # ===== 自动时钟 =====
+    def _start_clock(self):
+        # 开局和崩溃恢复都从这里起时钟，新闻预取池跟着一起启动 (重复调用无副作用)
+        from scripts.news_system import HEADLINE_POOL
+        HEADLINE_POOL.start()
+        self.clock = SCHEDULER.every(self.seconds_per_hour, self._on_clock, self.round_id, name=f"{self.room_id}-clock", with_due=True)
+        if self.ticks_per_hour:
+            self.ticker = SCHEDULER.every(self.seconds_per_hour / self.ticks_per_hour, self._on_ticker, self.round_id, name=f"{self.room_id}-ticker")
+
+    def _on_ticker(self, round_id):
+        self.submit("price_tick", round_id)
+
+    def _on_clock(self, round_id, due):
+        # 在调度线程上执行：只提交命令，不等待结果，免得拖慢其他房间的时钟
+        # 计划时间由调度器传进来，不读 self.clock (引擎线程可能正好把它置为 None)
+        self.submit("clock_tick", round_id, due)
+
+    def _clock_tick(self, round_id, due):
+        # 上一局遗留的触发直接丢弃
+        if round_id != self.round_id or not self.is_running: return
+        if not self.replaying: self.tick_lateness.append(time.monotonic() - due)
+        print(f"[System] 自动推进时间 -> 第 {self.game_clock + 1} 小时")
+        self._next_hour()
+
+    def _stop_clock(self):
+        if self.clock is not None: self.clock.cancel()
+        if self.ticker is not None: self.ticker.cancel()
+        self.clock = self.ticker = None
 
-    def next_hour(self):
+    def _pause_clock(self):
+        if self.clock is None: return "❌ 时钟未运行"
+        self.clock.pause()
+        if self.ticker is not None: self.ticker.pause()
+        self.log("⏸️ 时钟已暂停")
+        return "⏸️ 时钟已暂停"
+
+    def _resume_clock(self):
+        if self.clock is None: return "❌ 时钟未运行"
+        self.clock.resume()
+        if self.ticker is not None: self.ticker.resume()
+        self.log("▶️ 时钟已恢复")
+        return "▶️ 时钟已恢复"
+
+    def _set_seconds_per_hour(self, seconds):
+        seconds = float(seconds)
+        if seconds <= 0: return "❌ 无效的时长"
+        self.seconds_per_hour = seconds
+        if self.clock is not None: self.clock.reschedule(seconds)
+        if self.ticker is not None: self.ticker.reschedule(seconds / self.ticks_per_hour)
+        return f"✅ 1小时={seconds:g}秒"
+
+    def get_clock_stats(self):
+        clock = self.clock
+        return clock.stats() if clock is not None else None
+
+    def shutdown(self):
+        """关闭房间：停掉时钟和引擎线程，日志落盘"""
+        self._stop_clock()
+        self.engine.stop()
+        if self.journal is not None: self.journal.close()
+
+    def _next_hour(self):
         if not self.is_running or self.game_clock >= 12: return
+        started = time.perf_counter()
+        try: self._close_hour()
+        finally:
+            self.tick_durations.append(time.perf_counter() - started)
+            if self.game_clock >= 12: self._stop_clock()
+
+    def _price_tick(self, round_id):
+        """盘中跳动：把本小时的趋势和动能按跳动次数摊开，逐次走价格，同时更新分钟级 K 线"""
+        if round_id != self.round_id or not self.is_running or self.game_clock >= 12: return
+        n = self.ticks_per_hour
+        # 本小时的跳动已经走完 (定时器比整点收盘先到)，等收盘
+        if not n or self.hour_ticks >= n: return
+        if self.hour_ticks == 0: self.bars.update(self.game_clock * 60, self.current_open)
+        self.hour_ticks += 1
+        noise = self.rng.uniform(-0.01, 0.01) / math.sqrt(n)
+        change = (self.hourly_trend + self.current_momentum) / n + noise
+        self.current_price *= 1 + max(-0.5, min(0.5, change))
+        price = self.current_price
+        if self.hour_tick_high is None: self.hour_tick_high = self.hour_tick_low = price
+        elif price > self.hour_tick_high: self.hour_tick_high = price
+        elif price < self.hour_tick_low: self.hour_tick_low = price
+        # 这一跳的成交量 = 上一跳以来的累计成交量之差
+        volume = self.current_volume - self._tick_volume
+        self._tick_volume = self.current_volume
+        minute = self._tick_minute()
+        self.bars.update(minute, price, volume)
+        # 推送前端：盘中价格变了 (不等整点收盘)
+        self._emit("price", time=minute, price=price)
+
+    def _tick_minute(self):
+        # 第 k 跳代表本小时第 k 个区间，记在区间起点，保证最后一跳不落进下一小时
+        return self.game_clock * 60 + (self.hour_ticks - 1) * 60 / self.ticks_per_hour
+
+    def _close_hour(self):
         hour_open = self.current_open
-        prev_price = self.current_price 
-        noise = random.uniform(-0.01, 0.01)
-        change = self.hourly_trend + self.current_momentum + noise
-        change = max(-0.5, min(0.5, change))
-        self.current_price *= (1 + change)
-        hour_close = self.current_price
-        
-        volatility = abs(hour_open - hour_close) + (hour_open * 0.01)
-        hour_high = max(hour_open, hour_close) + random.uniform(0, volatility * 0.5)
-        hour_low = min(hour_open, hour_close) - random.uniform(0, volatility * 0.5)
+        # 盘中跳动模式下价格已经在本小时里走过了，涨跌幅以开盘价为基准
+        prev_price = hour_open if self.hour_ticks else self.current_price
+        if self.hour_ticks:
+            # 盘中跳动模式：价格已经逐跳走完，收盘价就是最新价，高低点是本小时实际走过的极值
+            hour_close = self.current_price
+            hour_high = max(hour_open, hour_close, self.hour_tick_high)
+            hour_low = min(hour_open, hour_close, self.hour_tick_low)
+            # 最后一跳之后的成交量并进最后一根分钟 K 线
+            if self.current_volume > self._tick_volume: self.bars.update(self._tick_minute(), hour_close, self.current_volume - self._tick_volume)
+            self.hour_ticks = 0
+            self.hour_tick_high = self.hour_tick_low = None
+            self._tick_volume = 0
+        else:
+            noise = self.rng.uniform(-0.01, 0.01)
+            change = self.hourly_trend + self.current_momentum + noise
+            change = max(-0.5, min(0.5, change))
+            self.current_price *= (1 + change)
+            hour_close = self.current_price
+            
+            volatility = abs(hour_open - hour_close) + (hour_open * 0.01)
+            hour_high = max(hour_open, hour_close) + self.rng.uniform(0, volatility * 0.5)
+            hour_low = min(hour_open, hour_close) - self.rng.uniform(0, volatility * 0.5)
+        if self.hour_trade_high is not None:
+            # 撮合模式：高低点包含本小时订单簿上的实际成交价
+            hour_high = max(hour_high, self.hour_trade_high)
+            hour_low = min(hour_low, self.hour_trade_low)
+            self.hour_trade_high = self.hour_trade_low = None
         
-        self.kline_data.append({
-            'time': self.game_clock,
-            'open': hour_open, 'high': hour_high, 'low': hour_low, 'close': hour_close,
-            'volume': self.current_volume
-        })
+        self.kline_data.append(self.game_clock, hour_open, hour_high, hour_low, hour_close, self.current_volume)
+        self._emit("tick", time=self.game_clock, open=hour_open, high=hour_high, low=hour_low, close=hour_close, volume=self.current_volume)
         self.game_clock += 1
         self.history.append(self.current_price)
         
-        from scripts.news_system import generate_hourly_comment, format_news_for_display
-        try:
-            hour_change_pct = ((hour_close - prev_price) / prev_price) * 100
-            comment = generate_hourly_comment(self.game_clock, hour_close, hour_change_pct, self.current_volume)
-            formatted_comment = format_news_for_display(comment, tag="🤖 盘面分析")
-            self.system_logs.append(formatted_comment)
-            self.messages.append(formatted_comment)
-        except: pass
+        # 盘面点评交给后台线程池，收盘不等 LLM (重放时点评已作为单独的命令记在日志里)
+        from scripts.news_system import COMMENTARY, build_hourly_prompt, hourly_comment_fallback
+        if not self.replaying:
+            try:
+                hour_change_pct = ((hour_close - prev_price) / prev_price) * 100
+                round_id = self.round_id
+                COMMENTARY.submit(
+                    build_hourly_prompt(self.game_clock, hour_close, hour_change_pct, self.current_volume),
+                    hourly_comment_fallback(hour_close),
+                    lambda comment: self.submit("post_commentary", round_id, comment),
+                )
+            except Exception as e: print(f"Commentary submit failed: {e}")
         
         self.current_open = self.current_price
         self.current_volume = 0
         self.current_momentum = 0.0 
         
-        maintenance_margin = 1.10
-        for p in self.players.values():
-            p.last_event = None 
-            if p.stock < 0:
-                short_val, frozen, avail, risk = p.get_margin_info(self.current_price)
-                if risk < maintenance_margin: self.liquidate_player(p)
-                elif risk < 1.3: p.logs.append(f"⚠️ 警告：保证金水平({risk:.2f})过低！")
+        self._margin_sweep()
 
         self.log(f"第 {self.game_clock} 小时收盘，股价 ${self.current_price:.2f}")
-        if self.game_clock >= 12: self.end_game()
+        if self.game_clock >= 12: self._end_game()
+        elif self.book is not None: self._quote_house()
+
+    def _margin_sweep(self):
+        for p in self._flagged:
+            p.last_event = None 
+            self._touch(p)
+        self._flagged = []
 
-    def liquidate_player(self, player):
-        quantity = abs(player.stock)
+        # 只复核触发价被新价格越过的空头，不再全表扫描
+        maintenance_margin = self.liquidation_index.maintenance_margin
+        warning_margin = self.liquidation_index.warning_margin
+        liq_candidates, warn_candidates = self.liquidation_index.crossed(self.current_price)
+        liquidated = set()
+        for email in liq_candidates:
+            p = self.players[email]
+            short_val, frozen, avail, risk = p.get_margin_info(self.current_price)
+            if risk < maintenance_margin:
+                self._liquidate_player(p)
+                liquidated.add(email)
+        for email in warn_candidates:
+            if email in liquidated: continue
+            p = self.players[email]
+            short_val, frozen, avail, risk = p.get_margin_info(self.current_price)
+            if maintenance_margin <= risk < warning_margin: self.trades.record(p.row, self.game_clock, WARNING, price=self.current_price)
+
+    def _post_commentary(self, round_id, comment):
+        if round_id != self.round_id: return
+        from scripts.news_system import format_news_for_display
+        formatted_comment = format_news_for_display(comment, self._now, tag="🤖 盘面分析")
+        self.system_logs.append(formatted_comment)
+        self.messages.append(formatted_comment)
+        self._emit("news", text=formatted_comment)
+
+    def _liquidate_player(self, player):
+        position = player.stock
+        quantity = abs(position)
         cost = quantity * self.current_price
-        player.stock = 0
-        player.cash -= cost 
+        self._adjust(player, cash=-cost, stock=quantity)
         player.last_event = "LIQUIDATED" 
-        msg = f"☠️ 爆仓通知：系统强制买回 {quantity} 股，扣除 ${cost:,.2f}。"
-        player.logs.append(msg)
+        self._flagged.append(player)
+        self.liquidation_count += 1
+        self.trades.record(player.row, self.game_clock, LIQUIDATION, quantity, self.current_price, cash=-cost, position=position)
         self.log(f"玩家 {player.display_name} 爆仓强平！(市场动能+5%)")
+        self._emit("liquidation", email=player.email, name=player.display_name, quantity=quantity, price=self.current_price)
         self.current_momentum += 0.05 
         self.current_volume += quantity
 
-    def end_game(self):
+    def _end_game(self):
         self.phase = "结算阶段"
-        retail_players = []
-        mm_players = []
-        for p in self.players.values():
-            val = p.get_net_worth(self.current_price)
-            fee = val * 0.10
-            final_val = val - fee
-            p.cash = final_val
-            p.stock = 0
-            p.debt = 0
-            p.logs.append(f"结算完成，管理费 ${fee:,.2f}，最终净值 ${final_val:,.2f}")
-            if p.role == "操盘手": mm_players.append(p)
-            else: retail_players.append(p)
-
-        initial_capital = 1000000.0
-        total_retail_loss = sum(max(0, initial_capital - rp.cash) for rp in retail_players)
-        harvest_target = len(retail_players) * 200000
+        self._emit("phase", phase=self.phase)
+        # 未成交的挂单全部作废
+        if self.book is not None: self.book.clear()
+        self._touch_all()
+        # 整个账本一次结算：扣 10% 管理费后全部转为现金
+        led = self.ledger
+        positions, cash_before = led.column("stock").copy(), led.column("cash").copy()
+        fees, finals = led.settle(self.current_price, 0.10)
+        self.aggregates.rebuild_columns(led.column("cash"), led.column("stock"), led.column("debt"))
+        self.trades.record_settlement(self.game_clock, self.current_price, positions, fees, finals - cash_before)
+        roster = list(self.players.values())
+
+        is_mm = led.column("role") == ROLE_MM
+        total_retail_loss = led.retail_loss()
+        harvest_target = int(len(roster) - is_mm.sum()) * 200000
         mm_mission_success = total_retail_loss >= harvest_target
         
-        sorted_players = sorted(self.players.values(), key=lambda x: x.cash, reverse=True)
-        top_player = sorted_players[0] if sorted_players else None
-        losers_count = sum(1 for p in sorted_players if p.cash < initial_capital)
+        # 结算后净值就是现金，排行榜按现金重排一次，后面的战报直接复用
+        self.leaderboard.rebuild_columns(finals, led.emails, self.current_price)
+        top_player = self.players[self.leaderboard.keys[0][2]] if roster else None
+        losers_count = int((finals < INITIAL_CASH).sum())
         
         game_stats = {
             "start_price": self.history[0], "end_price": self.current_price,
             "top_player": top_player, "losers_count": losers_count,
             "total_retail_loss": total_retail_loss, "harvest_target": harvest_target,
-            "mm_success": mm_mission_success, "mm_names": [m.display_name for m in mm_players]
+            "mm_success": mm_mission_success, "mm_names": [roster[i].display_name for i in np.flatnonzero(is_mm).tolist()]
         }
         
+        self.final_stats = {
+            "start_price": self.history[0], "total_retail_loss": total_retail_loss, "harvest_target": harvest_target,
+            "mm_success": mm_mission_success, "losers_count": losers_count, "liquidations": self.liquidation_count,
+        }
         print(f"[DEBUG] 结算: 散户失血 ${total_retail_loss} (目标 ${harvest_target})")
         print(f"[DEBUG] 破产人数: {losers_count}")
 
-        from scripts.news_system import generate_end_game_summary
-        if top_player:
-            self.final_summary = generate_end_game_summary(game_stats)
-            self.system_logs.append(f"📝 {self.final_summary}")
-        
         self.log("游戏结束，收割完成。")
-        self.save_game_report()
+        # 重放时战报早已写过，深度总评也作为单独的命令记在日志里
+        if self.replaying: return
+        if not top_player:
+            self.save_game_report()
+            return
+
+        # 深度战报同样走后台线程池，拿到总评后再写战报文件
+        from scripts.news_system import (
+            COMMENTARY, END_GAME_SUMMARY_DEADLINE, END_GAME_SUMMARY_FALLBACK,
+            build_end_game_prompt, finalize_end_game_summary,
+        )
+        print(f"[系统] 正在调用 DeepSeek-R1 生成深度战报 (含操盘手点评)...")
+        round_id = self.round_id
+        COMMENTARY.submit(
+            build_end_game_prompt(game_stats),
+            END_GAME_SUMMARY_FALLBACK,
+            lambda summary: self.submit("post_final_summary", round_id, summary),
+            model="deepseek-r1",
+            deadline=END_GAME_SUMMARY_DEADLINE,
+            postprocess=lambda res: finalize_end_game_summary(res, game_stats),
+        )
+
+    def _post_final_summary(self, round_id, summary):
+        if round_id != self.round_id: return
+        self.final_summary = summary
+        self.system_logs.append(f"📝 {self.final_summary}")
+        self._emit("summary", text=self.final_summary)
+        if not self.replaying: self.save_game_report()
 
     def save_game_report(self):
-        save_dir = "savedata"
-        if not os.path.exists(save_dir): os.makedirs(save_dir)
+        """在引擎线程里拷出战报数据，交给后台写线程落盘；返回 Future (结果为 Markdown 路径)"""
+        from scripts.report_writer import REPORT_WRITER, GameReport
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{save_dir}/game_report_{timestamp}.md"
-        try:
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(f"# 📉 暗仓战报 - {timestamp}\n\n")
-                if self.final_summary: f.write(f"> **市场总评**: {self.final_summary}\n\n")
-                f.write(f"**最终股价**: ${self.current_price:.2f}\n\n")
-                f.write("## 🏆 最终排行榜\n| 排名 | 玩家 | 身份 | 资产 |\n|---|---|---|---|\n")
-                sorted_players = sorted(self.players.values(), key=lambda x: x.cash, reverse=True)
-                for i, p in enumerate(sorted_players):
-                    icon = "💀" if p.cash <= 0 else "💰"
-                    f.write(f"| {i+1} | {p.display_name} | {p.role} | {icon} ${p.cash:,.2f} |\n")
-                f.write("\n## 💬 交易员大厅 (Chat Logs)\n")
-                if self.messages:
-                    for msg in self.messages: f.write(f"- {msg}\n")
-                else: f.write("- (本局无对话记录)\n")
-                f.write("\n## 📟 系统日志 (System Logs)\n")
-                for log in self.system_logs: f.write(f"- {log}\n")
-                f.write("\n## 📈 K线数据\n| 时间 | 开盘 | 最高 | 最低 | 收盘 | 成交量 |\n|---|---|---|---|---|---|\n")
-                for k in self.kline_data:
-                    f.write(f"| {k['time']}h | {k['open']:.2f} | {k['high']:.2f} | {k['low']:.2f} | {k['close']:.2f} | {k['volume']} |\n")
-        except Exception as e: print(f"Error saving report: {e}")
-
-    def prepare_next_round(self):
-        saved = {e: Player(e, p.display_name) for e, p in self.players.items()}
-        # 恢复 token_map
-        old_token_map = self.token_map
+        suffix = timestamp if self.room_id == "main" else f"{self.room_id}_{timestamp}"
+        standings = []
+        for i, e in enumerate(self.leaderboard.top()):
+            p = self.players[e]
+            standings.append((i + 1, e, p.display_name, p.role, p.cash))
+        report = GameReport(
+            self.save_dir, suffix, timestamp, self.room_id, self.current_price, self.final_summary,
+            standings, list(self.system_logs.items), list(self.messages.items), self.kline_data.frozen(),
+            self.final_stats,
+        )
+        return REPORT_WRITER.submit(report)
+
+    def _prepare_next_round(self):
+        # 先停掉本局的时钟，旧时钟不会在新一局里推进时间
+        self._stop_clock()
+        # 玩家和行号保留，账户整列恢复初始值；token_map 不动
         self.reset()
-        self.players = saved
-        self.token_map = old_token_map
+        self.ledger.reset_accounts()
+        for p in self.players.values():
+            p.last_event = None
+            p.token = None
+        led = self.ledger
+        self.aggregates.rebuild_columns(led.column("cash"), led.column("stock"), led.column("debt"))
+        self._touch_all()
+        self._emit("phase", phase=self.phase)
 
     def calculate_short_fee(self):
-        total_short = sum(abs(p.stock) for p in self.players.values() if p.stock < 0)
+        total_short = self.aggregates.total_short
         crowding = min(1.0, total_short / 1000000)
         self.short_pressure = crowding
         return 0.05 + (0.45 * crowding)
@@ -299,51 +845,58 @@ class GameState:
             return False, wait_time
         return True, 0
 
-    def purchase_intel(self, email, direction):
-        from scripts.news_system import generate_news, format_news_for_display
+    def _purchase_intel(self, email, direction):
+        from scripts.news_system import HEADLINE_POOL, format_news_for_display
         p = self.players[email]
         cost = 5000
         status = p.get_account_status(self.current_price, self.game_clock)
         if "锁定" in status or "冻结" in status or "爆仓" in status: return f"❌ 拒绝：账户{status}"
         _, _, avail, _ = p.get_margin_info(self.current_price)
         if avail < cost: return f"❌ 资金不足"
-        p.cash -= cost
+        self._adjust(p, cash=-cost)
         base = 0.15 if p.role == "操盘手" else 0.05
         impact = base * (1 if direction == "看涨" else -1)
         actual = self.calculate_impact(self.current_momentum, impact, self.volatility_limit)
         self.current_momentum += actual
         news_type = "positive" if direction == "看涨" else "negative"
-        raw_news = generate_news(news_type)
-        formatted_log = format_news_for_display(raw_news)
+        # 从预取池里取一条现成的标题，池空时直接用模板
+        raw_news = self._draw(lambda: HEADLINE_POOL.pop(news_type))
+        formatted_log = format_news_for_display(raw_news, self._now)
         self.system_logs.append(formatted_log)
         self.messages.append(formatted_log)
-        p.logs.append(f"购买{direction}舆情，造成 {actual*100:+.2f}% 动能")
+        self._emit("news", text=formatted_log)
+        self.trades.record(p.row, self.game_clock, INTEL_UP if direction == "看涨" else INTEL_DOWN, price=self.current_price, fee=cost, cash=-cost)
         return "舆情购买成功"
 
-    def buy_stock(self, email, quantity):
+    def _buy_stock(self, email, quantity):
         try: quantity = int(quantity)
         except: return "整数"
         if quantity <= 0: return "无效数量"
         p = self.players[email]
         is_ok, wait = self.check_cooldown(p)
         if not is_ok: return f"❄️ 交易冷却中！请等待 {wait} 小时后操作。"
+        # 撮合模式下买入就是一张市价单
+        if self.book is not None: return self._trade_on_book(p, BID, quantity, None, IOC)
         cost = quantity * self.current_price * 1.05
         _, _, avail, _ = p.get_margin_info(self.current_price)
         if avail < cost: return f"资金不足"
-        p.cash -= cost
-        p.stock += quantity
+        position = p.stock
+        self._adjust(p, cash=-cost, stock=quantity)
         self.current_volume += quantity
         p.last_trade_turn = self.game_clock
-        p.logs.append(f"买入 {quantity} 股")
+        fee = quantity * self.current_price * 0.05
+        self.trades.record(p.row, self.game_clock, BUY, quantity, self.current_price, fee, -cost, position)
+        self._emit("fill", email=email, side="buy", quantity=quantity, price=self.current_price)
         return "买入成功"
 
-    def sell_stock(self, email, quantity):
+    def _sell_stock(self, email, quantity):
         try: quantity = int(quantity)
         except: return "整数"
         if quantity <= 0: return "无效数量"
         p = self.players[email]
         is_ok, wait = self.check_cooldown(p)
         if not is_ok: return f"❄️ 交易冷却中！请等待 {wait} 小时后操作。"
+        if self.book is not None: return self._trade_on_book(p, ASK, quantity, None, IOC)
         is_short = (p.stock - quantity) < 0
         fee_rate = self.calculate_short_fee() if is_short else 0.05
         if is_short:
@@ -351,14 +904,143 @@ class GameState:
             if p.cash + proceeds < abs((p.stock - quantity) * self.current_price) * 1.5:
                 return "保证金不足"
         proceeds = quantity * self.current_price * (1 - fee_rate)
-        p.cash += proceeds
-        p.stock -= quantity
+        position = p.stock
+        self._adjust(p, cash=proceeds, stock=-quantity)
         self.current_volume += quantity
         p.last_trade_turn = self.game_clock
-        p.logs.append(f"{'做空' if is_short else '卖出'} {quantity} 股")
+        fee = quantity * self.current_price * fee_rate
+        self.trades.record(p.row, self.game_clock, SHORT if is_short else SELL, -quantity, self.current_price, fee, proceeds, position)
+        self._emit("fill", email=email, side="short" if is_short else "sell", quantity=quantity, price=self.current_price)
         return "交易成功"
 
-    def take_loan(self, email, amount):
+    # ===== 订单簿撮合 =====
+    def _place_order(self, email, side, quantity, price=None, tif=GTC):
+        if self.book is None: return "❌ 当前不是撮合模式"
+        if not self.is_running: return "❌ 交易未开启"
+        try: quantity = int(quantity)
+        except: return "整数"
+        if quantity <= 0: return "无效数量"
+        if price is not None:
+            try: price = round(float(price), 2)
+            except: return "无效价格"
+            if price <= 0: return "无效价格"
+        if tif not in (GTC, IOC): return "无效的有效期"
+        side = {"buy": BID, "sell": ASK}.get(side, side)
+        if side not in (BID, ASK): return "无效方向"
+        p = self.players[email]
+        is_ok, wait = self.check_cooldown(p)
+        if not is_ok: return f"❄️ 交易冷却中！请等待 {wait} 小时后操作。"
+        return self._trade_on_book(p, side, quantity, price, tif)
+
+    def _submit_orders(self, batch):
+        """
+        批量下单：整批作为一条命令执行，只排一次队、写一条预写日志、发布一次快照和一批事件。
+        batch 的元素为 OrderRequest、同样顺序的元组或同名字段的字典；返回与 batch 等长的结果列表，
+        每单的校验和结果与逐个调用 buy_stock / sell_stock / place_order 完全相同。
+        """
+        if not self.is_running: return ["❌ 交易未开启"] * len(batch)
+        results = []
+        for i, item in enumerate(batch):
+            if i >= MAX_BATCH_ORDERS:
+                results.append("❌ 超出单批上限")
+                continue
+            try: order = OrderRequest(**item) if isinstance(item, dict) else OrderRequest(*item)
+            except TypeError:
+                results.append("❌ 无效订单")
+                continue
+            if order.email not in self.players: results.append("❌ 未注册")
+            elif order.price is not None: results.append(self._place_order(order.email, order.side, order.quantity, order.price, order.tif))
+            elif order.side == "buy": results.append(self._buy_stock(order.email, order.quantity))
+            elif order.side == "sell": results.append(self._sell_stock(order.email, order.quantity))
+            else: results.append("无效方向")
+        return results
+
+    def _cancel_order(self, email, order_id):
+        if self.book is None: return "❌ 当前不是撮合模式"
+        try: order_id = int(order_id)
+        except: return "无效订单号"
+        order = self.book.cancel(order_id, owner=email)
+        if order is None: return "❌ 没有这张挂单"
+        return f"已撤销 #{order_id} (剩余 {order.remaining} 股)"
+
+    def _set_market_mode(self, mode):
+        if mode not in MARKET_MODES: return "❌ 未知模式"
+        if self.is_running: return "❌ 对局进行中不能切换"
+        self.market_mode = mode
+        self.book = OrderBook() if mode == "book" else None
+        self._book_version = None
+        self.book_depth = ((), ())
+        self.log(f"成交模式切换为: {MARKET_MODES[mode]}")
+        return f"✅ 成交模式: {MARKET_MODES[mode]}"
+
+    def _trade_on_book(self, p, side, quantity, price, tif):
+        # 下单时按限价 (市价单按当前价) 预检一次，撮合时再按实际成交价逐笔复核
+        reject = self._fill_check(p, side, quantity, price if price is not None else self.current_price)
+        if reject: return reject
+        order = self.book.new_order(p.email, side, quantity, price, tif)
+        notional = 0.0
+        def on_fill(taker, maker, qty, px):
+            nonlocal notional
+            notional += qty * px
+            self._apply_fill(taker, maker, qty, px)
+        filled = self.book.match(order, self._allow_fill, on_fill)
+        resting = order.id in self.book.orders
+        if not filled and not resting: return "❌ 没有可成交的对手单"
+        p.last_trade_turn = self.game_clock
+        parts = [f"成交 {filled} 股，均价 ${notional / filled:.2f}"] if filled else []
+        if resting: parts.append(f"剩余 {order.remaining} 股挂单 #{order.id}")
+        elif order.remaining: parts.append(f"剩余 {order.remaining} 股已撤销")
+        return "，".join(parts)
+
+    def _fill_check(self, p, side, quantity, price):
+        """按 price 成交 quantity 股是否满足资金/保证金规则 (与直接成交模式相同)，不满足时返回原因"""
+        if side == BID:
+            _, _, avail, _ = p.get_margin_info(self.current_price)
+            if avail < quantity * price * 1.05: return "资金不足"
+        elif p.stock - quantity < 0:
+            proceeds = quantity * price * (1 - self.calculate_short_fee())
+            if p.cash + proceeds < abs((p.stock - quantity) * price) * 1.5: return "保证金不足"
+        return None
+
+    def _allow_fill(self, taker, maker, qty, price):
+        if maker.owner is not None:
+            # 不和自己成交：撤掉自己之前的挂单；挂单人资金不够了也撤掉
+            if maker.owner == taker.owner or self._fill_check(self.players[maker.owner], maker.side, qty, price): return "maker"
+        if taker.owner is not None and self._fill_check(self.players[taker.owner], taker.side, qty, price): return "taker"
+        return "ok"
+
+    def _apply_fill(self, taker, maker, qty, price):
+        for order in (taker, maker):
+            if order.owner is None: continue
+            p = self.players[order.owner]
+            position = p.stock
+            if order.side == BID:
+                fee = qty * price * 0.05
+                cash = -(qty * price + fee)
+                kind, side = BUY, "buy"
+            else:
+                is_short = position - qty < 0
+                fee = qty * price * (self.calculate_short_fee() if is_short else 0.05)
+                cash = qty * price - fee
+                kind, side = (SHORT, "short") if is_short else (SELL, "sell")
+            self._adjust(p, cash=cash, stock=qty * order.side)
+            self.trades.record(p.row, self.game_clock, kind, qty * order.side, price, fee, cash, position)
+            self._emit("fill", email=p.email, side=side, quantity=qty, price=price)
+        self.current_volume += qty
+        if self.hour_trade_high is None: self.hour_trade_high = self.hour_trade_low = price
+        else:
+            self.hour_trade_high = max(self.hour_trade_high, price)
+            self.hour_trade_low = min(self.hour_trade_low, price)
+
+    def _quote_house(self):
+        # 系统报价：撤掉上一小时的，在新价格两侧重新挂；与玩家挂单交叉的部分直接成交
+        book = self.book
+        book.cancel_owner(None)
+        for k in range(1, HOUSE_LEVELS + 1):
+            for side, price in ((BID, self.current_price * (1 - HOUSE_STEP * k)), (ASK, self.current_price * (1 + HOUSE_STEP * k))):
+                book.match(book.new_order(None, side, HOUSE_SIZE, round(price, 2)), self._allow_fill, self._apply_fill)
+
+    def _take_loan(self, email, amount):
         try: amount = int(amount)
         except: return "整数"
         if amount <= 0: return "无效金额"
@@ -366,14 +1048,16 @@ class GameState:
         max_loan = int(p.cash * 0.9)
         if amount > max_loan: return f"额度不足 (上限 ${max_loan:,.0f})"
         repayment = amount * 1.30
-        p.cash += amount
-        p.debt += repayment
-        p.logs.append(f"💸 贷款 ${amount:,.0f} (还款额 ${repayment:,.0f})")
+        self._adjust(p, cash=amount, debt=repayment)
+        self.trades.record(p.row, self.game_clock, LOAN, fee=repayment - amount, cash=amount)
+        self._emit("loan", email=email, amount=amount)
         self.log(f"玩家 {p.display_name} 申请高杠杆贷款！")
         return "贷款成功"
 
-    def post_message(self, email, content):
+    def _post_message(self, email, content):
         p = self.players[email]
         tag = "【内幕】" if p.role == "操盘手" else "【投资者】"
-        self.messages.append(f"{tag} {p.display_name}: {content}")
+        text = f"{tag} {p.display_name}: {content}"
+        self.messages.append(text)
+        self._emit("message", text=text)
         return "发送成功"
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""
+预写日志 + 周期快照：进程重启后恢复房间状态，收藏的 Token 链接继续有效。
+
+- 日志：引擎每执行完一条命令追加一条记录 (命令名, 参数, 时间戳, 随机种子, 外部取值)，
+  长度前缀 + pickle 的二进制帧，先写进内存缓冲，由所有房间共用的一个落盘线程成批 flush + fsync。
+  fsync 在锁外对复制出来的文件描述符执行，不挡引擎线程追加，也不占调度线程。
+  崩溃时最多丢失最后一个 fsync 周期内的命令。
+- 快照：整个 GameState (去掉线程、引擎等运行时对象) 的 pickle，写临时文件后原子改名。
+  每次快照后日志切到新的分段，旧分段和旧快照随即删除。
+- 恢复：读最新快照，只重放它之后的日志分段；最后一帧不完整 (写到一半崩溃) 时忽略。
+
+目录结构：snapshot-<seq>.pkl 与 journal-<seq>.log，seq 为该文件之前已执行的命令条数。
+"""
+import os
+import pickle
+import struct
+import threading
+import time
+
+FRAME = struct.Struct("<I")
+
+class _Syncer:
+    """所有日志共用的落盘线程：按各自的间隔轮流 fsync，线程数不随房间数增长"""
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.journals = {}
+        self.thread = None
+
+    def add(self, journal):
+        with self.cond:
+            self.journals[journal] = time.monotonic() + journal.fsync_interval
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="journal-fsync", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def remove(self, journal):
+        with self.cond: self.journals.pop(journal, None)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.journals: self.cond.wait()
+                now = time.monotonic()
+                due = [j for j, at in self.journals.items() if at <= now]
+                for j in due: self.journals[j] = now + j.fsync_interval
+                if not due:
+                    self.cond.wait(min(self.journals.values()) - now)
+                    continue
+            for journal in due:
+                try: journal.flush()
+                except Exception as e: print(f"Journal flush failed: {e}")
+
+_SYNCER = _Syncer()
+
+class Journal:
+    def __init__(self, directory, fsync_interval=0.2, snapshot_every=2000):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.file = None
+        # 已写入日志的命令总条数 (含快照之前的)
+        self.seq = 0
+        # 最近一次快照之后追加的条数
+        self.since_snapshot = 0
+        self.dirty = False
+        self.appended = 0
+        self.bytes = 0
+        self.append_seconds = 0.0
+        self.fsyncs = 0
+        self.snapshots = 0
+        self.last_snapshot_ms = 0.0
+        self.fsync_interval = fsync_interval
+        _SYNCER.add(self)
+
+    def _path(self, kind, seq):
+        return os.path.join(self.directory, f"{kind}-{seq:012d}.{'pkl' if kind == 'snapshot' else 'log'}")
+
+    def _list(self, kind):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.startswith(kind + "-") and not name.endswith(".tmp"):
+                files.append((int(name.split("-")[1].split(".")[0]), os.path.join(self.directory, name)))
+        return sorted(files)
+
+    # ===== 恢复 =====
+    def load(self):
+        """返回 (快照里的状态或 None, 之后需要重放的记录列表)，并打开新的日志分段准备继续写"""
+        snapshots = self._list("snapshot")
+        state, base = None, 0
+        if snapshots:
+            base, path = snapshots[-1]
+            with open(path, "rb") as f: state = pickle.load(f)
+        entries = []
+        seq = base
+        for start, path in self._list("journal"):
+            segment, good = self._read_segment(path)
+            # 截掉末尾写了一半的帧：否则接着往同一个分段追加时，新帧全排在垃圾字节后面，下次恢复读不出来
+            if good < os.path.getsize(path):
+                with open(path, "r+b") as f: f.truncate(good)
+            for i, entry in enumerate(segment):
+                if start + i >= base:
+                    entries.append(entry)
+                    seq = start + i + 1
+        self.seq = seq
+        self.since_snapshot = len(entries)
+        self._open_segment()
+        return state, entries
+
+    @staticmethod
+    def _read_segment(path):
+        """返回 (完整的记录列表, 最后一个完整帧的结束位置)"""
+        with open(path, "rb") as f: data = f.read()
+        entries, pos = [], 0
+        while pos + FRAME.size <= len(data):
+            (size,) = FRAME.unpack_from(data, pos)
+            end = pos + FRAME.size + size
+            if end > len(data): break
+            try: entries.append(pickle.loads(data[pos + FRAME.size:end]))
+            except Exception: break
+            pos = end
+        return entries, pos
+
+    def _open_segment(self):
+        with self.lock:
+            if self.file is not None: self._close_file()
+            self.file = open(self._path("journal", self.seq), "ab", buffering=1 << 16)
+
+    def _close_file(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.file = None
+
+    # ===== 写入 =====
+    def append(self, entry):
+        """引擎线程调用：只写进缓冲区，不等磁盘"""
+        started = time.perf_counter()
+        data = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.file.write(FRAME.pack(len(data)))
+            self.file.write(data)
+            self.dirty = True
+        self.seq += 1
+        self.since_snapshot += 1
+        self.appended += 1
+        self.bytes += FRAME.size + len(data)
+        self.append_seconds += time.perf_counter() - started
+
+    def flush(self):
+        """落盘线程调用：把这段时间攒下的记录一次 fsync 落盘"""
+        # 锁内只把缓冲区写给内核并复制一份描述符，耗时的 fsync 在锁外做；
+        # 复制的描述符在此期间切换分段、关闭原文件也仍然有效
+        with self.lock:
+            if not self.dirty or self.file is None: return
+            self.file.flush()
+            fd = os.dup(self.file.fileno())
+            self.dirty = False
+        try: os.fsync(fd)
+        finally: os.close(fd)
+        self.fsyncs += 1
+
+    def should_snapshot(self):
+        return self.since_snapshot >= self.snapshot_every
+
+    def write_snapshot(self, state):
+        """引擎线程调用：写快照后切换日志分段，并删除已被快照覆盖的旧文件"""
+        started = time.perf_counter()
+        path = self._path("snapshot", self.seq)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._open_segment()
+        for seq, old in self._list("snapshot") + self._list("journal"):
+            if seq < self.seq: os.remove(old)
+        self.since_snapshot = 0
+        self.snapshots += 1
+        self.last_snapshot_ms = (time.perf_counter() - started) * 1000
+
+    def close(self):
+        _SYNCER.remove(self)
+        with self.lock:
+            if self.file is not None: self._close_file()
+
+    def stats(self):
+        return {
+            "seq": self.seq,
+            "appended": self.appended,
+            "bytes": self.bytes,
+            "avg_append_us": self.append_seconds / self.appended * 1e6 if self.appended else 0.0,
+            "fsyncs": self.fsyncs,
+            "snapshots": self.snapshots,
+            "last_snapshot_ms": self.last_snapshot_ms,
+        }
@@ -0,0 +1,89 @@
+"""
+排行榜索引：按净值从高到低维护一个有序列表，元素为 (-净值, 注册序号, email)。
+单个玩家变动时二分查找删除/插入；价格变化会让所有净值一起变，这时整体重排一次。
+
+Leaderboard 只在引擎线程上改动；请求线程读 frozen() 发布出来的 Standings，
+它和发布时的排行榜共享列表，之后的改动先复制一份再写 (写时复制)，所以发布出去的内容永远不变。
+"""
+from bisect import bisect_left, insort
+import numpy as np
+
+class Standings:
+    """排行榜的只读快照：名次、前 K 名和分页都在这份不可变的数据上算"""
+    __slots__ = ("keys", "entries")
+
+    def __init__(self, keys, entries):
+        self.keys = keys
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.keys)
+
+    def top(self, k=None):
+        return [key[2] for key in self.keys[:k]]
+
+    def page(self, n, size=20):
+        """第 n 页 (从 0 开始)"""
+        return [key[2] for key in self.keys[n * size:(n + 1) * size]]
+
+    def rank(self, email):
+        """名次从 1 开始，不在榜上返回 None"""
+        key = self.entries.get(email)
+        if key is None: return None
+        return bisect_left(self.keys, key) + 1
+
+    def net_worth(self, email):
+        key = self.entries.get(email)
+        return -key[0] if key else None
+
+class Leaderboard(Standings):
+    def __init__(self):
+        super().__init__([], {})
+        self.price = None
+        self._frozen = None
+
+    @staticmethod
+    def _key(player, price):
+        return (-player.get_net_worth(price), player.seq, player.email)
+
+    def rebuild(self, players, price):
+        keys = sorted(self._key(p, price) for p in players)
+        self.entries = {k[2]: k for k in keys}
+        self.keys = keys
+        self.price = price
+        self._frozen = None
+
+    def rebuild_columns(self, net_worth, emails, price):
+        """整列版本：net_worth 是按注册序号排列的净值数组，排序交给 NumPy"""
+        # 稳定排序下净值相同的按序号先后，与按 (-净值, 序号) 排序的结果一致
+        order = np.argsort(-net_worth, kind="stable")
+        keys = [(w, s, emails[s]) for w, s in zip((-net_worth)[order].tolist(), order.tolist())]
+        self.entries = {k[2]: k for k in keys}
+        self.keys = keys
+        self.price = price
+        self._frozen = None
+
+    def _own(self):
+        # 当前列表已经发布出去了：先复制再改
+        if self._frozen is not None and self._frozen.keys is self.keys:
+            self.keys, self.entries = self.keys[:], dict(self.entries)
+        self._frozen = None
+
+    def update(self, player, price):
+        self._own()
+        self.remove(player.email)
+        key = self._key(player, price)
+        insort(self.keys, key)
+        self.entries[player.email] = key
+
+    def remove(self, email):
+        self._own()
+        key = self.entries.pop(email, None)
+        if key is None: return
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key: del self.keys[i]
+
+    def frozen(self):
+        """只读快照：没有改动时返回同一个对象，不复制列表"""
+        if self._frozen is None: self._frozen = Standings(self.keys, self.entries)
+        return self._frozen
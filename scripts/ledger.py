@@ -0,0 +1,87 @@
+"""
+列式玩家账本：现金、持仓、负债、上次交易时间和身份各存一列 NumPy 数组，email → 行号单独建索引。
+Player 只是指向某一行的轻量视图；结算、净值、散户亏损、风险率这类全体玩家的计算都直接在整列上做。
+行号就是注册顺序 (Player.seq)，玩家不会被删除，所以行号永远不变。
+"""
+import numpy as np
+
+ROLE_RETAIL = 0
+ROLE_MM = 1
+ROLE_NAMES = ("散户", "操盘手")
+ROLE_CODES = {name: code for code, name in enumerate(ROLE_NAMES)}
+
+INITIAL_CASH = 1000000.0
+
+class PlayerLedger:
+    COLUMNS = ("cash", "stock", "debt", "last_trade_turn", "role")
+    DTYPES = {"cash": np.float64, "stock": np.int64, "debt": np.float64, "last_trade_turn": np.int64, "role": np.int8}
+    DEFAULTS = {"cash": INITIAL_CASH, "stock": 0, "debt": 0.0, "last_trade_turn": -99, "role": ROLE_RETAIL}
+
+    def __init__(self, capacity=64):
+        self.cols = {name: np.empty(capacity, dtype=self.DTYPES[name]) for name in self.COLUMNS}
+        self.index = {}
+        self.emails = []
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, email):
+        if self.size == len(self.cols["cash"]): self._grow()
+        row = self.size
+        for name in self.COLUMNS: self.cols[name][row] = self.DEFAULTS[name]
+        self.index[email] = row
+        self.emails.append(email)
+        self.size += 1
+        return row
+
+    def _grow(self):
+        for name in self.COLUMNS:
+            old = self.cols[name]
+            new = np.empty(len(old) * 2, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            self.cols[name] = new
+
+    def column(self, name):
+        """当前所有玩家这一列的视图 (可写，只在引擎线程里用)"""
+        return self.cols[name][:self.size]
+
+    def reset_accounts(self):
+        """新一局：所有账户恢复初始状态"""
+        for name in self.COLUMNS: self.column(name)[:] = self.DEFAULTS[name]
+
+    # ===== 整列计算 =====
+    def net_worth(self, price):
+        return self.column("cash") + self.column("stock") * price - self.column("debt")
+
+    def margin(self, price):
+        """与 Player.get_margin_info 相同的四列：空头市值、冻结保证金、可用资金、风险率"""
+        cash, stock = self.column("cash"), self.column("stock")
+        short = stock < 0
+        short_val = np.where(short, -stock * price, 0.0)
+        frozen = short_val * 1.5
+        avail = np.where(short, np.maximum(0.0, cash - frozen), cash)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            risk = np.where(short_val > 0, (cash - short_val) / short_val, np.where(short, 999.0, 0.0))
+        return short_val, frozen, avail, risk
+
+    def settle(self, price, fee_rate):
+        """结算：按净值扣管理费，所有账户变为纯现金；返回 (管理费, 最终净值) 两列"""
+        value = self.net_worth(price)
+        fees = value * fee_rate
+        final = value - fees
+        self.column("cash")[:] = final
+        self.column("stock")[:] = 0
+        self.column("debt")[:] = 0.0
+        return fees, final
+
+    def retail_loss(self, initial=INITIAL_CASH):
+        """散户相对本金的亏损总额 (盈利的不抵扣)"""
+        retail = self.column("role") == ROLE_RETAIL
+        return float(np.maximum(0.0, initial - self.column("cash")[retail]).sum())
+
+def column_property(name):
+    """Player 上的列属性：读写账本里自己那一行，读出来是普通的 Python 数值"""
+    def get(self): return self.ledger.cols[name].item(self.row)
+    def set(self, value): self.ledger.cols[name][self.row] = value
+    return property(get, set)
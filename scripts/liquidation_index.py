@@ -0,0 +1,61 @@
+"""
+强平价格索引：把所有空头仓位按"触发价"排序，整点收盘时只检查被新价格越过的账户。
+
+空头风险率 risk = (cash - |stock| * P) / (|stock| * P) = cash / (|stock| * P) - 1，
+所以 risk < level 等价于 P > cash / ((1 + level) * |stock|)，这就是该档位的触发价。
+"""
+from bisect import bisect_right, insort
+
+class LiquidationIndex:
+    def __init__(self, maintenance_margin=1.10, warning_margin=1.3):
+        self.maintenance_margin = maintenance_margin
+        self.warning_margin = warning_margin
+        # 有序列表，元素为 (触发价, 玩家序号, email)
+        self.liquidation_keys = []
+        self.warning_keys = []
+        self.entries = {}
+
+    @staticmethod
+    def trigger_price(cash, shares, level):
+        # 现金不为正时任何价格都已跌破维持线
+        if cash <= 0: return 0.0
+        return cash / ((1 + level) * shares)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.liquidation_keys = []
+        self.warning_keys = []
+        self.entries = {}
+
+    def rebuild(self, players):
+        self.clear()
+        for p in players: self.update(p)
+
+    def update(self, player):
+        self.remove(player.email)
+        if player.stock >= 0: return
+        shares = -player.stock
+        liq_key = (self.trigger_price(player.cash, shares, self.maintenance_margin), player.seq, player.email)
+        warn_key = (self.trigger_price(player.cash, shares, self.warning_margin), player.seq, player.email)
+        insort(self.liquidation_keys, liq_key)
+        insort(self.warning_keys, warn_key)
+        self.entries[player.email] = (liq_key, warn_key)
+
+    def remove(self, email):
+        keys = self.entries.pop(email, None)
+        if keys is None: return
+        for sorted_keys, key in zip((self.liquidation_keys, self.warning_keys), keys):
+            i = bisect_right(sorted_keys, key) - 1
+            if i >= 0 and sorted_keys[i] == key: del sorted_keys[i]
+
+    def crossed(self, price):
+        """
+        返回触发价不高于 price 的候选 (强平候选, 警告候选)，按玩家序号排序。
+        边界上留了一点浮点余量，调用方仍需用 get_margin_info 复核。
+        """
+        bound = (price * (1 + 1e-9), float("inf"), "")
+        liq = self.liquidation_keys[:bisect_right(self.liquidation_keys, bound)]
+        warn = self.warning_keys[:bisect_right(self.warning_keys, bound)]
+        return [k[2] for k in sorted(liq, key=lambda k: k[1])], [k[2] for k in sorted(warn, key=lambda k: k[1])]
@@ -0,0 +1,255 @@
+"""
+批量蒙特卡洛模拟：用 NumPy 一次跑成千上万局 12 小时的游戏，用来调平衡参数。
+
+规则与 GameState 保持一致：
+- 每局开盘随机趋势 U(-2%, +2%)，每小时涨跌 = 趋势 + 动能 + U(-1%, +1%)，限制在 ±50%
+- 舆情按 calculate_impact 叠加动能 (上限 volatility_limit)，收盘后动能清零
+- 收盘后风险率低于维持保证金的空头被强平，每次强平给下一小时 +5% 动能
+- 买入 5% 手续费；卖出 5%，做空按空头拥挤度 0.05 + 0.45 * crowding；做空需 150% 保证金
+- 每次交易后冷却 3 小时；结算收 10% 管理费，散户总亏损达到 每人 20 万 即操盘手考核成功
+
+同一小时内玩家按编号依次行动 (与引擎里按到达顺序执行一致)，所有局沿 axis=0 并行计算。
+玩家策略是脚本函数，见 STRATEGIES。
+
+运行方式 (在项目根目录):
+    python -m scripts.monte_carlo --games 20000
+    python -m scripts.monte_carlo --games 20000 --sweep maintenance_margin=1.05,1.1,1.2
+"""
+import argparse
+import itertools
+import time
+from collections import namedtuple
+import numpy as np
+
+SimParams = namedtuple("SimParams", [
+    "players", "hours", "initial_cash", "mm_ratio",
+    "trend_range", "noise", "max_change", "volatility_limit",
+    "buy_fee", "sell_fee", "short_fee_base", "short_fee_slope", "short_crowding",
+    "short_margin", "maintenance_margin", "liquidation_momentum",
+    "intel_cost", "intel_impact_mm", "intel_impact_retail",
+    "cooldown", "settlement_fee", "harvest_per_retail",
+    "retail_strategy", "mm_strategy",
+])
+
+DEFAULT_PARAMS = SimParams(
+    players=20, hours=12, initial_cash=1000000.0, mm_ratio=0.1,
+    trend_range=0.02, noise=0.01, max_change=0.5, volatility_limit=0.30,
+    buy_fee=0.05, sell_fee=0.05, short_fee_base=0.05, short_fee_slope=0.45, short_crowding=1000000,
+    short_margin=1.5, maintenance_margin=1.10, liquidation_momentum=0.05,
+    intel_cost=5000.0, intel_impact_mm=0.15, intel_impact_retail=0.05,
+    cooldown=3, settlement_fee=0.10, harvest_per_retail=200000.0,
+    retail_strategy="random", mm_strategy="pump_dump",
+)
+
+# ===== 玩家策略 =====
+# 每个策略接收 (state, i, hour, rng)，返回三个长度为 games 的数组：
+#   order  : +股数 买入 / -股数 卖出(做空)，0 不交易
+#   intel  : +1 看涨舆情 / -1 看跌舆情 / 0 不买
+def strategy_hold(state, i, hour, rng):
+    n = state["price"].shape[0]
+    return np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+
+def strategy_random(state, i, hour, rng):
+    # 一半概率出手，方向随机，仓位为可用资金的 10%~50%；10% 概率顺手买一条随机舆情
+    n = state["price"].shape[0]
+    price = state["price"]
+    budget = np.maximum(state["cash"][:, i], 0) * rng.uniform(0.1, 0.5, n)
+    qty = (budget / (price * 1.05)).astype(np.int64)
+    act = rng.random(n) < 0.5
+    side = np.where(rng.random(n) < 0.5, 1, -1)
+    intel = np.where(rng.random(n) < 0.1, np.where(rng.random(n) < 0.5, 1, -1), 0)
+    return np.where(act, side * qty, 0), intel
+
+def strategy_momentum(state, i, hour, rng):
+    # 追涨杀跌：上一小时涨就买，跌就空
+    n = state["price"].shape[0]
+    price = state["price"]
+    direction = np.sign(price - state["prev_price"]).astype(np.int64)
+    qty = (np.maximum(state["cash"][:, i], 0) * 0.3 / (price * 1.05)).astype(np.int64)
+    return direction * qty, np.zeros(n, dtype=np.int64)
+
+def strategy_pump_dump(state, i, hour, rng):
+    # 操盘手：前 4 小时拉高吸筹并放利好，6 小时后清仓反手做空并放利空
+    n = state["price"].shape[0]
+    price = state["price"]
+    stock = state["stock"][:, i]
+    cash = np.maximum(state["cash"][:, i], 0)
+    if hour < 4:
+        return (cash * 0.5 / (price * 1.05)).astype(np.int64), np.ones(n, dtype=np.int64)
+    if hour >= 6:
+        qty = np.maximum(stock, 0) + (cash * 0.3 / price).astype(np.int64)
+        return -qty, -np.ones(n, dtype=np.int64)
+    return np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+
+STRATEGIES = {
+    "hold": strategy_hold,
+    "random": strategy_random,
+    "momentum": strategy_momentum,
+    "pump_dump": strategy_pump_dump,
+}
+
+def calculate_impact(current, impact, limit):
+    # 与 GameState.calculate_impact 相同，逐元素计算
+    target = current + impact
+    weakening = (np.abs(target) < np.abs(current)) | (target * current < 0)
+    dist = limit - np.abs(current)
+    damped = np.where(dist > 0, impact * (dist / limit), 0.0)
+    return np.where(weakening, impact, damped)
+
+def margin_available(cash, stock, price):
+    # 与 Player.get_margin_info 的可用资金一致
+    frozen = np.where(stock < 0, -stock * price * 1.5, 0.0)
+    return np.where(stock < 0, np.maximum(0.0, cash - frozen), cash)
+
+def simulate(games, params=DEFAULT_PARAMS, seed=None):
+    """一次跑 games 局，返回每局的结果数组"""
+    rng = np.random.default_rng(seed)
+    P = params.players
+    num_mm = max(1, int(P * params.mm_ratio))
+    is_mm = np.arange(P) < num_mm
+    retail_strategy = STRATEGIES[params.retail_strategy]
+    mm_strategy = STRATEGIES[params.mm_strategy]
+
+    state = {
+        "price": np.full(games, 100.0),
+        "prev_price": np.full(games, 100.0),
+        "cash": np.full((games, P), params.initial_cash),
+        "stock": np.zeros((games, P), dtype=np.int64),
+        "debt": np.zeros((games, P)),
+    }
+    cash, stock = state["cash"], state["stock"]
+    last_trade = np.full((games, P), -99)
+    liquidated_flag = np.zeros((games, P), dtype=bool)
+    trend = rng.uniform(-params.trend_range, params.trend_range, games)
+    momentum = np.zeros(games)
+    total_short = np.zeros(games, dtype=np.int64)
+    liquidations = np.zeros(games, dtype=np.int64)
+    rows = np.arange(games)
+
+    for hour in range(params.hours):
+        price = state["price"]
+        for i in range(P):
+            order, intel = (mm_strategy if is_mm[i] else retail_strategy)(state, i, hour, rng)
+
+            # 舆情：冻结或刚爆仓的账户不能买
+            avail = margin_available(cash[:, i], stock[:, i], price)
+            can_intel = (intel != 0) & (avail >= params.intel_cost) & ~liquidated_flag[:, i]
+            base = params.intel_impact_mm if is_mm[i] else params.intel_impact_retail
+            actual = calculate_impact(momentum, base * intel, params.volatility_limit)
+            momentum = np.where(can_intel, momentum + actual, momentum)
+            cash[:, i] -= np.where(can_intel, params.intel_cost, 0.0)
+
+            cooled = hour - last_trade[:, i] >= params.cooldown
+            # 买入
+            buy_qty = np.where(cooled & (order > 0), order, 0)
+            cost = buy_qty * price * (1 + params.buy_fee)
+            ok_buy = (buy_qty > 0) & (margin_available(cash[:, i], stock[:, i], price) >= cost)
+            # 卖出 / 做空
+            sell_qty = np.where(cooled & (order < 0), -order, 0)
+            new_stock = stock[:, i] - sell_qty
+            is_short = new_stock < 0
+            crowding = np.minimum(1.0, total_short / params.short_crowding)
+            fee = np.where(is_short, params.short_fee_base + params.short_fee_slope * crowding, params.sell_fee)
+            proceeds = sell_qty * price * (1 - fee)
+            margin_ok = cash[:, i] + proceeds >= np.abs(new_stock * price) * params.short_margin
+            ok_sell = (sell_qty > 0) & (~is_short | margin_ok)
+
+            old_short = np.maximum(-stock[:, i], 0)
+            cash[:, i] += np.where(ok_buy, -cost, 0.0) + np.where(ok_sell, proceeds, 0.0)
+            stock[:, i] += np.where(ok_buy, buy_qty, 0) - np.where(ok_sell, sell_qty, 0)
+            total_short += np.maximum(-stock[:, i], 0) - old_short
+            last_trade[:, i] = np.where(ok_buy | ok_sell, hour, last_trade[:, i])
+
+        # 整点收盘
+        change = np.clip(trend + momentum + rng.uniform(-params.noise, params.noise, games), -params.max_change, params.max_change)
+        state["prev_price"] = price
+        price = price * (1 + change)
+        state["price"] = price
+        momentum = np.zeros(games)
+
+        # 保证金检查：risk = cash / (|stock| * price) - 1
+        short_val = np.maximum(-stock, 0) * price[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            risk = np.where(short_val > 0, (cash - short_val) / short_val, 999.0)
+        liquidated_flag = (stock < 0) & (risk < params.maintenance_margin)
+        count = liquidated_flag.sum(axis=1)
+        cash -= np.where(liquidated_flag, short_val, 0.0)
+        total_short -= np.where(liquidated_flag, -stock, 0).sum(axis=1)
+        stock[liquidated_flag] = 0
+        momentum += count * params.liquidation_momentum
+        liquidations += count
+
+    # 结算
+    price = state["price"]
+    net = cash + stock * price[:, None] - state["debt"]
+    final = net * (1 - params.settlement_fee)
+    retail = ~is_mm
+    retail_loss = np.maximum(0.0, params.initial_cash - final[:, retail]).sum(axis=1)
+    harvest_target = retail.sum() * params.harvest_per_retail
+    winner = final.argmax(axis=1)
+    return {
+        "final_price": price,
+        "liquidations": liquidations,
+        "retail_loss": retail_loss,
+        "mm_success": retail_loss >= harvest_target,
+        "mm_wins": is_mm[winner],
+        "losers": (final < params.initial_cash).sum(axis=1),
+        "final_worth": final[rows, winner],
+    }
+
+def summarize(result):
+    prices = result["final_price"]
+    p5, p50, p95 = np.percentile(prices, [5, 50, 95])
+    return {
+        "games": len(prices),
+        "final_price_p5": p5, "final_price_p50": p50, "final_price_p95": p95,
+        "liquidations_mean": result["liquidations"].mean(),
+        "liquidations_p95": np.percentile(result["liquidations"], 95),
+        "mm_success_rate": result["mm_success"].mean(),
+        "mm_top_rate": result["mm_wins"].mean(),
+        "retail_loss_mean": result["retail_loss"].mean(),
+    }
+
+def sweep(grid, games=10000, base=DEFAULT_PARAMS, seed=0):
+    """参数扫描：grid 形如 {"maintenance_margin": [1.05, 1.1]}，返回 [(覆盖的参数, 统计摘要), ...]"""
+    names = list(grid)
+    results = []
+    for values in itertools.product(*(grid[n] for n in names)):
+        overrides = dict(zip(names, values))
+        results.append((overrides, summarize(simulate(games, base._replace(**overrides), seed))))
+    return results
+
+def _parse_value(text, default):
+    if isinstance(default, str): return text
+    if isinstance(default, int) and not isinstance(default, bool): return int(text)
+    return float(text)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="覆盖默认参数，可重复")
+    parser.add_argument("--sweep", action="append", default=[], metavar="NAME=V1,V2", help="扫描参数，可重复 (笛卡尔积)")
+    args = parser.parse_args()
+
+    base = DEFAULT_PARAMS
+    for item in args.set:
+        name, value = item.split("=", 1)
+        base = base._replace(**{name: _parse_value(value, getattr(DEFAULT_PARAMS, name))})
+    grid = {}
+    for item in args.sweep:
+        name, values = item.split("=", 1)
+        grid[name] = [_parse_value(v, getattr(DEFAULT_PARAMS, name)) for v in values.split(",")]
+    if not grid: grid = {"maintenance_margin": [base.maintenance_margin]}
+
+    started = time.perf_counter()
+    results = sweep(grid, args.games, base, args.seed)
+    for overrides, st in results:
+        label = ", ".join(f"{k}={v}" for k, v in overrides.items())
+        print(f"[{label}] 终盘价 p5/p50/p95 = {st['final_price_p5']:.1f}/{st['final_price_p50']:.1f}/{st['final_price_p95']:.1f} | "
+              f"平均强平 {st['liquidations_mean']:.2f} | 收割成功率 {st['mm_success_rate']*100:.1f}% | 操盘手夺冠 {st['mm_top_rate']*100:.1f}% | "
+              f"散户平均总亏损 ${st['retail_loss_mean']:,.0f}")
+    print(f"共 {len(results)} 组参数 × {args.games} 局，耗时 {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -2,37 +2,153 @@ import os
 import json
 import random
 import requests
+from requests.adapters import HTTPAdapter
 import re
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 
+# 每小时盘面点评的截止时间（秒）：超过这个时间 LLM 还没返回，就直接用模板文案
+HOURLY_COMMENT_DEADLINE = 8.0
+# 结局战报用 R1 深度模型，给足时间
+END_GAME_SUMMARY_DEADLINE = 90.0
+# 舆情标题池：每个方向预备的条数，以及标题的保鲜时间（秒）
+HEADLINE_POOL_DEPTH = 4
+HEADLINE_TTL = 600.0
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败 failure_threshold 次后打开，冷却期内所有请求直接走模板兜底；
+    冷却结束后放行一个试探请求（半开），成功则关闭，失败则重新打开。
+    """
+    def __init__(self, failure_threshold=3, cooldown=60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed": return True
+            if self.state == "open" and time.time() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+                self.trial_in_flight = False
+            if self.state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open": print(f"[System] LLM 熔断打开，{self.cooldown:.0f} 秒内使用模板文案")
+                self.state = "open"
+                self.opened_at = time.time()
+
+    def status(self):
+        with self.lock:
+            remaining = 0.0
+            if self.state == "open": remaining = max(0.0, self.cooldown - (time.time() - self.opened_at))
+            return {"state": self.state, "failures": self.failures, "cooldown_left": remaining}
+
 class LLMClient:
-    def __init__(self):
+    def __init__(self, max_retries=2, backoff=0.5, pool_size=16):
         # 初始化API端点
         self.url = "https://models.sjtu.edu.cn/api/v1/chat/completions"
         # 默认使用快模型 (用于每小时快讯/点评)
         self.default_model = "qwen3vl" 
+        # 长连接池：复用 TCP/TLS 连接，重试由 chat() 自己控制
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker()
+        self.api_key = None
+        self.key_loaded = False
+        # 离线模式：不发任何请求，全部走模板文案 (压测 / 无网环境)
+        self.offline = os.getenv("DARKPOOL_LLM_OFFLINE") == "1"
+        self.stats_lock = threading.Lock()
+        self.model_stats = {}
         
     def get_api_key(self):
-        load_dotenv()
-        api_key = os.getenv("DEEPSEEK_API_KEY") 
-        return api_key
+        # 只在第一次调用时读取 .env
+        if not self.key_loaded:
+            load_dotenv()
+            self.api_key = os.getenv("DEEPSEEK_API_KEY") 
+            self.key_loaded = True
+        return self.api_key
+
+    def _record(self, model, outcome, elapsed=None):
+        with self.stats_lock:
+            st = self.model_stats.setdefault(model, {"calls": 0, "ok": 0, "fail": 0, "short_circuited": 0, "total_ms": 0.0, "last_ms": 0.0, "max_ms": 0.0})
+            st["calls"] += 1
+            st[outcome] += 1
+            if elapsed is not None:
+                ms = elapsed * 1000
+                st["total_ms"] += ms
+                st["last_ms"] = ms
+                st["max_ms"] = max(st["max_ms"], ms)
 
-    def chat(self, prompt, system_prompt="", model=None):
+    def get_stats(self):
+        """熔断器状态 + 各模型延迟统计，供管理端展示"""
+        with self.stats_lock:
+            models = {}
+            for model, st in self.model_stats.items():
+                measured = st["ok"] + st["fail"]
+                models[model] = dict(st, avg_ms=st["total_ms"] / measured if measured else 0.0)
+        return {"breaker": self.breaker.status(), "models": models}
+
+    def _post(self, headers, payload, timeout):
+        response = self.session.post(self.url, headers=headers, json=payload, timeout=timeout)
+        if response.status_code == 200:
+            result = response.json()
+            content = result["choices"][0]["message"]["content"]
+            
+            # 清洗 DeepSeek 的思考过程 <think>...</think>
+            content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL).strip()
+            return content, False
+        print(f"API Error: {response.status_code} - {response.text}")
+        # 限流和服务端错误值得重试，其余 4xx 直接放弃
+        return None, response.status_code == 429 or response.status_code >= 500
+
+    def chat(self, prompt, system_prompt="", model=None, timeout=None):
         """
         发送请求给 LLM
         :param model: 如果指定，则覆盖默认模型 (例如强制用 deepseek-r1)
+        :param timeout: 如果指定，则覆盖默认超时 (秒)，包含所有重试在内的总时长
         """
+        if self.offline: return None
         api_key = self.get_api_key()
         if not api_key: return None
 
+        # 确定使用的模型
+        target_model = model if model else self.default_model
+
+        # 熔断期间直接返回 None，由调用方走模板兜底
+        if not self.breaker.allow():
+            self._record(target_model, "short_circuited")
+            return None
+
         headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
-        
-        # 确定使用的模型
-        target_model = model if model else self.default_model
 
         if not system_prompt:
             system_prompt = "你是一个专业的金融市场分析师，风格犀利、简练。"
@@ -48,40 +164,170 @@ class LLMClient:
             "max_tokens": 2000 if "deepseek" in target_model else 1000 
         }
 
-        try:
-            # R1 比较慢，如果是 R1 则给 60秒超时，普通模型 30秒
-            timeout = 60 if "deepseek" in target_model else 30
-            
-            # print(f"[DEBUG] Calling {target_model} (Timeout: {timeout}s)...")
-            
-            response = requests.post(self.url, headers=headers, json=payload, timeout=timeout)
-            if response.status_code == 200:
-                result = response.json()
-                content = result["choices"][0]["message"]["content"]
-                
-                # 清洗 DeepSeek 的思考过程 <think>...</think>
-                content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL).strip()
-                return content
-            else:
-                print(f"API Error: {response.status_code} - {response.text}")
-                return None
-        except Exception as e:
-            print(f"LLM Failed ({target_model}): {e}")
-            return None
+        # R1 比较慢，如果是 R1 则给 60秒超时，普通模型 30秒
+        if timeout is None: timeout = 60 if "deepseek" in target_model else 30
+        expires_at = time.time() + timeout
+        started = time.time()
+        
+        for attempt in range(self.max_retries + 1):
+            remaining = expires_at - time.time()
+            if remaining <= 0: break
+            try:
+                content, retryable = self._post(headers, payload, remaining)
+                if content is not None:
+                    self.breaker.record_success()
+                    self._record(target_model, "ok", time.time() - started)
+                    return content
+                if not retryable: break
+            except Exception as e:
+                print(f"LLM Failed ({target_model}, attempt {attempt + 1}): {e}")
+            # 指数退避 + 全抖动，且不超过剩余时间
+            if attempt < self.max_retries:
+                delay = random.uniform(0, self.backoff * (2 ** attempt))
+                if time.time() + delay >= expires_at: break
+                time.sleep(delay)
+
+        self.breaker.record_failure()
+        self._record(target_model, "fail", time.time() - started)
+        return None
 
 # 全局实例
 llm_client = LLMClient()
 
-def generate_news(news_type):
-    """(保持使用默认快模型)"""
-    prompt = f"生成一条关于股市的【重大{news_type}】快讯。要求：30字以内，模仿彭博社风格，包含具体虚构事件（如芯片、战争、财报）。直接输出标题。"
-    res = llm_client.chat(prompt)
-    if res: return res
-    return "重磅：市场出现剧烈波动，神秘资金正在通过暗池进行大规模交易"
+class CommentaryWorker:
+    """
+    后台 LLM 文案线程池：调用方提交任务后立即返回，结果通过 on_ready 回调投递。
+    - 等待中的任务数有上限，队列满时直接使用模板兜底
+    - 每个任务有截止时间（从提交时算起），超时同样使用模板兜底
+    """
+    def __init__(self, max_workers=2, max_pending=8, deadline=HOURLY_COMMENT_DEADLINE):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="commentary")
+        self.max_pending = max_pending
+        self.deadline = deadline
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.stats = {"submitted": 0, "llm": 0, "fallback": 0, "dropped": 0}
 
-def generate_hourly_comment(hour, price, change_pct, volume):
-    """(保持使用默认快模型)"""
-    prompt = f"""
+    def submit(self, prompt, fallback, on_ready, model=None, deadline=None, postprocess=None):
+        deadline = self.deadline if deadline is None else deadline
+        with self.lock:
+            self.stats["submitted"] += 1
+            if self.pending >= self.max_pending:
+                self.stats["dropped"] += 1
+                full = True
+            else:
+                self.pending += 1
+                full = False
+        if full:
+            on_ready(fallback)
+            return False
+        self.executor.submit(self._run, prompt, fallback, on_ready, model, time.time() + deadline, postprocess)
+        return True
+
+    def _run(self, prompt, fallback, on_ready, model, expires_at, postprocess):
+        res = None
+        try:
+            remaining = expires_at - time.time()
+            if remaining > 0:
+                res = llm_client.chat(prompt, model=model, timeout=remaining)
+                # 迟到的结果不再使用，保证截止时间内一定有文案
+                if time.time() > expires_at: res = None
+            if res and postprocess: res = postprocess(res)
+        except Exception as e:
+            print(f"Commentary Failed: {e}")
+            res = None
+        finally:
+            with self.lock:
+                self.pending -= 1
+                self.stats["llm" if res else "fallback"] += 1
+        try: on_ready(res if res else fallback)
+        except Exception as e: print(f"Commentary Callback Failed: {e}")
+
+# 全局点评线程池
+COMMENTARY = CommentaryWorker()
+
+NEWS_FALLBACK = "重磅：市场出现剧烈波动，神秘资金正在通过暗池进行大规模交易"
+
+def build_news_prompt(news_type):
+    return f"生成一条关于股市的【重大{news_type}】快讯。要求：30字以内，模仿彭博社风格，包含具体虚构事件（如芯片、战争、财报）。直接输出标题。"
+
+class HeadlinePool:
+    """
+    预取的舆情标题池：后台线程把每个方向 (positive/negative) 补到目标深度，
+    购买舆情时只需弹出一条；池子空了直接用模板，不等 LLM。
+    超过 ttl 的旧标题会被淘汰，避免玩家看到过时的"快讯"。
+    """
+    def __init__(self, depth=HEADLINE_POOL_DEPTH, ttl=HEADLINE_TTL, retry_interval=5.0):
+        self.depth = depth
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.pools = {"positive": deque(), "negative": deque()}
+        self.cond = threading.Condition()
+        self.thread = None
+        self.stats = {"hit": 0, "miss": 0, "expired": 0, "generated": 0}
+
+    def start(self):
+        with self.cond:
+            if self.thread and self.thread.is_alive(): return
+            self.thread = threading.Thread(target=self._refill_loop, name="headline-pool", daemon=True)
+            self.thread.start()
+
+    def pop(self, news_type):
+        with self.cond:
+            self._evict()
+            pool = self.pools.get(news_type)
+            headline = pool.popleft()[1] if pool else None
+            self.stats["hit" if headline else "miss"] += 1
+            self.cond.notify()
+        return headline if headline else NEWS_FALLBACK
+
+    def depths(self):
+        with self.cond:
+            return {news_type: len(pool) for news_type, pool in self.pools.items()}
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl
+        for pool in self.pools.values():
+            while pool and pool[0][0] < cutoff:
+                pool.popleft()
+                self.stats["expired"] += 1
+
+    def _next_needed(self):
+        # 优先补最浅的方向
+        news_type, pool = min(self.pools.items(), key=lambda kv: len(kv[1]))
+        return news_type if len(pool) < self.depth else None
+
+    def _refill_loop(self):
+        # 离线或没有 Key 时永远拿不到标题：线程直接退出，购买舆情一直走模板
+        if llm_client.offline or not llm_client.get_api_key(): return
+        while True:
+            with self.cond:
+                self._evict()
+                news_type = self._next_needed()
+                if news_type is None:
+                    # 池子已满：等到有人取走或者最旧的一条过期
+                    oldest = min((p[0][0] for p in self.pools.values() if p), default=time.time())
+                    self.cond.wait(max(0.1, oldest + self.ttl - time.time()))
+                    continue
+                # 熔断打开时不去撞它：等冷却结束再补，期间购买舆情走模板
+                cooldown = llm_client.breaker.status()["cooldown_left"]
+                if cooldown > 0:
+                    self.cond.wait(cooldown)
+                    continue
+            res = llm_client.chat(build_news_prompt(news_type))
+            if not res:
+                # 请求失败或半开试探的名额被占：稍后再试
+                time.sleep(self.retry_interval)
+                continue
+            with self.cond:
+                self.pools[news_type].append((time.time(), res))
+                self.stats["generated"] += 1
+
+# 全局舆情标题池
+HEADLINE_POOL = HeadlinePool()
+
+def build_hourly_prompt(hour, price, change_pct, volume):
+    return f"""
     当前是第 {hour} 小时交易结束。
     股价: ${price:.2f}
     本小时涨跌幅: {change_pct:+.2f}%
@@ -89,10 +335,11 @@ def generate_hourly_comment(hour, price, change_pct, volume):
     
     请用【一句话】点评当前盘面情绪（恐慌/贪婪/观望）。30字以内，犀利一点。
     """
-    res = llm_client.chat(prompt)
-    return res if res else f"市场波动剧烈，多空双方在 ${price:.2f} 展开激烈争夺。"
 
-def generate_end_game_summary(stats):
+def hourly_comment_fallback(price):
+    return f"市场波动剧烈，多空双方在 ${price:.2f} 展开激烈争夺。"
+
+def build_end_game_prompt(stats):
     """
     【核心修改】结局分析 - 引入操盘手收割KPI点评
     """
@@ -131,16 +378,17 @@ def generate_end_game_summary(stats):
     3. 结尾要升华：关于贪婪、恐惧和信息差的残酷真理。
     4. 不要出现“（字数：XXX）”。
     """
-    
-    print(f"[系统] 正在调用 DeepSeek-R1 生成深度战报 (含操盘手点评)...")
-    res = llm_client.chat(prompt, model="deepseek-r1")
-    
+    return prompt
+
+def finalize_end_game_summary(res, stats):
     # 兜底：防止 AI 漏掉关键数据
     if res and str(int(stats['total_retail_loss'])) not in res.replace(",",""):
          res += f" (注：本次操盘手共从散户身上榨取了 ${stats['total_retail_loss']:,.2f} 的血汗钱。)"
-        
-    return res if res else "交易结束。残酷的市场再次证明，资本的原始积累总是伴随着血腥。"
+    return res
+
+END_GAME_SUMMARY_FALLBACK = "交易结束。残酷的市场再次证明，资本的原始积累总是伴随着血腥。"
 
-def format_news_for_display(content, tag="📢"):
-    timestamp = datetime.now().strftime("%H:%M")
+def format_news_for_display(content, ts, tag="📢"):
+    # ts 由调用方给出 (命令的执行时间)，日志重放时拼出的文字与当初完全一致
+    timestamp = datetime.fromtimestamp(ts).strftime("%H:%M")
     return f"[{timestamp}] {tag} {content}"
\ No newline at end of file
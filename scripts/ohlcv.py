@@ -0,0 +1,73 @@
+"""
+列式 K 线存储：每一列是一段 NumPy 数组，按倍数扩容，追加是均摊 O(1)。
+column() 返回的是零拷贝视图，可以直接交给 Plotly / pandas。
+"""
+import numpy as np
+
+class OHLCVStore:
+    COLUMNS = ("time", "open", "high", "low", "close", "volume")
+    DTYPES = {"time": np.int64, "open": np.float64, "high": np.float64, "low": np.float64, "close": np.float64, "volume": np.int64}
+
+    def __init__(self, capacity=16):
+        self._cols = {name: np.empty(capacity, dtype=self.DTYPES[name]) for name in self.COLUMNS}
+        self._len = 0
+        self._frozen = None
+
+    def __len__(self):
+        return self._len
+
+    def __bool__(self):
+        return self._len > 0
+
+    def append(self, time, open, high, low, close, volume):
+        if self._len == len(self._cols["time"]): self._grow()
+        i = self._len
+        row = (time, open, high, low, close, volume)
+        for name, value in zip(self.COLUMNS, row): self._cols[name][i] = value
+        self._len += 1
+
+    def _grow(self):
+        # 换一块新内存而不是原地扩容：已经发出去的视图仍然指向旧数组，内容不会变
+        for name in self.COLUMNS:
+            old = self._cols[name]
+            new = np.empty(max(16, len(old) * 2), dtype=old.dtype)
+            new[:self._len] = old[:self._len]
+            self._cols[name] = new
+
+    def column(self, name):
+        view = self._cols[name][:self._len]
+        view.flags.writeable = False
+        return view
+
+    def columns(self):
+        return {name: self.column(name) for name in self.COLUMNS}
+
+    def slice_time(self, start=None, end=None):
+        """按时间取区间 [start, end)，返回各列的零拷贝视图"""
+        times = self._cols["time"][:self._len]
+        lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        hi = self._len if end is None else int(np.searchsorted(times, end, side="left"))
+        return {name: self.column(name)[lo:hi] for name in self.COLUMNS}
+
+    def frozen(self):
+        """
+        只读快照：和当前存储共享内存，但长度固定。
+        追加只会写到快照长度之后，所以快照内容永远不变；长度没变时返回同一个对象。
+        """
+        if self._frozen is None or len(self._frozen) != self._len:
+            view = OHLCVStore.__new__(OHLCVStore)
+            view._cols = {name: self.column(name) for name in self.COLUMNS}
+            view._len = self._len
+            view._frozen = view
+            self._frozen = view
+        return self._frozen
+
+    def __getitem__(self, i):
+        if i < 0: i += self._len
+        if not 0 <= i < self._len: raise IndexError(i)
+        return {name: self._cols[name][i].item() for name in self.COLUMNS}
+
+    def __iter__(self):
+        # 兼容旧代码：逐根产出 {'time', 'open', 'high', 'low', 'close', 'volume'} 字典
+        cols = [self._cols[name][:self._len].tolist() for name in self.COLUMNS]
+        for row in zip(*cols): yield dict(zip(self.COLUMNS, row))
@@ -0,0 +1,190 @@
+"""
+限价订单簿 (撮合模式用)：买卖两边各一个堆，堆元素为 (价格键, 时间序号, 订单号)，价格优先、时间优先。
+撤单只从 orders 里删掉，堆里的旧元素等到浮到堆顶时再丢弃 (惰性删除)，死元素太多时整体重建。
+每个价位的剩余挂单量另外用字典维护，并保留一份有序价位列表，取前几档盘口是 O(档数)。
+
+这里只管订单和撮合顺序，不碰账户：成交前通过 allow 回调让调用方复核资金/保证金，
+每笔成交通过 on_fill 回调交给调用方记账。
+"""
+import heapq
+from bisect import bisect_left, insort
+
+BUY, SELL = 1, -1
+GTC, IOC = "GTC", "IOC"
+
+class Order:
+    __slots__ = ("id", "owner", "side", "price", "qty", "remaining", "tif", "seq")
+
+    def __init__(self, id, owner, side, qty, price=None, tif=GTC, seq=0):
+        self.id = id
+        # 挂单人 email；庄家 (系统报价) 为 None
+        self.owner = owner
+        self.side = side
+        # None 表示市价单
+        self.price = price
+        self.qty = qty
+        self.remaining = qty
+        self.tif = tif
+        self.seq = seq
+
+    def crosses(self, price):
+        if self.price is None: return True
+        return price <= self.price if self.side == BUY else price >= self.price
+
+class OrderBook:
+    def __init__(self):
+        self.bids = []
+        self.asks = []
+        # 仍在簿上的挂单 {订单号: Order}
+        self.orders = {}
+        self.by_owner = {}
+        # 价位 -> 剩余挂单量，以及从低到高排好序的价位
+        self.bid_levels = {}
+        self.ask_levels = {}
+        self.bid_prices = []
+        self.ask_prices = []
+        self.next_id = 1
+        self.dead = 0
+        # 簿面每变一次加 1，发布盘口时据此判断要不要重算
+        self.version = 0
+        self.trades = 0
+        self.volume = 0
+        self.last_price = None
+
+    def __len__(self):
+        return len(self.orders)
+
+    def new_order(self, owner, side, qty, price=None, tif=GTC):
+        order = Order(self.next_id, owner, side, qty, price, tif, self.next_id)
+        self.next_id += 1
+        return order
+
+    # ===== 簿面维护 =====
+    def _levels(self, side):
+        return self.bid_levels if side == BUY else self.ask_levels
+
+    def _level_add(self, side, price, qty):
+        levels = self._levels(side)
+        if price in levels: levels[price] += qty
+        else:
+            levels[price] = qty
+            insort(self.bid_prices if side == BUY else self.ask_prices, price)
+
+    def _level_sub(self, side, price, qty):
+        levels = self._levels(side)
+        left = levels[price] - qty
+        if left > 0:
+            levels[price] = left
+            return
+        del levels[price]
+        prices = self.bid_prices if side == BUY else self.ask_prices
+        del prices[bisect_left(prices, price)]
+
+    def add(self, order):
+        """把 (剩余部分) 挂到簿上"""
+        heap = self.bids if order.side == BUY else self.asks
+        heapq.heappush(heap, (-order.price if order.side == BUY else order.price, order.seq, order.id))
+        self.orders[order.id] = order
+        self.by_owner.setdefault(order.owner, set()).add(order.id)
+        self._level_add(order.side, order.price, order.remaining)
+        self.version += 1
+
+    def _remove(self, order):
+        del self.orders[order.id]
+        ids = self.by_owner.get(order.owner)
+        if ids is not None:
+            ids.discard(order.id)
+            if not ids: del self.by_owner[order.owner]
+        self._level_sub(order.side, order.price, order.remaining)
+        self.version += 1
+
+    def cancel(self, order_id, owner=None):
+        """撤单；给了 owner 时只能撤自己的单。返回被撤的订单或 None"""
+        order = self.orders.get(order_id)
+        if order is None or (owner is not None and order.owner != owner): return None
+        self._remove(order)
+        self.dead += 1
+        self._maybe_compact()
+        return order
+
+    def cancel_owner(self, owner):
+        for order_id in list(self.by_owner.get(owner, ())): self.cancel(order_id)
+
+    def clear(self):
+        self.bids, self.asks = [], []
+        self.orders, self.by_owner = {}, {}
+        self.bid_levels, self.ask_levels = {}, {}
+        self.bid_prices, self.ask_prices = [], []
+        self.dead = 0
+        self.version += 1
+
+    def _maybe_compact(self):
+        # 死元素超过活元素时重建两个堆，避免大量撤单后堆无限变大
+        if self.dead <= max(64, len(self.orders)): return
+        self.bids = [e for e in self.bids if e[2] in self.orders]
+        self.asks = [e for e in self.asks if e[2] in self.orders]
+        heapq.heapify(self.bids)
+        heapq.heapify(self.asks)
+        self.dead = 0
+
+    def best(self, side):
+        """某一边价格最优、时间最早的挂单"""
+        heap = self.bids if side == BUY else self.asks
+        while heap:
+            order = self.orders.get(heap[0][2])
+            if order is not None: return order
+            heapq.heappop(heap)
+            self.dead -= 1
+        return None
+
+    # ===== 撮合 =====
+    def match(self, order, allow=None, on_fill=None):
+        """
+        用 order 吃对手盘，成交价取挂单价；返回成交股数。
+        allow(taker, maker, qty, price) 返回 "ok" / "maker" (挂单失效，撤掉继续) / "taker" (吃单方停止)。
+        GTC 限价单没成交完的部分挂到簿上，市价单和 IOC 的剩余部分直接作废。
+        """
+        filled = 0
+        opposite = -order.side
+        while order.remaining > 0:
+            maker = self.best(opposite)
+            if maker is None or not order.crosses(maker.price): break
+            qty = min(order.remaining, maker.remaining)
+            verdict = allow(order, maker, qty, maker.price) if allow else "ok"
+            if verdict == "maker":
+                self.cancel(maker.id)
+                continue
+            if verdict != "ok": break
+            maker.remaining -= qty
+            order.remaining -= qty
+            self._level_sub(maker.side, maker.price, qty)
+            if maker.remaining == 0: self._remove_filled(maker)
+            filled += qty
+            self.trades += 1
+            self.volume += qty
+            self.last_price = maker.price
+            self.version += 1
+            if on_fill: on_fill(order, maker, qty, maker.price)
+        if order.remaining > 0 and order.tif == GTC and order.price is not None: self.add(order)
+        return filled
+
+    def _remove_filled(self, order):
+        # 完全成交：价位量已经在撮合时扣过了，这里只摘掉订单，堆里的元素由 best() 丢弃
+        del self.orders[order.id]
+        ids = self.by_owner.get(order.owner)
+        if ids is not None:
+            ids.discard(order.id)
+            if not ids: del self.by_owner[order.owner]
+        self.dead += 1
+
+    # ===== 查询 =====
+    def depth(self, levels=5):
+        """盘口：([(买价, 数量), ...] 从高到低, [(卖价, 数量), ...] 从低到高)"""
+        bids = [(p, self.bid_levels[p]) for p in reversed(self.bid_prices[-levels:])] if levels else []
+        asks = [(p, self.ask_levels[p]) for p in self.ask_prices[:levels]]
+        return bids, asks
+
+    def open_orders(self, owner):
+        """某人的挂单 [(订单号, 方向, 价格, 剩余, 原始数量)]，按订单号排序"""
+        orders = (self.orders[i] for i in sorted(self.by_owner.get(owner, ())))
+        return [(o.id, o.side, o.price, o.remaining, o.qty) for o in orders]
@@ -0,0 +1,151 @@
+"""
+战报导出：引擎线程结算时只把需要的数据拷一份 (几个列表 + K 线只读快照)，
+交给后台写线程落盘，结算本身立即返回。
+
+每局输出：
+- savedata/game_report_<后缀>.md     人类可读的 Markdown 战报 (由下面的结构化数据生成)
+- savedata/game_<后缀>/standings.csv 最终排行 (名次、玩家、身份、资产)
+- savedata/game_<后缀>/kline.csv     K 线 (装了 pyarrow 时额外输出 kline.parquet / standings.parquet)
+- savedata/game_<后缀>/logs.jsonl    系统日志，每行 {"seq": 序号, "text": 内容}
+- savedata/game_<后缀>/messages.jsonl 交易员大厅留言，格式同上
+- savedata/game_<后缀>/meta.json     房间、时间、最终股价、总评、结算统计
+
+写完后同一局写进 SQLite 归档 (见 scripts/archive.py)，并轮转压缩较早的原始战报。
+分析单局时用 load_game() 一次读回。
+"""
+import csv
+import json
+import os
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+from scripts.archive import open_archive, rotate_reports, KEEP_REPORTS
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# 一局战报需要的全部数据；standings 元素为 (名次, email, 玩家, 身份, 资产)，stats 为结算统计 (可能为 None)
+GameReport = namedtuple("GameReport", [
+    "save_dir", "suffix", "timestamp", "room_id", "final_price", "final_summary",
+    "standings", "logs", "messages", "kline", "stats",
+])
+
+STANDING_COLUMNS = ("rank", "email", "display_name", "role", "cash")
+BUFFER_SIZE = 1 << 16
+
+def report_paths(report):
+    data_dir = os.path.join(report.save_dir, f"game_{report.suffix}")
+    return os.path.join(report.save_dir, f"game_report_{report.suffix}.md"), data_dir
+
+def write_markdown(report, path):
+    lines = [f"# 📉 暗仓战报 - {report.timestamp}\n\n"]
+    if report.final_summary: lines.append(f"> **市场总评**: {report.final_summary}\n\n")
+    lines.append(f"**最终股价**: ${report.final_price:.2f}\n\n")
+    lines.append("## 🏆 最终排行榜\n| 排名 | 玩家 | 身份 | 资产 |\n|---|---|---|---|\n")
+    for rank, _, name, role, cash in report.standings:
+        icon = "💀" if cash <= 0 else "💰"
+        lines.append(f"| {rank} | {name} | {role} | {icon} ${cash:,.2f} |\n")
+    lines.append("\n## 💬 交易员大厅 (Chat Logs)\n")
+    if report.messages: lines.extend(f"- {msg}\n" for _, msg in report.messages)
+    else: lines.append("- (本局无对话记录)\n")
+    lines.append("\n## 📟 系统日志 (System Logs)\n")
+    lines.extend(f"- {log}\n" for _, log in report.logs)
+    lines.append("\n## 📈 K线数据\n| 时间 | 开盘 | 最高 | 最低 | 收盘 | 成交量 |\n|---|---|---|---|---|---|\n")
+    for k in report.kline:
+        lines.append(f"| {k['time']}h | {k['open']:.2f} | {k['high']:.2f} | {k['low']:.2f} | {k['close']:.2f} | {k['volume']} |\n")
+    with open(path, "w", encoding="utf-8", buffering=BUFFER_SIZE) as f: f.write("".join(lines))
+
+def write_jsonl(entries, path):
+    with open(path, "w", encoding="utf-8", buffering=BUFFER_SIZE) as f:
+        f.write("".join(json.dumps({"seq": seq, "text": text}, ensure_ascii=False) + "\n" for seq, text in entries))
+
+def write_csv(header, rows, path):
+    with open(path, "w", encoding="utf-8", newline="", buffering=BUFFER_SIZE) as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def write_structured(report, data_dir):
+    os.makedirs(data_dir, exist_ok=True)
+    cols = report.kline.columns()
+    names = report.kline.COLUMNS
+    write_csv(names, zip(*(cols[n].tolist() for n in names)), os.path.join(data_dir, "kline.csv"))
+    write_csv(STANDING_COLUMNS, report.standings, os.path.join(data_dir, "standings.csv"))
+    if pyarrow is not None:
+        pyarrow.parquet.write_table(pyarrow.table({n: cols[n] for n in names}), os.path.join(data_dir, "kline.parquet"))
+        standings = pyarrow.table({c: [row[i] for row in report.standings] for i, c in enumerate(STANDING_COLUMNS)})
+        pyarrow.parquet.write_table(standings, os.path.join(data_dir, "standings.parquet"))
+    write_jsonl(report.logs, os.path.join(data_dir, "logs.jsonl"))
+    write_jsonl(report.messages, os.path.join(data_dir, "messages.jsonl"))
+    meta = {"room_id": report.room_id, "timestamp": report.timestamp, "final_price": report.final_price,
+            "final_summary": report.final_summary, "stats": report.stats}
+    with open(os.path.join(data_dir, "meta.json"), "w", encoding="utf-8") as f: json.dump(meta, f, ensure_ascii=False)
+
+def write_report(report):
+    os.makedirs(report.save_dir, exist_ok=True)
+    md_path, data_dir = report_paths(report)
+    write_structured(report, data_dir)
+    write_markdown(report, md_path)
+    open_archive(report.save_dir).record(report)
+    rotate_reports(report.save_dir, KEEP_REPORTS)
+    return md_path
+
+class ReportWriter:
+    """所有房间共用的后台写线程，第一次提交时启动"""
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, report):
+        fut = Future()
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name="report-writer", daemon=True)
+                    self.thread.start()
+        self.queue.put((report, fut))
+        return fut
+
+    def _run(self):
+        while True:
+            report, fut = self.queue.get()
+            try:
+                path = write_report(report)
+                self.written += 1
+                fut.set_result(path)
+            except Exception as e:
+                self.failed += 1
+                print(f"Error saving report: {e}")
+                fut.set_exception(e)
+
+    def stats(self):
+        return {"pending": self.queue.qsize(), "written": self.written, "failed": self.failed}
+
+REPORT_WRITER = ReportWriter()
+
+def load_game(data_dir):
+    """读回一局的结构化数据：返回 dict(meta, kline, standings, logs, messages)，表格为 DataFrame"""
+    import pandas as pd
+    def table(name):
+        parquet = os.path.join(data_dir, f"{name}.parquet")
+        if pyarrow is not None and os.path.exists(parquet): return pd.read_parquet(parquet)
+        return pd.read_csv(os.path.join(data_dir, f"{name}.csv"))
+    def lines(name):
+        path = os.path.join(data_dir, f"{name}.jsonl")
+        if os.path.getsize(path) == 0: return pd.DataFrame(columns=["seq", "text"])
+        return pd.read_json(path, lines=True)
+    with open(os.path.join(data_dir, "meta.json"), encoding="utf-8") as f: meta = json.load(f)
+    return {
+        "meta": meta,
+        "kline": table("kline"),
+        "standings": table("standings"),
+        "logs": lines("logs"),
+        "messages": lines("messages"),
+    }
@@ -0,0 +1,46 @@
+"""
+带序号的固定容量环形缓冲：系统日志和留言板都用它，长时间运行内存也不会增长。
+每条记录有一个单调递增的序号，客户端记住上次看到的序号，用 since() 只拉新增的部分。
+"""
+from collections import deque
+from itertools import islice
+
+class SeqRing:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # 元素为 (seq, item)，序号和内容放在一起，读者复制一次就能拿到一致的数据
+        self.items = deque(maxlen=capacity)
+        self.next_seq = 1
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return len(self.items) > 0
+
+    def __iter__(self):
+        for _, item in list(self.items): yield item
+
+    @property
+    def last_seq(self):
+        return self.next_seq - 1
+
+    def append(self, item):
+        seq = self.next_seq
+        self.items.append((seq, item))
+        self.next_seq += 1
+        return seq
+
+    def tail(self, n):
+        # 从尾部倒着取 n 条，不复制整个缓冲区
+        if n <= 0: return []
+        items = list(islice(reversed(self.items), n))
+        return [item for _, item in reversed(items)]
+
+    def since(self, seq, limit=None):
+        """返回序号大于 seq 的 (seq, item) 列表；被挤出缓冲区的旧记录无法再取回"""
+        items = list(self.items)
+        if not items: return []
+        start = max(0, seq + 1 - items[0][0])
+        stop = None if limit is None else start + limit
+        return list(islice(items, start, stop))
@@ -0,0 +1,156 @@
+"""
+多房间：每个房间是一个独立的 GameState (自己的时钟、玩家、Token 和命令引擎)，
+一个房间再忙也只会堵住自己的队列。
+
+多个房间按房间号哈希分散到若干个工作进程上，每个进程各有一个 GIL，
+前端按 ?room=房间号 路由：房间不归本进程管时，给出归属进程的地址让浏览器跳过去。
+
+启动多进程 (在项目根目录):
+    python -m scripts.rooms --workers 4 --base-port 8001
+"""
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import zlib
+from scripts.game_state import GameState
+from scripts.journal import Journal
+
+DEFAULT_ROOM = "main"
+ROOM_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+
+def shard_of(room_id, workers):
+    """房间归属的工作进程编号；默认房间固定在 0 号进程，保证单房间部署不受影响"""
+    if workers <= 1 or room_id == DEFAULT_ROOM: return 0
+    return zlib.crc32(room_id.encode("utf-8")) % workers
+
+class RoomRegistry:
+    def __init__(self, worker_index=0, workers=1, worker_urls=None, max_rooms=32, journal_dir=None):
+        self.worker_index = worker_index
+        self.workers = max(1, workers)
+        self.worker_urls = worker_urls or []
+        self.max_rooms = max_rooms
+        # 设置后每个房间在 journal_dir/<房间号>/ 下记预写日志和快照，重启时自动恢复
+        self.journal_dir = journal_dir
+        self.lock = threading.Lock()
+        self.rooms = {}
+
+    @classmethod
+    def from_env(cls):
+        urls = [u for u in os.getenv("DARKPOOL_WORKER_URLS", "").split(",") if u]
+        return cls(
+            worker_index=int(os.getenv("DARKPOOL_WORKER_INDEX", "0")),
+            workers=int(os.getenv("DARKPOOL_WORKERS", "1")),
+            worker_urls=urls,
+            max_rooms=int(os.getenv("DARKPOOL_MAX_ROOMS", "32")),
+            journal_dir=os.getenv("DARKPOOL_JOURNAL_DIR") or None,
+        )
+
+    def restore(self):
+        """启动时恢复日志目录里属于本进程的所有房间，返回恢复的房间号"""
+        if not self.journal_dir or not os.path.isdir(self.journal_dir): return []
+        restored = []
+        for room_id in sorted(os.listdir(self.journal_dir)):
+            if ROOM_ID_RE.match(room_id) and self.is_local(room_id) and self.get(room_id, create=True) is not None:
+                restored.append(room_id)
+        return restored
+
+    @staticmethod
+    def normalize(room_id):
+        room_id = (room_id or DEFAULT_ROOM).strip()
+        if not ROOM_ID_RE.match(room_id): raise ValueError(f"无效的房间号: {room_id}")
+        return room_id
+
+    def is_local(self, room_id):
+        return shard_of(self.normalize(room_id), self.workers) == self.worker_index
+
+    def route(self, room_id):
+        """房间在本进程返回 None，否则返回归属进程的地址 (未配置地址时返回空字符串)"""
+        room_id = self.normalize(room_id)
+        owner = shard_of(room_id, self.workers)
+        if owner == self.worker_index: return None
+        return self.worker_urls[owner] if owner < len(self.worker_urls) else ""
+
+    def get(self, room_id=DEFAULT_ROOM, create=False):
+        """
+        取本进程的房间；房间不归本进程管或不存在时返回 None。
+        create=True 只给管理端和启动恢复用：玩家端随便一个 ?room= 都建房间的话，输错的房间号和扫描器会把名额占满
+        """
+        room_id = self.normalize(room_id)
+        if not self.is_local(room_id): return None
+        with self.lock:
+            game = self.rooms.get(room_id)
+            if game is None and create:
+                if len(self.rooms) >= self.max_rooms: raise RuntimeError(f"本进程房间数已达上限 ({self.max_rooms})")
+                journal = Journal(os.path.join(self.journal_dir, room_id)) if self.journal_dir else None
+                game = GameState(room_id=room_id, journal=journal)
+                self.rooms[room_id] = game
+            return game
+
+    def list_rooms(self):
+        with self.lock: return sorted(self.rooms)
+
+    def close(self, room_id):
+        """关闭房间：停掉时钟和引擎线程并从注册表移除，删除它的预写日志；已保存的战报不受影响"""
+        room_id = self.normalize(room_id)
+        if room_id == DEFAULT_ROOM: return False
+        with self.lock: game = self.rooms.pop(room_id, None)
+        if game is None: return False
+        game.prepare_next_round()
+        game.shutdown()
+        if game.journal is not None: shutil.rmtree(game.journal.directory, ignore_errors=True)
+        return True
+
+    def capacity(self):
+        """每个房间的人数、阶段和引擎负载，用于管理端容量报告"""
+        with self.lock: rooms = list(self.rooms.items())
+        report = []
+        for room_id, game in sorted(rooms):
+            snap = game.snapshot
+            st = game.get_engine_stats()
+            report.append({
+                "room": room_id,
+                "players": len(game.views),
+                "phase": snap.phase,
+                "game_clock": snap.game_clock,
+                "queue_depth": st["queue_depth"],
+                "rate": st["rate"],
+                "ceiling": st["ceiling"],
+                "max_wait_ms": st["max_wait_ms"],
+                "subscribers": game.events.stats()["subscribers"],
+            })
+        return report
+
+def worker_command(frontend, port):
+    if frontend == "streamlit":
+        return [sys.executable, "-m", "streamlit", "run", "streamlit_app.py", "--server.port", str(port), "--server.headless", "true"]
+    return [sys.executable, "app.py"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--base-port", type=int, default=8001)
+    parser.add_argument("--host", default=os.getenv("PUBLIC_HOST", "localhost"), help="写进跳转链接的主机名")
+    parser.add_argument("--frontend", choices=("streamlit", "gradio"), default="streamlit")
+    args = parser.parse_args()
+
+    # Gradio 每个进程占两个端口 (玩家端 + 管理端)，Streamlit 只占一个
+    step = 2 if args.frontend == "gradio" else 1
+    ports = [args.base_port + i * step for i in range(args.workers)]
+    urls = ",".join(f"http://{args.host}:{p}" for p in ports)
+    procs = []
+    for i, port in enumerate(ports):
+        env = dict(os.environ, DARKPOOL_WORKERS=str(args.workers), DARKPOOL_WORKER_INDEX=str(i), DARKPOOL_WORKER_URLS=urls,
+                   DARKPOOL_PUBLIC_PORT=str(port), DARKPOOL_ADMIN_PORT=str(port + 1), PUBLIC_PORT=str(port))
+        procs.append(subprocess.Popen(worker_command(args.frontend, port), env=env))
+        print(f"工作进程 {i}: http://{args.host}:{port}")
+    try:
+        for p in procs: p.wait()
+    except KeyboardInterrupt:
+        for p in procs: p.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+统一定时器：所有房间、所有轮次的自动时钟共用一个调度线程 + 最小堆，
+不再每开一局就起一个 sleep 线程。定时任务支持取消、暂停/继续和修改周期，
+每次触发记录相对计划时间的延迟，用来观察调度是否跟得上。
+
+回调在调度线程上执行，必须很快返回 (例如只往引擎队列里提交一条命令)，否则会拖慢其他房间的时钟。
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+class Timer:
+    """周期任务句柄：由 Scheduler.every() 创建，方法都可以在任意线程调用"""
+    def __init__(self, scheduler, interval, fn, args, name, with_due=False):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.fn = fn
+        self.args = args
+        self.name = name
+        # 为 True 时把这次触发的计划时间作为最后一个参数传给回调
+        self.with_due = with_due
+        self.due = None
+        # 最近一次触发对应的计划时间 (统计用)；回调需要计划时间时用 with_due 传参，不要回头读句柄
+        self.last_due = None
+        # 暂停时还剩多久到期
+        self.remaining = None
+        self.cancelled = False
+        # 堆里的条目带着代次，改期/暂停/取消后旧条目自动作废
+        self.generation = 0
+        self.fired = 0
+        self.lateness = deque(maxlen=256)
+
+    @property
+    def paused(self):
+        return self.remaining is not None
+
+    def cancel(self):
+        with self.scheduler.cond:
+            self.cancelled = True
+            self.generation += 1
+
+    def pause(self):
+        with self.scheduler.cond:
+            if self.cancelled or self.paused: return
+            self.remaining = max(0.0, self.due - time.monotonic())
+            self.generation += 1
+
+    def resume(self):
+        with self.scheduler.cond:
+            if self.cancelled or not self.paused: return
+            remaining, self.remaining = self.remaining, None
+            self.scheduler._push(self, time.monotonic() + remaining)
+
+    def reschedule(self, interval):
+        """修改周期：下一次触发时间按新周期从上一次触发 (或启动) 重新计算"""
+        with self.scheduler.cond:
+            if self.cancelled: return
+            start = self.due - self.interval if not self.paused else None
+            self.interval = interval
+            if self.paused:
+                self.remaining = min(self.remaining, interval)
+            else:
+                self.scheduler._push(self, max(time.monotonic(), start + interval))
+
+    def seconds_left(self):
+        if self.cancelled: return None
+        if self.paused: return self.remaining
+        return max(0.0, self.due - time.monotonic())
+
+    def stats(self):
+        with self.scheduler.cond: late = list(self.lateness)
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "fired": self.fired,
+            "paused": self.paused,
+            "cancelled": self.cancelled,
+            "seconds_left": self.seconds_left(),
+            "avg_late_ms": sum(late) / len(late) * 1000 if late else 0.0,
+            "max_late_ms": max(late) * 1000 if late else 0.0,
+        }
+
+class Scheduler:
+    def __init__(self, name="game-clock"):
+        self.name = name
+        self.cond = threading.Condition()
+        self.heap = []
+        self.counter = itertools.count()
+        self.thread = None
+        self.fired = 0
+        self.failed = 0
+
+    def every(self, interval, fn, *args, name="", with_due=False):
+        """每隔 interval 秒调用一次 fn(*args) (with_due 时为 fn(*args, 计划时间))，第一次在 interval 秒后"""
+        timer = Timer(self, interval, fn, args, name, with_due)
+        with self.cond:
+            self._ensure_thread()
+            self._push(timer, time.monotonic() + interval)
+        return timer
+
+    def _ensure_thread(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.thread.start()
+
+    def _push(self, timer, due):
+        # 调用方已持有 self.cond
+        timer.generation += 1
+        timer.due = due
+        heapq.heappush(self.heap, (due, next(self.counter), timer, timer.generation))
+        self.cond.notify()
+
+    def _next_ready(self):
+        with self.cond:
+            while True:
+                if not self.heap:
+                    self.cond.wait()
+                    continue
+                due, _, timer, generation = self.heap[0]
+                if generation != timer.generation:
+                    heapq.heappop(self.heap)
+                    continue
+                now = time.monotonic()
+                if due > now:
+                    self.cond.wait(due - now)
+                    continue
+                heapq.heappop(self.heap)
+                timer.last_due = due
+                timer.fired += 1
+                timer.lateness.append(now - due)
+                # 按计划时间排下一次，不累积漂移；落后超过一个周期时从现在重新起算
+                self._push(timer, max(due + timer.interval, now))
+                return timer, due
+
+    def _run(self):
+        while True:
+            timer, due = self._next_ready()
+            self.fired += 1
+            try:
+                if timer.with_due: timer.fn(*timer.args, due)
+                else: timer.fn(*timer.args)
+            except Exception as e:
+                self.failed += 1
+                print(f"Timer {timer.name} failed: {e}")
+
+    def stats(self):
+        with self.cond:
+            active = {id(t): t for _, _, t, g in self.heap if g == t.generation}
+        return {"timers": len(active), "fired": self.fired, "failed": self.failed, "threads": 1 if self.thread else 0}
+
+SCHEDULER = Scheduler()
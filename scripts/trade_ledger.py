@@ -0,0 +1,150 @@
+"""
+逐笔成交账本：每个房间每局一份，只追加。
+买入/卖出/做空、强平、舆情、贷款、保证金警告和结算各记一条定长记录
+(玩家行号, 小时, 类型, 数量, 价格, 费用, 现金变动)，按列存进 NumPy 数组，每条约 45 字节。
+
+同一玩家的记录用 prev 列串成链表 (指向该玩家的上一条)，翻页时从游标处往回走，
+读一页的代价只和页大小有关。每个玩家的已实现盈亏 (平均成本法，不含费用) 和累计费用随追加维护，读取 O(1)。
+
+写入只发生在引擎线程；读者直接读，已写入的记录不会再改。
+"""
+from collections import namedtuple
+import numpy as np
+
+BUY, SELL, SHORT, LIQUIDATION, INTEL_UP, INTEL_DOWN, LOAN, SETTLE, WARNING = range(9)
+KIND_NAMES = ("买入", "卖出", "做空", "强平", "看涨舆情", "看跌舆情", "贷款", "结算", "警告")
+
+# 数量带方向：买入为正，卖出为负；非交易记录为 0
+TradeRecord = namedtuple("TradeRecord", ["seq", "turn", "kind", "qty", "price", "fee", "cash"])
+
+def describe(record):
+    """一条记录的文字说明 (对应原来 Player.logs 里的字符串)"""
+    kind, qty = record.kind, abs(record.qty)
+    if kind == BUY: return f"买入 {qty} 股 @ ${record.price:.2f}"
+    if kind == SELL: return f"卖出 {qty} 股 @ ${record.price:.2f}"
+    if kind == SHORT: return f"做空 {qty} 股 @ ${record.price:.2f}"
+    if kind == LIQUIDATION: return f"☠️ 爆仓通知：系统强制买回 {qty} 股，扣除 ${-record.cash:,.2f}。"
+    if kind in (INTEL_UP, INTEL_DOWN): return f"购买{'看涨' if kind == INTEL_UP else '看跌'}舆情 (${record.fee:,.0f})"
+    if kind == LOAN: return f"💸 贷款 ${record.cash:,.0f} (还款额 ${record.cash + record.fee:,.0f})"
+    if kind == SETTLE: return f"结算完成，管理费 ${record.fee:,.2f}"
+    return f"⚠️ 警告：保证金水平过低！(股价 ${record.price:.2f})"
+
+class TradeLedger:
+    COLUMNS = ("player", "turn", "kind", "qty", "price", "fee", "cash", "prev")
+    DTYPES = {"player": np.int32, "turn": np.int16, "kind": np.int8, "qty": np.int64,
+              "price": np.float64, "fee": np.float64, "cash": np.float64, "prev": np.int32}
+    # 每个玩家一行：最新一条记录的下标、记录条数、已实现盈亏、累计费用、持仓平均成本
+    PLAYER_COLUMNS = ("head", "count", "realized", "fees", "cost")
+    PLAYER_DTYPES = {"head": np.int32, "count": np.int32, "realized": np.float64, "fees": np.float64, "cost": np.float64}
+    PLAYER_DEFAULTS = {"head": -1, "count": 0, "realized": 0.0, "fees": 0.0, "cost": 0.0}
+
+    def __init__(self, capacity=256, players=64):
+        self.cols = {name: np.empty(capacity, dtype=self.DTYPES[name]) for name in self.COLUMNS}
+        self.size = 0
+        self.per_player = {name: np.full(players, self.PLAYER_DEFAULTS[name], dtype=self.PLAYER_DTYPES[name]) for name in self.PLAYER_COLUMNS}
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, n):
+        if self.size + n <= len(self.cols["player"]): return
+        capacity = max(self.size + n, len(self.cols["player"]) * 2)
+        for name in self.COLUMNS:
+            new = np.empty(capacity, dtype=self.cols[name].dtype)
+            new[:self.size] = self.cols[name][:self.size]
+            self.cols[name] = new
+
+    def _reserve_players(self, n):
+        if n <= len(self.per_player["head"]): return
+        capacity = max(n, len(self.per_player["head"]) * 2)
+        for name in self.PLAYER_COLUMNS:
+            new = np.full(capacity, self.PLAYER_DEFAULTS[name], dtype=self.PLAYER_DTYPES[name])
+            old = self.per_player[name]
+            new[:len(old)] = old
+            self.per_player[name] = new
+
+    # ===== 写入 (引擎线程) =====
+    def record(self, row, turn, kind, qty=0, price=0.0, fee=0.0, cash=0.0, position=0):
+        """追加一条；position 为成交前的持仓，用来更新平均成本和已实现盈亏"""
+        self._reserve(1)
+        self._reserve_players(row + 1)
+        pp = self.per_player
+        if qty: self._apply_fill(row, position, qty, price)
+        i = self.size
+        c = self.cols
+        c["player"][i], c["turn"][i], c["kind"][i], c["qty"][i] = row, turn, kind, qty
+        c["price"][i], c["fee"][i], c["cash"][i], c["prev"][i] = price, fee, cash, pp["head"][row]
+        # 先让记录可见再挂到链表头上，读者不会读到还没写完的记录
+        self.size += 1
+        pp["head"][row] = i
+        pp["count"][row] += 1
+        pp["fees"][row] += fee
+        return i
+
+    def _apply_fill(self, row, position, qty, price):
+        pp = self.per_player
+        cost = pp["cost"][row]
+        if position == 0 or (position > 0) == (qty > 0):
+            # 加仓：重新算平均成本
+            pp["cost"][row] = (abs(position) * cost + abs(qty) * price) / (abs(position) + abs(qty))
+            return
+        closed = min(abs(qty), abs(position))
+        pp["realized"][row] += closed * (price - cost) * (1 if position > 0 else -1)
+        # 反手：剩余部分按成交价开新仓
+        if abs(qty) > abs(position): pp["cost"][row] = price
+        elif abs(qty) == abs(position): pp["cost"][row] = 0.0
+
+    def record_settlement(self, turn, price, positions, fees, cash_deltas):
+        """结算：所有玩家各追加一条，整列写入；positions 为结算前按行号排列的持仓"""
+        n = len(positions)
+        self._reserve(n)
+        self._reserve_players(n)
+        pp = {name: col[:n] for name, col in self.per_player.items()}
+        pp["realized"] += positions * (price - pp["cost"])
+        pp["cost"][:] = 0.0
+        rows = np.arange(n)
+        lo, hi = self.size, self.size + n
+        c = self.cols
+        c["player"][lo:hi] = rows
+        c["turn"][lo:hi] = turn
+        c["kind"][lo:hi] = SETTLE
+        c["qty"][lo:hi] = -positions
+        c["price"][lo:hi] = price
+        c["fee"][lo:hi] = fees
+        c["cash"][lo:hi] = cash_deltas
+        c["prev"][lo:hi] = pp["head"]
+        self.size = hi
+        pp["head"][:] = rows + lo
+        pp["count"] += 1
+        pp["fees"] += fees
+
+    # ===== 读取 =====
+    def page(self, row, cursor=None, limit=20):
+        """
+        某个玩家从新到旧的一页记录：返回 (记录列表, 下一页游标)。
+        cursor 为上一页返回的游标，None 表示从最新一条开始；没有更多时游标为 None。
+        """
+        pp = self.per_player
+        if row >= len(pp["head"]): return [], None
+        c = self.cols
+        i = int(pp["head"][row]) if cursor is None else int(cursor)
+        # 游标只能指向这个玩家自己的记录 (换了一局或伪造的游标直接当作没有更多)
+        if i >= self.size or (i >= 0 and c["player"][i] != row): return [], None
+        records = []
+        while i >= 0 and len(records) < limit:
+            records.append(TradeRecord(
+                i, int(c["turn"][i]), int(c["kind"][i]), int(c["qty"][i]),
+                float(c["price"][i]), float(c["fee"][i]), float(c["cash"][i]),
+            ))
+            i = int(c["prev"][i])
+        return records, (i if i >= 0 else None)
+
+    def summary(self, row):
+        """(记录条数, 已实现盈亏, 累计费用)"""
+        pp = self.per_player
+        if row >= len(pp["head"]): return 0, 0.0, 0.0
+        return int(pp["count"][row]), float(pp["realized"][row]), float(pp["fees"][row])
+
+    def columns(self):
+        """全部记录的列视图 (分析/导出用)"""
+        return {name: self.cols[name][:self.size] for name in self.COLUMNS}
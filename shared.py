@@ -1,6 +1,11 @@
 # 文件名: shared.py
-from scripts.game_state import GameState
+from scripts.rooms import RoomRegistry, DEFAULT_ROOM
 
-#在这里实例化，且全宇宙只实例化这一次
-#所有其他文件都要从这里 import GAME
-GAME = GameState()
\ No newline at end of file
+# 房间注册表：每个进程只实例化这一次，所有其他文件都从这里 import ROOMS
+# 多进程部署时由 scripts/rooms.py 通过环境变量告知本进程的编号
+ROOMS = RoomRegistry.from_env()
+# 配置了 DARKPOOL_JOURNAL_DIR 时，重启后从日志恢复上次的所有房间
+ROOMS.restore()
+# 默认房间固定在 0 号进程，由该进程启动时建好；其他进程上没有它，所以这里不导出模块级的 GAME，
+# 需要某个房间时一律用 ROOMS.get(room_id)，房间不归本进程管时返回 None
+ROOMS.get(DEFAULT_ROOM, create=True)
@@ -4,14 +4,26 @@ This replaces the Gradio UI while reusing existing backend logic and shared stat
 """
 import os
 import streamlit as st
-from shared import GAME
+from shared import ROOMS, DEFAULT_ROOM
 from backend import (
-    get_dashboard_info,
+    CHART_RESOLUTIONS,
+    chart_resolutions,
+    chart_key,
+    draw_kline_chart,
+    resolve_room,
+    format_room_capacity,
+    get_player_status,
+    get_leaderboard_frame,
+    get_trade_history,
     get_admin_dashboard_info,
     admin_start,
     admin_skip_time,
     admin_skip_to_end,
+    admin_toggle_clock,
+    admin_toggle_market_mode,
     admin_restart_game,
+    admin_create_room,
+    admin_close_room,
 )
 
 st.set_page_config(page_title="暗仓: Streamlit", layout="wide")
@@ -26,17 +38,29 @@ def init_state():
         "login_message": "",
         "action_result": "",
         "message_input": "",
+        "room": DEFAULT_ROOM,
     }
     for key, val in defaults.items():
         st.session_state.setdefault(key, val)
 
 
-def try_token_login():
+def resolve_current_room():
+    """按 ?room= 参数找到本进程的房间；房间在别的工作进程时显示跳转链接并返回 None"""
+    params = st.experimental_get_query_params()
+    if not st.session_state.get("logged_in"):
+        st.session_state["room"] = params.get("room", [DEFAULT_ROOM])[0] or DEFAULT_ROOM
+    game, route_msg = resolve_room(ROOMS, st.session_state.room, params.get("token", [None])[0])
+    if game is None:
+        st.warning(route_msg)
+    return game
+
+
+def try_token_login(game):
     params = st.experimental_get_query_params()
     token = params.get("token", [None])[0]
     if not token or st.session_state.get("logged_in"):
         return
-    player = GAME.get_user_by_token(token)
+    player = game.get_user_by_token(token)
     if player:
         st.session_state.update(
             {
@@ -54,10 +78,10 @@ def build_magic_link():
         return None
     host = os.getenv("PUBLIC_HOST", "localhost")
     port = os.getenv("PUBLIC_PORT", os.getenv("STREAMLIT_SERVER_PORT", "8001"))
-    return f"http://{host}:{port}/?token={st.session_state.token}"
+    return f"http://{host}:{port}/?room={st.session_state.room}&token={st.session_state.token}"
 
 
-def ensure_logged_in():
+def ensure_logged_in(game):
     if st.session_state.get("logged_in"):
         return True
     st.info("请输入邮箱和操盘代号完成登录，或使用 token 链接自动登录。")
@@ -66,7 +90,7 @@ def ensure_logged_in():
         name = st.text_input("操盘代号", placeholder="Trader X")
         submitted = st.form_submit_button("接入交易网络")
     if submitted:
-        success, message, token = GAME.register(email, name)
+        success, message, token = game.register(email, name)
         st.session_state.update(
             {
                 "email": email,
@@ -77,16 +101,49 @@ def ensure_logged_in():
             }
         )
         st.success(st.session_state["login_message"])
-        st.experimental_rerun()
+        st.rerun()
     return False
 
 
-def render_player_dashboard():
-    status_md, price_md, trend_md, logs_str, messages_str, leaderboard_df, plot, hint_text = get_dashboard_info(
-        GAME, st.session_state.email
-    )
+# 各片段的自动刷新间隔 (秒)：行情和图表跟着跳动走，聊天和排行榜慢一些
+MARKET_REFRESH_SECONDS = 2
+CHAT_REFRESH_SECONDS = 5
+LEADERBOARD_REFRESH_SECONDS = 10
+
+
+# ===== 跨会话缓存 =====
+# 同一房间同一版本的数据所有会话只算一次；下划线开头的参数不参与缓存键
+@st.cache_resource(max_entries=64, show_spinner=False)
+def cached_chart(key, _game, _snap, resolution):
+    """K 线图按 chart_key 缓存，返回共享的 Figure，调用方只读"""
+    return draw_kline_chart(_game, _snap, resolution)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_leaderboard(room_id, version, _game, _snap):
+    return get_leaderboard_frame(_game, _snap)
+
+
+def set_result(result):
+    st.session_state["action_result"] = result
+
+
+def trading_action(game, action, *args):
+    if game.phase != "交易阶段":
+        set_result("❌ 交易未开启")
+    else:
+        set_result(action(st.session_state.email, *args))
+
+
+@st.fragment(run_every=MARKET_REFRESH_SECONDS)
+def market_fragment(game):
+    """状态栏、价格、交易按钮和限价单：操作后只重跑本片段"""
+    status = get_player_status(game, st.session_state.email)
+    if status is None:
+        st.warning("未找到账户，请重新登录")
+        return
+    status_md, price_md, trend_md, hint_text = status
 
-    st.markdown(st.session_state.get("login_message", ""))
     top_cols = st.columns([2, 1])
     with top_cols[0]:
         st.markdown(status_md)
@@ -94,96 +151,174 @@ def render_player_dashboard():
         st.markdown(price_md)
         if trend_md:
             st.markdown(trend_md)
-
-    if plot:
-        st.plotly_chart(plot, use_container_width=True)
-
     st.markdown(hint_text)
 
     act_cols = st.columns(4)
     with act_cols[0]:
         buy_qty = st.number_input("买入数量", min_value=1, value=100, step=100)
         if st.button("买入 (Long)"):
-            if GAME.phase != "交易阶段":
-                st.session_state["action_result"] = "❌ 交易未开启"
-            else:
-                st.session_state["action_result"] = GAME.buy_stock(st.session_state.email, buy_qty)
-            st.experimental_rerun()
+            trading_action(game, game.buy_stock, buy_qty)
+            st.rerun(scope="fragment")
     with act_cols[1]:
         sell_qty = st.number_input("卖出数量", min_value=1, value=100, step=100)
         if st.button("卖出/做空 (Short)"):
-            if GAME.phase != "交易阶段":
-                st.session_state["action_result"] = "❌ 交易未开启"
-            else:
-                st.session_state["action_result"] = GAME.sell_stock(st.session_state.email, sell_qty)
-            st.experimental_rerun()
+            trading_action(game, game.sell_stock, sell_qty)
+            st.rerun(scope="fragment")
     with act_cols[2]:
         intel_dir = st.radio("舆情方向", ["看涨", "看跌"], horizontal=True)
         if st.button("购买舆情 ($5k)"):
-            if GAME.phase != "交易阶段":
-                st.session_state["action_result"] = "❌ 交易未开启"
-            else:
-                st.session_state["action_result"] = GAME.purchase_intel(
-                    st.session_state.email, intel_dir
-                )
-            st.experimental_rerun()
+            trading_action(game, game.purchase_intel, intel_dir)
+            st.rerun(scope="fragment")
     with act_cols[3]:
         loan_amt = st.number_input("贷款金额", min_value=1000, value=10000, step=1000)
         if st.button("申请高利贷 (30%)"):
-            st.session_state["action_result"] = GAME.take_loan(st.session_state.email, loan_amt)
-            st.experimental_rerun()
+            set_result(game.take_loan(st.session_state.email, loan_amt))
+            st.rerun(scope="fragment")
 
     st.info(st.session_state.get("action_result", "准备就绪..."))
 
+    if game.market_mode == "book":
+        with st.expander("📑 限价单 (订单簿撮合)", expanded=True):
+            order_cols = st.columns(4)
+            with order_cols[0]:
+                order_side = st.radio("方向", ["买入", "卖出"], horizontal=True, key="order_side")
+            with order_cols[1]:
+                order_qty = st.number_input("数量", min_value=1, value=100, step=100, key="order_qty")
+            with order_cols[2]:
+                order_price = st.number_input("限价", min_value=0.01, value=float(round(game.snapshot.current_price, 2)), step=0.5, key="order_price")
+            with order_cols[3]:
+                order_ioc = st.checkbox("立即成交否则撤销 (IOC)", key="order_ioc")
+                if st.button("提交限价单"):
+                    set_result(game.place_order(
+                        st.session_state.email, "buy" if order_side == "买入" else "sell",
+                        order_qty, order_price, "IOC" if order_ioc else "GTC",
+                    ))
+                    st.rerun(scope="fragment")
+            for order_id, side, price, remaining, qty in game.get_open_orders(st.session_state.email):
+                row = st.columns([4, 1])
+                row[0].markdown(f"#{order_id} {'买入' if side > 0 else '卖出'} {remaining}/{qty} 股 @ ${price:.2f}")
+                if row[1].button("撤单", key=f"cancel_{order_id}"):
+                    set_result(game.cancel_order(st.session_state.email, order_id))
+                    st.rerun(scope="fragment")
+
+
+@st.fragment(run_every=MARKET_REFRESH_SECONDS)
+def chart_fragment(game):
+    resolution = st.radio(
+        "K线周期", chart_resolutions(game), format_func=CHART_RESOLUTIONS.get, horizontal=True, key="chart_resolution"
+    )
+    snap = game.snapshot
+    plot = cached_chart(chart_key(snap, game.room_id, resolution), game, snap, resolution)
+    st.plotly_chart(plot, use_container_width=True)
+
+
+@st.fragment(run_every=CHAT_REFRESH_SECONDS)
+def chat_fragment(game):
+    # 日志和留言的拼接文本随快照发布，所有会话共用，这里直接读
+    snap = game.snapshot
     msg_cols = st.columns([2, 1])
     with msg_cols[0]:
         st.subheader("💬 交易员大厅")
-        st.text_area("聊天记录", value=messages_str, height=260, disabled=True)
+        st.text_area("聊天记录", value=snap.messages_text, height=260, disabled=True)
         st.session_state["message_input"] = st.text_input(
             "发送消息", value=st.session_state.get("message_input", "")
         )
         if st.button("发送"):
             content = st.session_state.get("message_input", "").strip()
             if content:
-                st.session_state["action_result"] = GAME.post_message(
-                    st.session_state.email, content
-                )
+                set_result(game.post_message(st.session_state.email, content))
             else:
-                st.session_state["action_result"] = "内容为空"
+                set_result("内容为空")
             st.session_state["message_input"] = ""
-            st.experimental_rerun()
+            st.rerun(scope="fragment")
     with msg_cols[1]:
         st.subheader("📟 News Ticker")
-        st.text_area("系统日志", value=logs_str, height=260, disabled=True)
+        st.text_area("系统日志", value=snap.logs_text, height=260, disabled=True)
+
+
+@st.fragment
+def trade_history_fragment(game):
+    with st.expander("📒 我的交易记录"):
+        # 游标栈：每页记住起点，翻回上一页时直接弹出
+        pages = st.session_state.setdefault("trade_cursors", [None])
+        trades_df, next_cursor = get_trade_history(game, st.session_state.email, pages[-1])
+        if trades_df.empty and len(pages) > 1:
+            # 新的一局记录清空了，旧游标失效，回到第一页
+            pages[:] = [None]
+            trades_df, next_cursor = get_trade_history(game, st.session_state.email)
+        st.dataframe(trades_df, use_container_width=True)
+        page_cols = st.columns(2)
+        with page_cols[0]:
+            if len(pages) > 1 and st.button("较新的记录"):
+                pages.pop()
+                st.rerun(scope="fragment")
+        with page_cols[1]:
+            if next_cursor is not None and st.button("更早的记录"):
+                pages.append(next_cursor)
+                st.rerun(scope="fragment")
+
 
+@st.fragment(run_every=LEADERBOARD_REFRESH_SECONDS)
+def leaderboard_fragment(game):
+    snap = game.snapshot
     st.subheader("🏆 实时/最终 排行榜")
-    st.dataframe(leaderboard_df, use_container_width=True)
+    st.dataframe(cached_leaderboard(game.room_id, snap.version, game, snap), use_container_width=True)
 
-    st.caption("点击下方按钮手动刷新行情")
-    if st.button("刷新数据", type="secondary"):
-        st.experimental_rerun()
+
+def render_player_dashboard(game):
+    # 各片段独立刷新：按钮只重跑所在的片段，行情和图表按 MARKET_REFRESH_SECONDS 自动刷新
+    st.markdown(st.session_state.get("login_message", ""))
+    market_fragment(game)
+    chart_fragment(game)
+    chat_fragment(game)
+    trade_history_fragment(game)
+    leaderboard_fragment(game)
 
 
 def render_admin_dashboard():
-    admin_plot, admin_table, admin_logs, admin_msgs, admin_status = get_admin_dashboard_info(GAME)
+    room = st.text_input("房间号", value=DEFAULT_ROOM, key="admin_room")
+    game, route_msg = resolve_room(ROOMS, room)
+    if game is None:
+        st.warning(route_msg)
+        # 房间只能由管理端创建；房间号无效或归别的进程时不给按钮
+        try:
+            local = ROOMS.route(room) is None
+        except ValueError:
+            local = False
+        if local and st.button(f"➕ 创建房间 {room}"):
+            set_result(admin_create_room(ROOMS, room))
+            st.rerun()
+        st.info(st.session_state.get("action_result", ""))
+        st.markdown(format_room_capacity(ROOMS))
+        return
+    admin_fragment(game)
+    if game.room_id != DEFAULT_ROOM and st.button(f"🗑️ 关闭房间 {game.room_id} (玩家和预写日志一并删除)"):
+        set_result(admin_close_room(ROOMS, game.room_id))
+        st.rerun()
+
+
+@st.fragment
+def admin_fragment(game):
+    # 管理操作只重跑管理面板，不重跑玩家端；状态栏里的引擎/时钟统计不随版本号变化，不做缓存
+    admin_plot, admin_table, admin_logs, admin_msgs, admin_status = get_admin_dashboard_info(game, ROOMS)
 
     top = st.columns([3, 1])
     with top[0]:
         st.plotly_chart(admin_plot, use_container_width=True)
     with top[1]:
         st.markdown(admin_status)
-        if st.button("🚀 强制开始游戏"):
-            st.session_state["action_result"] = admin_start()
-            st.experimental_rerun()
-        if st.button("⏭️ 跳过 1 小时"):
-            st.session_state["action_result"] = admin_skip_time()
-            st.experimental_rerun()
-        if st.button("⏩ 快进至结局"):
-            st.session_state["action_result"] = admin_skip_to_end()
-            st.experimental_rerun()
-        if st.button("🔄 重置/新游戏"):
-            st.session_state["action_result"] = admin_restart_game()
-            st.experimental_rerun()
+        actions = (
+            ("🚀 强制开始游戏", admin_start),
+            ("⏭️ 跳过 1 小时", admin_skip_time),
+            ("⏩ 快进至结局", admin_skip_to_end),
+            ("⏯️ 暂停/继续时钟", admin_toggle_clock),
+            ("🔀 切换成交模式 (系统/订单簿)", admin_toggle_market_mode),
+            ("🔄 重置/新游戏", admin_restart_game),
+        )
+        for label, action in actions:
+            if st.button(label):
+                set_result(action(game))
+                st.rerun(scope="fragment")
         st.info(st.session_state.get("action_result", ""))
 
     log_cols = st.columns(2)
@@ -196,22 +331,24 @@ def render_admin_dashboard():
         st.text_area("玩家对话监控", value=admin_msgs, height=220, disabled=True)
 
     if st.button("刷新管理端数据", type="secondary"):
-        st.experimental_rerun()
+        st.rerun(scope="fragment")
 
 
 # ===== 页面入口 =====
 init_state()
-try_token_login()
-
 st.title("📉 暗仓 (Dark Pool) - Streamlit 终端")
+current_game = resolve_current_room()
+if current_game is not None:
+    try_token_login(current_game)
+
 tab_player, tab_admin = st.tabs(["玩家端", "管理员端"])
 
 with tab_player:
-    if ensure_logged_in():
+    if current_game is not None and ensure_logged_in(current_game):
         magic_link = build_magic_link()
         if magic_link:
             st.success(f"🔗 免密登录链接: {magic_link}")
-        render_player_dashboard()
+        render_player_dashboard(current_game)
 
 with tab_admin:
     render_admin_dashboard()
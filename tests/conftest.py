@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# 测试里不访问 LLM，所有文案走模板；战报和归档写到临时目录
+os.environ["DARKPOOL_LLM_OFFLINE"] = "1"
+os.environ.setdefault("DARKPOOL_SAVE_DIR", tempfile.mkdtemp(prefix="darkpool-test-"))
@@ -0,0 +1,25 @@
+from scripts.game_state import GameState
+
+def test_aggregates_match_recount_after_trades_liquidation_and_settlement():
+    game = GameState()
+    game.seconds_per_hour = 3600
+    try:
+        for i in range(6): game.register(f"p{i}@test", f"P{i}")
+        game.start_game()
+        assert game.check_aggregates() == []
+        game.buy_stock("p0@test", 1000)
+        game.sell_stock("p1@test", 500)
+        # 满额做空，再把趋势拉到上限让价格连涨，逼出强平
+        game.sell_stock("p2@test", 18000)
+        game.sell_stock("p3@test", 15000)
+        game.take_loan("p4@test", 50000)
+        assert game.check_aggregates() == []
+        game.engine.call(setattr, game, "hourly_trend", 0.5)
+        for _ in range(3): game.next_hour()
+        assert game.liquidation_count > 0
+        assert game.check_aggregates() == []
+        while game.game_clock < 12: game.next_hour()
+        assert game.phase == "结算阶段"
+        assert game.check_aggregates() == []
+    finally:
+        game.shutdown()
@@ -0,0 +1,34 @@
+import time
+from scripts.news_system import CircuitBreaker
+
+def test_opens_after_threshold_and_short_circuits():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.status()["state"] == "closed"
+    # 成功一次清零连续失败计数
+    breaker.record_success()
+    for _ in range(3): breaker.record_failure()
+    status = breaker.status()
+    assert status["state"] == "open" and status["failures"] == 3 and status["cooldown_left"] > 59
+    assert not breaker.allow()
+
+def test_half_open_admits_one_trial():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    # 冷却结束：只放行一个试探请求
+    assert breaker.allow()
+    assert breaker.status()["state"] == "half_open"
+    assert not breaker.allow()
+    # 试探失败立即重新打开
+    breaker.record_failure()
+    assert breaker.status()["state"] == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    # 试探成功则关闭
+    breaker.record_success()
+    assert breaker.status() == {"state": "closed", "failures": 0, "cooldown_left": 0.0}
+    assert breaker.allow() and breaker.allow()
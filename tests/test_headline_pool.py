@@ -0,0 +1,30 @@
+import time
+from scripts.news_system import HeadlinePool, NEWS_FALLBACK
+
+def test_expired_headlines_are_evicted():
+    pool = HeadlinePool(depth=3, ttl=60)
+    now = time.time()
+    pool.pools["positive"].extend([(now - 120, "旧闻一"), (now - 61, "旧闻二"), (now - 5, "新闻")])
+    pool.pools["negative"].append((now - 300, "过期利空"))
+    # 过期的标题被丢掉，弹出第一条还新鲜的
+    assert pool.pop("positive") == "新闻"
+    assert pool.pop("negative") == NEWS_FALLBACK
+    assert pool.depths() == {"positive": 0, "negative": 0}
+    assert pool.stats == {"hit": 1, "miss": 1, "expired": 3, "generated": 0}
+
+def test_refill_targets_shallowest_side():
+    pool = HeadlinePool(depth=2, ttl=60)
+    now = time.time()
+    pool.pools["positive"].extend([(now, "a"), (now, "b")])
+    pool.pools["negative"].append((now, "c"))
+    assert pool._next_needed() == "negative"
+    pool.pools["negative"].append((now, "d"))
+    assert pool._next_needed() is None
+
+def test_refill_thread_exits_when_offline():
+    # conftest 打开了离线模式：补货线程不空转，直接退出
+    pool = HeadlinePool()
+    pool.start()
+    pool.thread.join(1.0)
+    assert not pool.thread.is_alive()
+    assert pool.pop("positive") == NEWS_FALLBACK
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import scripts.news_system as news_system
+from scripts.game_state import GameState
+from scripts.journal import Journal, FRAME
+from scripts.news_system import COMMENTARY
+
+class LaterDatetime(datetime):
+    """恢复时墙上时钟已经走了几个小时"""
+    @classmethod
+    def now(cls, tz=None):
+        return datetime.now(tz) + timedelta(hours=3)
+
+def play_hours(game, hours):
+    for i in range(4): game.register(f"p{i}@test", f"P{i}")
+    game.start_game()
+    for h in range(hours):
+        game.buy_stock(f"p{h % 4}@test", 100)
+        game.purchase_intel(f"p{(h + 1) % 4}@test", "看涨")
+        game.next_hour()
+
+def fingerprint(game):
+    led = game.ledger
+    return list(game.history), list(game.system_logs.items), list(game.messages.items), [led.column(c).tolist() for c in ("cash", "stock", "debt")]
+
+def test_replay_with_commentary_fallback(tmp_path, monkeypatch):
+    # 点评队列满时模板文案在收盘命令里同步回调，重放结果也必须与实际运行一致
+    monkeypatch.setattr(COMMENTARY, "max_pending", 0)
+    game = GameState(journal=Journal(str(tmp_path)))
+    game.seconds_per_hour = 3600
+    play_hours(game, 3)
+    expected = game.engine.call(fingerprint, game)
+    game.shutdown()
+
+    recovered = GameState(journal=Journal(str(tmp_path)))
+    try: assert recovered.engine.call(fingerprint, recovered) == expected
+    finally: recovered.shutdown()
+
+def test_append_after_torn_segment(tmp_path):
+    # 崩溃时新分段只写了半帧：恢复后继续写的记录，下一次恢复时必须还在
+    journal = Journal(str(tmp_path))
+    game = GameState(journal=journal)
+    game.seconds_per_hour = 3600
+    play_hours(game, 1)
+    game.shutdown()
+    with open(journal._path("journal", journal.seq), "wb") as f: f.write(FRAME.pack(100) + b"torn")
+
+    game = GameState(journal=Journal(str(tmp_path)))
+    game.next_hour()
+    game.buy_stock("p3@test", 10)
+    expected = game.engine.call(fingerprint, game)
+    game.shutdown()
+
+    recovered = GameState(journal=Journal(str(tmp_path)))
+    try: assert recovered.engine.call(fingerprint, recovered) == expected
+    finally: recovered.shutdown()
+
+def test_replay_text_independent_of_wall_clock(tmp_path, monkeypatch):
+    # 舆情快讯和盘面点评带时间戳，重放时必须用命令当初的时间，而不是恢复时的时间
+    monkeypatch.setattr(COMMENTARY, "max_pending", 0)
+    game = GameState(journal=Journal(str(tmp_path)))
+    game.seconds_per_hour = 3600
+    play_hours(game, 2)
+    expected = game.engine.call(fingerprint, game)
+    game.shutdown()
+
+    monkeypatch.setattr(news_system, "datetime", LaterDatetime)
+    recovered = GameState(journal=Journal(str(tmp_path)))
+    try:
+        actual = recovered.engine.call(fingerprint, recovered)
+        assert actual[2] == expected[2]
+        assert actual == expected
+    finally: recovered.shutdown()
@@ -0,0 +1,57 @@
+import random
+import numpy as np
+from scripts.leaderboard import Leaderboard
+
+class Account:
+    def __init__(self, seq, cash, stock):
+        self.email, self.seq, self.cash, self.stock = f"p{seq}@test", seq, cash, stock
+
+    def get_net_worth(self, price):
+        return self.cash + self.stock * price
+
+def oracle(accounts, price):
+    """整体按 (净值从高到低, 序号) 排一遍"""
+    return [a.email for a in sorted(accounts, key=lambda a: (-a.get_net_worth(price), a.seq))]
+
+def test_updates_match_sorted_oracle():
+    rng = random.Random(11)
+    price = 100.0
+    accounts = [Account(i, rng.randint(0, 20) * 1000.0, rng.randint(-50, 50)) for i in range(200)]
+    board = Leaderboard()
+    board.rebuild(accounts, price)
+    for _ in range(500):
+        a = rng.choice(accounts)
+        a.cash += rng.randint(-20, 20) * 100.0
+        a.stock += rng.randint(-10, 10)
+        board.update(a, price)
+    expected = oracle(accounts, price)
+    assert len(board) == len(accounts)
+    assert board.top() == expected
+    assert board.top(10) == expected[:10]
+    assert board.page(3, size=15) == expected[45:60]
+    for a in rng.sample(accounts, 20):
+        assert board.rank(a.email) == expected.index(a.email) + 1
+        assert board.net_worth(a.email) == a.get_net_worth(price)
+    assert board.rank("nobody@test") is None
+
+def test_rebuild_columns_matches_rebuild_with_ties():
+    accounts = [Account(i, 1000.0 * (i % 3), 0) for i in range(9)]
+    board = Leaderboard()
+    board.rebuild_columns(np.array([a.get_net_worth(50.0) for a in accounts]), [a.email for a in accounts], 50.0)
+    assert board.top() == oracle(accounts, 50.0)
+    board.remove("p2@test")
+    assert "p2@test" not in board.top() and board.rank("p2@test") is None and len(board) == 8
+
+def test_frozen_standings_never_change():
+    accounts = [Account(i, 1000.0 * i, 0) for i in range(5)]
+    board = Leaderboard()
+    board.rebuild(accounts, 1.0)
+    standings = board.frozen()
+    assert board.frozen() is standings
+    before = standings.top()
+    accounts[0].cash = 10 ** 6
+    board.update(accounts[0], 1.0)
+    board.remove("p4@test")
+    # 已发布的快照保持原样，新快照反映改动
+    assert standings.top() == before and standings.rank("p0@test") == 5 and len(standings) == 5
+    assert board.frozen().top() == ["p0@test", "p3@test", "p2@test", "p1@test"]
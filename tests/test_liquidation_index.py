@@ -0,0 +1,45 @@
+import random
+from collections import namedtuple
+from scripts.liquidation_index import LiquidationIndex
+
+Position = namedtuple("Position", "email seq cash stock")
+
+def oracle(positions, price, level):
+    """逐个按风险率判断：空头且 cash / (|stock| * price) - 1 < level"""
+    hit = [p for p in positions.values() if p.stock < 0 and (p.cash <= 0 or p.cash / (-p.stock * price) - 1 <= level)]
+    return [p.email for p in sorted(hit, key=lambda p: p.seq)]
+
+def test_crossed_matches_full_scan_in_seq_order():
+    rng = random.Random(5)
+    index = LiquidationIndex()
+    positions = {}
+    for seq in range(300):
+        p = Position(f"p{seq}@test", seq, rng.uniform(-1000, 50000), rng.choice((0, rng.randint(-300, 300))))
+        positions[p.email] = p
+        index.update(p)
+    assert len(index) == sum(p.stock < 0 for p in positions.values())
+    for price in (1.0, 50.0, 100.0, 150.0, 400.0, 10 ** 6):
+        liq, warn = index.crossed(price)
+        assert liq == oracle(positions, price, index.maintenance_margin)
+        assert warn == oracle(positions, price, index.warning_margin)
+
+def test_update_moves_and_removes_positions():
+    index = LiquidationIndex()
+    a = Position("a@test", 0, 21000.0, -100)
+    b = Position("b@test", 1, 21000.0, -100)
+    index.update(b)
+    index.update(a)
+    # 触发价 21000 / (2.1 * 100) = 100
+    assert index.crossed(99.0) == ([], ["a@test", "b@test"])
+    assert index.crossed(100.0)[0] == ["a@test", "b@test"]
+    # 补了保证金，触发价上移
+    index.update(a._replace(cash=42000.0))
+    assert index.crossed(100.0)[0] == ["b@test"]
+    # 平仓后不再是空头
+    index.update(b._replace(stock=0))
+    assert len(index) == 1 and index.crossed(10 ** 6)[0] == ["a@test"]
+    index.remove("a@test")
+    assert len(index) == 0 and index.crossed(10 ** 6) == ([], [])
+    # 现金不为正时任何价格都已越线
+    index.update(Position("c@test", 2, -5.0, -10))
+    assert index.crossed(0.01)[0] == ["c@test"]
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from scripts.ohlcv import OHLCVStore
+
+def filled(n):
+    store = OHLCVStore(capacity=4)
+    for t in range(n): store.append(t * 10, 100 + t, 101 + t, 99 + t, 100.5 + t, t)
+    return store
+
+def test_slice_time_half_open():
+    store = filled(40)
+    part = store.slice_time(50, 120)
+    assert part["time"].tolist() == list(range(50, 120, 10))
+    assert part["close"].tolist() == [100.5 + t for t in range(5, 12)]
+    assert store.slice_time(55, 65)["time"].tolist() == [60]
+    assert store.slice_time(None, 20)["time"].tolist() == [0, 10]
+    assert store.slice_time(380)["time"].tolist() == [380, 390]
+    assert len(store.slice_time(1000)["time"]) == 0
+
+def test_frozen_view_unchanged_by_appends_and_growth():
+    store = filled(4)
+    view = store.frozen()
+    assert store.frozen() is view
+    before = {name: col.copy() for name, col in view.columns().items()}
+    # 继续追加并触发扩容，旧视图的长度和内容都不变
+    for t in range(4, 50): store.append(t * 10, 1.0, 1.0, 1.0, 1.0, 1)
+    assert len(view) == 4 and len(store) == 50
+    for name, col in view.columns().items(): assert np.array_equal(col, before[name])
+    assert store.frozen() is not view and len(store.frozen()) == 50
+
+def test_columns_are_read_only():
+    store = filled(3)
+    with pytest.raises(ValueError): store.column("close")[0] = 0.0
+    assert store[-1] == {"time": 20, "open": 102.0, "high": 103.0, "low": 101.0, "close": 102.5, "volume": 2}
+    with pytest.raises(IndexError): store[3]
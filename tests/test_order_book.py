@@ -0,0 +1,66 @@
+from scripts.game_state import GameState
+from scripts.order_book import Order, OrderBook, BUY, SELL, GTC, IOC
+
+def place(book, owner, side, qty, price=None, tif=GTC, allow=None):
+    fills = []
+    order = book.new_order(owner, side, qty, price, tif)
+    book.match(order, allow, lambda taker, maker, q, p: fills.append((maker.owner, q, p)))
+    return order, fills
+
+def test_partial_fill_price_time_priority_and_rest():
+    book = OrderBook()
+    place(book, "a", SELL, 30, 101.0)
+    place(book, "b", SELL, 20, 100.0)
+    place(book, "c", SELL, 20, 100.0)
+    order, fills = place(book, "x", BUY, 50, 100.5)
+    # 先吃最低价，同价先来先成交；剩下 10 股按限价挂在买一
+    assert fills == [("b", 20, 100.0), ("c", 20, 100.0)]
+    assert order.remaining == 10 and order.id in book.orders
+    assert book.depth() == ([(100.5, 10)], [(101.0, 30)])
+    _, fills = place(book, "y", SELL, 15, 100.0)
+    assert fills == [("x", 10, 100.5)]
+    assert book.depth() == ([], [(100.0, 5), (101.0, 30)])
+    assert (book.trades, book.volume, book.last_price) == (3, 50, 100.5)
+
+def test_cancel_and_ioc():
+    book = OrderBook()
+    resting, _ = place(book, "a", BUY, 10, 99.0)
+    version = book.version
+    assert book.cancel(resting.id, owner="someone-else") is None
+    assert book.cancel(resting.id, owner="a") is resting
+    assert book.version > version and len(book) == 0 and book.depth() == ([], [])
+    assert book.cancel(resting.id) is None and book.best(BUY) is None
+    place(book, "m", SELL, 5, 100.0)
+    # IOC 和市价单吃不完的部分直接作废，不挂到簿上
+    ioc, fills = place(book, "x", BUY, 8, 100.0, tif=IOC)
+    assert fills == [("m", 5, 100.0)] and ioc.remaining == 3 and len(book) == 0
+    market, fills = place(book, "x", BUY, 8)
+    assert fills == [] and len(book) == 0
+
+def test_allow_callback_self_trade_cancels_resting_order():
+    book = OrderBook()
+    place(book, "x", SELL, 10, 100.0)
+    place(book, "m", SELL, 10, 100.5)
+    # 与 GameState._allow_fill 相同的规则：碰到自己的挂单时撤掉挂单，继续往下吃
+    self_trade = lambda taker, maker, qty, price: "maker" if maker.owner == taker.owner else "ok"
+    order, fills = place(book, "x", BUY, 10, 101.0, allow=self_trade)
+    assert fills == [("m", 10, 100.5)] and order.remaining == 0
+    assert book.open_orders("x") == [] and len(book) == 0
+    # 吃单方被拒时停止撮合，挂单保持原样
+    place(book, "m", SELL, 10, 100.0)
+    order, fills = place(book, "y", BUY, 10, tif=IOC, allow=lambda *_: "taker")
+    assert fills == [] and book.depth()[1] == [(100.0, 10)]
+
+def test_game_rejects_self_trade():
+    game = GameState()
+    game.seconds_per_hour = 3600
+    try:
+        game.set_market_mode("book")
+        for i in range(2): game.register(f"p{i}@test", f"P{i}")
+        game.start_game()
+        resting = Order(1, "p0@test", BUY, 10, 99.0)
+        # 自己的挂单被撤掉，别人的挂单正常成交
+        assert game.engine.call(game._allow_fill, Order(2, "p0@test", SELL, 10), resting, 10, 99.0) == "maker"
+        assert game.engine.call(game._allow_fill, Order(3, "p1@test", SELL, 10), resting, 10, 99.0) == "ok"
+    finally:
+        game.shutdown()
@@ -0,0 +1,22 @@
+from scripts.ring_buffer import SeqRing
+
+def test_since_across_wraparound():
+    ring = SeqRing(5)
+    assert ring.since(0) == [] and ring.last_seq == 0 and not ring
+    for i in range(1, 13): assert ring.append(f"m{i}") == i
+    # 只剩最后 5 条 (序号 8..12)
+    assert len(ring) == 5 and ring.last_seq == 12
+    assert list(ring) == [f"m{i}" for i in range(8, 13)]
+    assert ring.since(10) == [(11, "m11"), (12, "m12")]
+    assert ring.since(12) == []
+    # 游标早于缓冲区起点：被挤掉的取不回，从最旧的一条开始
+    assert [seq for seq, _ in ring.since(3)] == [8, 9, 10, 11, 12]
+    assert ring.since(7, limit=2) == [(8, "m8"), (9, "m9")]
+    assert ring.since(9, limit=10) == [(10, "m10"), (11, "m11"), (12, "m12")]
+
+def test_tail():
+    ring = SeqRing(3)
+    for i in range(7): ring.append(i)
+    assert ring.tail(2) == [5, 6]
+    assert ring.tail(10) == [4, 5, 6]
+    assert ring.tail(0) == []
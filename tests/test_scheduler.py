@@ -0,0 +1,74 @@
+import threading
+import time
+from scripts.scheduler import Scheduler
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline: return False
+        time.sleep(0.005)
+    return True
+
+def test_fires_periodically_with_due_time():
+    scheduler = Scheduler(name="test-clock")
+    calls = []
+    started = time.monotonic()
+    timer = scheduler.every(0.02, calls.append, name="t", with_due=True)
+    assert wait_for(lambda: len(calls) >= 3)
+    timer.cancel()
+    # 计划时间至少间隔一个周期 (没落后时正好一个周期，不累积漂移)
+    assert calls[0] >= started + 0.02
+    assert all(b - a >= 0.02 - 1e-9 for a, b in zip(calls, calls[1:]))
+
+def test_pause_resume_keeps_remaining_time():
+    scheduler = Scheduler(name="test-clock")
+    fired = threading.Event()
+    timer = scheduler.every(0.3, fired.set)
+    time.sleep(0.1)
+    timer.pause()
+    left = timer.seconds_left()
+    assert timer.paused and 0.1 < left < 0.3
+    time.sleep(0.3)
+    # 暂停期间既不触发，剩余时间也不减少
+    assert not fired.is_set() and timer.seconds_left() == left
+    timer.resume()
+    assert not timer.paused and fired.wait(1.0)
+    timer.cancel()
+
+def test_reschedule_and_cancel_invalidate_old_entries():
+    scheduler = Scheduler(name="test-clock")
+    calls = []
+    timer = scheduler.every(60, calls.append, "tick")
+    generation = timer.generation
+    timer.reschedule(0.02)
+    # 改期换了代次，堆里原来 60 秒后的条目作废，只按新周期触发
+    assert timer.generation > generation and timer.seconds_left() < 1
+    assert wait_for(lambda: len(calls) >= 2)
+    assert scheduler.stats()["timers"] == 1
+    timer.cancel()
+    fired = timer.fired
+    time.sleep(0.1)
+    assert timer.fired == fired and timer.seconds_left() is None
+    assert scheduler.stats()["timers"] == 0
+    # 已取消的句柄上改期、继续都是空操作
+    timer.reschedule(0.01)
+    timer.resume()
+    time.sleep(0.05)
+    assert timer.fired == fired
+
+def test_reschedule_while_paused_caps_remaining():
+    scheduler = Scheduler(name="test-clock")
+    timer = scheduler.every(60, lambda: None)
+    timer.pause()
+    timer.reschedule(5)
+    assert timer.paused and timer.seconds_left() == 5 and timer.interval == 5
+    timer.cancel()
+
+def test_failing_callback_does_not_stop_scheduler():
+    scheduler = Scheduler(name="test-clock")
+    bad = scheduler.every(0.01, lambda: 1 / 0)
+    calls = []
+    good = scheduler.every(0.01, calls.append, 1)
+    assert wait_for(lambda: len(calls) >= 3 and scheduler.failed >= 3)
+    bad.cancel()
+    good.cancel()
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from scripts.trade_ledger import TradeLedger, BUY, SELL, SHORT, LOAN, SETTLE
+
+def test_page_cursors_walk_one_player_newest_first():
+    ledger = TradeLedger(capacity=4, players=1)
+    # 两个玩家交替写入，各自的链表互不干扰；容量很小，顺带覆盖扩容
+    for turn in range(25):
+        ledger.record(0, turn, LOAN, cash=1000.0 * turn)
+        ledger.record(3, turn, LOAN, cash=-1.0 * turn)
+    seen, cursor = [], None
+    while True:
+        records, cursor = ledger.page(0, cursor, limit=7)
+        seen.extend(records)
+        if cursor is None: break
+    assert [r.turn for r in seen] == list(range(24, -1, -1))
+    assert len(ledger.page(3, limit=100)[0]) == 25
+    assert ledger.summary(0)[0] == 25
+    # 别人的游标、越界游标和没有记录的玩家都当作没有更多
+    _, cursor = ledger.page(0, limit=1)
+    assert ledger.page(3, cursor) == ([], None)
+    assert ledger.page(0, 10 ** 6) == ([], None)
+    assert ledger.page(99) == ([], None)
+
+def test_realized_pnl_average_cost_and_reversal():
+    ledger = TradeLedger()
+    ledger.record(0, 0, BUY, 100, 10.0, fee=1.0, position=0)
+    ledger.record(0, 1, BUY, 100, 20.0, fee=1.0, position=100)
+    # 平均成本 15：卖 50 股 @ 25 实现 +500
+    ledger.record(0, 2, SELL, -50, 25.0, fee=1.0, position=200)
+    assert ledger.summary(0) == (3, pytest.approx(500.0), pytest.approx(3.0))
+    # 卖 250 股 @ 5：平掉 150 股 (-1500)，反手做空 100 股成本 5
+    ledger.record(0, 3, SHORT, -250, 5.0, position=150)
+    assert ledger.summary(0)[1] == pytest.approx(-1000.0)
+    # 空头在 4 买回 100 股：+100
+    ledger.record(0, 4, BUY, 100, 4.0, position=-100)
+    assert ledger.summary(0)[1] == pytest.approx(-900.0)
+
+def test_settlement_closes_every_position():
+    ledger = TradeLedger()
+    ledger.record(0, 0, BUY, 10, 100.0, position=0)
+    ledger.record(1, 0, SHORT, -10, 100.0, position=0)
+    ledger.record_settlement(12, 90.0, np.array([10, -10, 0]), np.array([1.0, 2.0, 0.0]), np.array([900.0, -900.0, 0.0]))
+    assert [ledger.summary(r)[1] for r in range(3)] == [pytest.approx(-100.0), pytest.approx(100.0), 0.0]
+    newest = ledger.page(1, limit=1)[0][0]
+    assert (newest.kind, newest.qty, newest.turn, newest.fee) == (SETTLE, 10, 12, 2.0)
+    assert ledger.summary(2) == (1, 0.0, 0.0)